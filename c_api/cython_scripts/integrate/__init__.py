@@ -0,0 +1,18 @@
+"""
+integrate f(x) = x ** 2 - x over [a, b] with n rectangles
+
+compiled kernels of _kernels.pyx when built (see setup.py), the numpy fallbacks of _fallback otherwise;
+COMPILED tells which. integrate_f_reference is the pure python version all of them are compared with.
+quadrature has the closed form and gauss / adaptive simpson rules that need hundreds of evaluations, not N.
+"""
+from .integrate import integrate_f as integrate_f_reference
+from .quadrature import adaptive_simpson, exact, gauss_legendre, integrate_intervals, riemann_sum
+
+try:
+    from ._kernels import apply_integrate_f, apply_integrate_f_parallel, integrate_f, integrate_f_parallel
+
+    COMPILED = True
+except ImportError:
+    from ._fallback import apply_integrate_f, apply_integrate_f_parallel, integrate_f, integrate_f_parallel
+
+    COMPILED = False
@@ -0,0 +1,26 @@
+"""
+the kernels of _kernels.pyx without a compiler: numpy over chunks of the grid, same signatures
+num_threads is accepted and ignored
+"""
+import numpy as np
+
+from .quadrature import f, riemann_sum
+
+
+def integrate_f(a, b, n):
+    return float(riemann_sum(f, a, b, n))
+
+
+def integrate_f_parallel(a, b, n, num_threads=0):
+    return integrate_f(a, b, n)
+
+
+def apply_integrate_f(a, b, n):
+    a, b, n = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64), np.asarray(n, dtype=np.int64)
+    if not len(a) == len(b) == len(n):
+        raise ValueError("a, b and n must have the same length")
+    return riemann_sum(f, a, b, n)
+
+
+def apply_integrate_f_parallel(a, b, n, num_threads=0):
+    return apply_integrate_f(a, b, n)
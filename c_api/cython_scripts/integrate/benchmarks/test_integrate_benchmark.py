@@ -0,0 +1,106 @@
+"""
+Benchmarks of the integrate_f variants against the pure python reference, run with pytest-benchmark, e.g.
+
+    python setup.py build_ext --inplace  # in c_api/cython_scripts/integrate
+    pytest c_api/cython_scripts/integrate/benchmarks --benchmark-group-by=group --benchmark-autosave
+
+Every group (one input size) has the python reference, the table shows the times relative to the fastest
+variant; extra_info["speedup"] is the speedup over the reference, in the saved json.
+The reference is skipped above INTEGRATE_BENCHMARK_REFERENCE_MAX_N (default 1e6), ~1s per call, the speedup
+then uses its time at the largest size it ran, scaled by n.
+Variants that are not built (see setup.py) are skipped; without the build the kernels are the numpy fallbacks.
+"""
+import functools
+import importlib
+import os
+import timeit
+
+import numpy as np
+import pytest
+
+from c_api.cython_scripts.integrate import (
+    COMPILED,
+    apply_integrate_f,
+    apply_integrate_f_parallel,
+    integrate_f,
+    integrate_f_parallel,
+    integrate_f_reference,
+)
+
+pytest.importorskip("pytest_benchmark")
+
+REFERENCE_MAX_N = float(os.environ.get("INTEGRATE_BENCHMARK_REFERENCE_MAX_N", 1e6))
+SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+ROWS = (100, 1_000, 10_000)
+# the steps from python to typed cython of the original experiments
+STEPS = ("integrate_cy_naive", "integrate_cy", "integrate_cy_cdef")
+
+
+def step(name):
+    try:
+        return importlib.import_module(f"c_api.cython_scripts.integrate.{name}").integrate_f
+    except ImportError:
+        pytest.skip(f"{name} is not built")
+
+
+VARIANTS = {
+    "python": lambda: integrate_f_reference,
+    **{name: functools.partial(step, name) for name in STEPS},
+    "kernel": lambda: integrate_f,
+    "kernel_parallel": lambda: integrate_f_parallel,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def reference_time(n):
+    """min time of the reference, measured up to REFERENCE_MAX_N and extrapolated linearly above"""
+    measured = min(n, int(REFERENCE_MAX_N))
+    seconds = min(timeit.repeat(lambda: integrate_f_reference(1.0, 2.0, measured), number=1, repeat=3))
+    return seconds * n / measured
+
+
+def record_speedup(benchmark, reference_seconds):
+    benchmark.extra_info["compiled"] = COMPILED
+    # no stats with --benchmark-disable
+    if benchmark.stats is not None:
+        benchmark.extra_info["speedup"] = reference_seconds / benchmark.stats.stats.min
+
+
+@pytest.fixture(scope="module")
+def rows():
+    rng = np.random.default_rng(0)
+    size = max(ROWS)
+    return rng.normal(size=size), rng.normal(size=size), rng.integers(100, 1000, size=size, dtype=np.int64)
+
+
+@pytest.mark.parametrize("variant", list(VARIANTS))
+@pytest.mark.parametrize("n", SIZES)
+def test_integrate_f(benchmark, n, variant):
+    if variant == "python" and n > REFERENCE_MAX_N:
+        pytest.skip("reference above INTEGRATE_BENCHMARK_REFERENCE_MAX_N")
+    func = VARIANTS[variant]()
+    benchmark.group = f"integrate_f-{n}"
+    result = benchmark(func, 1.0, 2.0, n)
+    record_speedup(benchmark, reference_time(n))
+    assert np.isclose(result, integrate_f_reference(1.0, 2.0, min(n, 10_000)), rtol=1e-3)
+
+
+def apply_reference(a, b, n):
+    return np.array([integrate_f_reference(*row) for row in zip(a.tolist(), b.tolist(), n.tolist())])
+
+
+APPLY_VARIANTS = {
+    "python": apply_reference,
+    "kernel": apply_integrate_f,
+    "kernel_parallel": apply_integrate_f_parallel,
+}
+
+
+@pytest.mark.parametrize("variant", list(APPLY_VARIANTS))
+@pytest.mark.parametrize("n_rows", ROWS)
+def test_apply_integrate_f(benchmark, rows, n_rows, variant):
+    a, b, n = (col[:n_rows] for col in rows)
+    benchmark.group = f"apply_integrate_f-{n_rows}"
+    result = benchmark(APPLY_VARIANTS[variant], a, b, n)
+    record_speedup(benchmark, min(timeit.repeat(lambda: apply_reference(a, b, n), number=1, repeat=3)))
+    assert np.allclose(result, apply_reference(a, b, n))
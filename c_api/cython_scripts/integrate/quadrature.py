@@ -0,0 +1,192 @@
+"""
+integrals of f over [a, b] without millions of evaluations
+
+integrate_f sums f at N left points, the error shrinks as 1 / N, so 1e-7 takes N = 2e7; for a smooth f
+
+    - exact: the closed form of f(x) = x ** 2 - x
+    - gauss_legendre: n nodes are exact for polynomials of degree 2n - 1, machine precision for smooth f
+    - adaptive_simpson: halves the subintervals until the local error is below tol
+    - riemann_sum: the left sum of integrate_f, numpy over grids of at most 2 CHUNK points
+
+all of them are vectorized over arrays of intervals a, b (broadcast), e.g. the columns of
+pandas_perf/main.py, and take func vectorized over arrays
+"""
+import functools
+
+import numpy as np
+
+CHUNK = 1 << 20
+
+
+def f(x):
+    return x * x - x
+
+
+def exact(a, b):
+    """integral of f(x) = x ** 2 - x, F(x) = x ** 3 / 3 - x ** 2 / 2"""
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    return (b**3 - a**3) / 3 - (b**2 - a**2) / 2
+
+
+def _grid_sums(func, a, dx, n):
+    """sum of func over the left points of every interval, one grid of sum(n) points, n > 0"""
+    offsets = np.concatenate([[0], np.cumsum(n)[:-1]])
+    # position of every point within its interval
+    steps = np.arange(n.sum()) - np.repeat(offsets, n)
+    return np.add.reduceat(func(np.repeat(a, n) + steps * np.repeat(dx, n)), offsets)
+
+
+def riemann_sum(func, a, b, n):
+    """
+    left riemann sum with n points, integrate_f of the cython kernels, 0 for n = 0
+    intervals of at most CHUNK points share grids of under 2 CHUNK points, summed per interval; longer ones
+    are summed over chunks of CHUNK points, so the memory is bounded whatever n
+    """
+    a, b, n = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float), np.asarray(n, dtype=np.int64))
+    shape = a.shape
+    a, b, n = a.ravel(), b.ravel(), n.ravel()
+    dx = np.divide(b - a, n, out=np.zeros(len(n)), where=n > 0)
+    sums = np.zeros(len(n))
+
+    short = np.flatnonzero((n > 0) & (n <= CHUNK))
+    # grid of the intervals starting within the same CHUNK points
+    batches = (np.cumsum(n[short]) - n[short]) // CHUNK
+    for rows in np.split(short, np.flatnonzero(np.diff(batches)) + 1):
+        if len(rows):
+            sums[rows] = _grid_sums(func, a[rows], dx[rows], n[rows])
+
+    for i in np.flatnonzero(n > CHUNK):
+        for start in range(0, int(n[i]), CHUNK):
+            sums[i] += np.sum(func(a[i] + np.arange(start, min(start + CHUNK, int(n[i]))) * dx[i]))
+
+    return (sums * dx).reshape(shape)[()]
+
+
+@functools.lru_cache(maxsize=None)
+def _legendre(n):
+    return np.polynomial.legendre.leggauss(n)
+
+
+def gauss_legendre(func, a, b, n=20):
+    """gauss-legendre rule with n nodes, func is evaluated once on all nodes of all intervals"""
+    nodes, weights = _legendre(n)
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+    half, mid = (b - a) / 2, (b + a) / 2
+    return func(mid[..., None] + half[..., None] * nodes) @ weights * half
+
+
+def _simpson(fa, fm, fb, width):
+    return width / 6 * (fa + 4 * fm + fb)
+
+
+def adaptive_simpson(func, a, b, tol=1e-10, max_depth=50):
+    """
+    adaptive simpson rule, tol is the absolute error per interval
+    the subintervals of all intervals are refined together, one func call per level: a subinterval is
+    kept when its two halves agree within 15 tol (tol halves with every split), richardson corrected,
+    which makes the error of smooth func far below tol
+    """
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+    shape = a.shape
+    left, right = a.ravel(), b.ravel()
+    ids = np.arange(len(left))
+    result = np.zeros(len(left))
+
+    values = func(np.concatenate([left, (left + right) / 2, right]))
+    fa, fm, fb = np.split(values, 3)
+    whole = _simpson(fa, fm, fb, right - left)
+    tols = np.full(len(left), float(tol))
+
+    for depth in range(max_depth + 1):
+        mid = (left + right) / 2
+        quarters = func(np.concatenate([(left + mid) / 2, (mid + right) / 2]))
+        flm, fmr = np.split(quarters, 2)
+        halves_left = _simpson(fa, flm, fm, mid - left)
+        halves_right = _simpson(fm, fmr, fb, right - mid)
+        error = halves_left + halves_right - whole
+
+        done = (np.abs(error) <= 15 * tols) | (depth == max_depth)
+        np.add.at(result, ids[done], (halves_left + halves_right + error / 15)[done])
+        if done.all():
+            break
+
+        # both halves of the rest, tol shared between them
+        todo = ~done
+        left, mid, right = left[todo], mid[todo], right[todo]
+        fa, flm, fm, fmr, fb = fa[todo], flm[todo], fm[todo], fmr[todo], fb[todo]
+        ids, tols = np.tile(ids[todo], 2), np.tile(tols[todo] / 2, 2)
+        left, right = np.concatenate([left, mid]), np.concatenate([mid, right])
+        fa, fm, fb = np.concatenate([fa, fm]), np.concatenate([flm, fmr]), np.concatenate([fm, fb])
+        whole = np.concatenate([halves_left[todo], halves_right[todo]])
+
+    return result.reshape(shape) if shape else result[0]
+
+
+METHODS = ("exact", "gauss", "simpson", "riemann")
+
+
+def integrate_intervals(a, b, method="gauss", func=f, **kwargs):
+    """
+    integral of func over every interval [a_i, b_i], vectorized over the intervals
+
+    :param method: exact (f only), gauss (n=20 nodes), simpson (tol=1e-10) or riemann (n points, required)
+    :param kwargs: of the method
+    :return: array of the shape of a and b broadcast
+    """
+    assert method in METHODS, f"method must be one of {METHODS}"
+    if method == "exact":
+        assert func is f, "the closed form is of f(x) = x ** 2 - x"
+        return exact(a, b)
+    if method == "gauss":
+        return gauss_legendre(func, a, b, **kwargs)
+    if method == "simpson":
+        return adaptive_simpson(func, a, b, **kwargs)
+    return riemann_sum(func, a, b, **kwargs)
+
+
+if __name__ == "__main__":
+    import time
+
+    from c_api.cython_scripts.integrate import integrate_f_reference
+
+    class Counted(object):
+        def __init__(self, func):
+            self.func = func
+            self.n_evaluations = 0
+
+        def __call__(self, x):
+            self.n_evaluations += np.size(x)
+            return self.func(x)
+
+    # integrate_f(1, 2, N) against the closed form
+    truth = exact(1.0, 2.0)
+    assert np.isclose(riemann_sum(f, 1.0, 2.0, 100_000), integrate_f_reference(1.0, 2.0, 100_000))
+    print(f"riemann 2e7: error {abs(riemann_sum(f, 1.0, 2.0, 20_000_000) - truth):.1e}, 20000000 evaluations")
+    for name, rule in [("gauss", lambda g: gauss_legendre(g, 1.0, 2.0, n=5)),
+                       ("simpson", lambda g: adaptive_simpson(g, 1.0, 2.0))]:
+        counted = Counted(f)
+        error = abs(rule(counted) - truth)
+        print(f"{name}: error {error:.1e}, {counted.n_evaluations} evaluations")
+        assert error < 1e-14 and counted.n_evaluations < 1000
+
+    # not a polynomial: adaptive refinement, machine precision in hundreds of evaluations
+    counted = Counted(np.exp)
+    value = adaptive_simpson(counted, 0.0, 3.0)
+    print(f"simpson exp: error {abs(value - np.expm1(3)):.1e}, {counted.n_evaluations} evaluations")
+    assert np.isclose(value, np.expm1(3), rtol=1e-13, atol=0) and counted.n_evaluations < 1000
+    assert np.isclose(gauss_legendre(np.exp, 0.0, 3.0), np.expm1(3), rtol=1e-14)
+
+    # batched, as the columns of pandas_perf/main.py
+    rng = np.random.default_rng(0)
+    a, b, n = rng.normal(size=1000), rng.normal(size=1000), rng.integers(100, 1000, 1000)
+    start = time.perf_counter()
+    loop = np.array([integrate_f_reference(*row) for row in zip(a.tolist(), b.tolist(), n.tolist())])
+    print(f"python loop: {time.perf_counter() - start:.3f}s")
+    assert np.allclose(integrate_intervals(a, b, "riemann", n=n), loop)
+    for method in ("exact", "gauss", "simpson"):
+        start = time.perf_counter()
+        values = integrate_intervals(a, b, method)
+        print(f"{method}: {time.perf_counter() - start:.4f}s")
+        assert values.shape == (1000,) and np.allclose(values, exact(a, b), rtol=1e-12, atol=1e-12)
+    assert np.allclose(integrate_intervals(a, b, "simpson", func=np.sin), np.cos(a) - np.cos(b), atol=1e-11)
+    assert integrate_intervals(a.reshape(10, 100), b.reshape(10, 100), "gauss").shape == (10, 100)
@@ -1,20 +1,36 @@
+"""
+::
+
+    python3.9 setup.py build_ext --inplace
+
+    # benchmarks, from the repo root
+    pytest c_api/cython_scripts/integrate/benchmarks --benchmark-group-by=group
+
+    # html report
+    cython -a _kernels.pyx integrate_cy.pyx integrate_cy_cdef.pyx integrate_cy_naive.pyx
+
+"""
+import sys
+
 from Cython.Build import cythonize
-from setuptools import setup
+from setuptools import Extension, setup
 
-setup(
-    name="new app",
-    ext_modules=cythonize("integrate_cy.pyx"),
-    zip_safe=False,
-)
+# OpenMP for the prange kernels, MSVC spells it differently
+if sys.platform == "win32":
+    compile_args, link_args = ["/O2", "/openmp"], []
+else:
+    compile_args, link_args = ["-O3", "-fopenmp"], ["-fopenmp"]
 
-setup(
-    name="new app 2",
-    ext_modules=cythonize("integrate_cy_naive.pyx"),
-    zip_safe=False,
-)
+extensions = [
+    Extension("_kernels", ["_kernels.pyx"], extra_compile_args=compile_args, extra_link_args=link_args),
+    # the steps from python to typed code, for the benchmarks
+    Extension("integrate_cy_naive", ["integrate_cy_naive.pyx"]),
+    Extension("integrate_cy", ["integrate_cy.pyx"]),
+    Extension("integrate_cy_cdef", ["integrate_cy_cdef.pyx"]),
+]
 
 setup(
-    name="new app 3",
-    ext_modules=cythonize("integrate_cy_cdef.pyx"),
+    name="integrate",
+    ext_modules=cythonize(extensions, compiler_directives={"language_level": 3}),
     zip_safe=False,
 )
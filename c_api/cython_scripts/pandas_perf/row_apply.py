@@ -0,0 +1,159 @@
+"""
+row-wise functions of DataFrame columns without df.apply(axis=1)
+
+df.apply(lambda x: integrate_f(x["a"], x["b"], x["N"]), axis=1) builds a Series per row; here the columns
+are taken once as contiguous arrays and the kernel runs in a loop compiled by numba, without the gil,
+optionally over row ranges on threads:
+
+    apply_rows(integrate_f, df, ["a", "b", "N"], n_threads=4)
+
+the kernel is a scalar function of the column values of a row, numba compiles it (nopython), so the
+functions it calls must be numba compiled too; without numba, or with a cython kernel (engine="python"),
+the loop runs in python over the arrays, still without a Series per row
+"""
+import functools
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+    from numba.core.registry import CPUDispatcher
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+ENGINES = ("numba", "python")
+# numba when installed, so the default does not warn without it
+DEFAULT_ENGINE = "numba" if NUMBA_AVAILABLE else "python"
+
+
+def resolve_engine(engine):
+    assert engine in ENGINES, f"engine must be one of {ENGINES}"
+    if engine == "numba" and not NUMBA_AVAILABLE:
+        warnings.warn("numba is not installed, falling back to the python engine")
+        return "python"
+    return engine
+
+
+def _column(series):
+    """contiguous numpy array of a column, nullable extension dtypes as float with nan"""
+    if not (pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype)):
+        raise TypeError(f"column {series.name} is {series.dtype}, kernels take numeric columns")
+    if isinstance(series.dtype, np.dtype):
+        return np.ascontiguousarray(series.to_numpy())
+    return np.ascontiguousarray(series.to_numpy(dtype=np.float64, na_value=np.nan))
+
+
+@functools.lru_cache(maxsize=None)
+def _compiled_loop(kernel, n_args):
+    """njit loop of out[i] = kernel(c0[i], c1[i], ...) over a row range, once per kernel and no of columns"""
+    if not isinstance(kernel, CPUDispatcher):
+        kernel = njit(nogil=True)(kernel)
+    args = ", ".join(f"c{j}" for j in range(n_args))
+    values = ", ".join(f"c{j}[i]" for j in range(n_args))
+    namespace = {"kernel": kernel}
+    exec(f"def loop(out, start, stop, {args}):\n"
+         f"    for i in range(start, stop):\n"
+         f"        out[i] = kernel({values})\n", namespace)
+    return njit(nogil=True)(namespace["loop"])
+
+
+def _python_loop(kernel, out, start, stop, *arrays):
+    kernel = getattr(kernel, "py_func", kernel)
+    for i, row in enumerate(zip(*(array[start:stop].tolist() for array in arrays)), start):
+        out[i] = kernel(*row)
+
+
+def apply_rows(kernel, df, columns, n_threads=1, dtype=np.float64, engine=DEFAULT_ENGINE):
+    """
+    kernel(*row values of columns) for every row of df
+
+    :param kernel: scalar function, python (compiled here) or numba njit, or any callable with engine="python"
+    :param columns: names of the columns passed to the kernel, in order
+    :param n_threads: no of threads, the rows are split in contiguous ranges, one per thread
+    :param dtype: dtype of the result
+    :param engine: numba or python, default numba when installed
+    :return: Series on the index of df
+    """
+    engine = resolve_engine(engine)
+    arrays = [_column(df[col]) for col in columns]
+    n = len(df)
+    out = np.empty(n, dtype=dtype)
+    loop = _compiled_loop(kernel, len(arrays)) if engine == "numba" else functools.partial(_python_loop, kernel)
+
+    n_threads = max(1, min(n_threads, n))
+    if n_threads == 1:
+        loop(out, 0, n, *arrays)
+    else:
+        bounds = np.linspace(0, n, n_threads + 1).astype(np.int64)
+        with ThreadPoolExecutor(max_workers=n_threads) as executor:
+            # list to raise the errors of the threads
+            list(executor.map(lambda start, stop: loop(out, start, stop, *arrays), bounds[:-1], bounds[1:]))
+    return pd.Series(out, index=df.index)
+
+
+if __name__ == "__main__":
+    import time
+
+    def f(x):
+        return x * (x - 1)
+
+    def integrate_f(a, b, N):
+        s = 0
+        dx = (b - a) / N
+        for i in range(N):
+            s += f(a + i * dx)
+        return s * dx
+
+    rng = np.random.default_rng(0)
+    n_rows = 10_000
+    df = pd.DataFrame(
+        {
+            "a": rng.normal(size=n_rows),
+            "b": rng.normal(size=n_rows),
+            "N": rng.integers(100, 1000, n_rows),
+            "x": "x",
+        },
+        index=pd.RangeIndex(n_rows)[::-1] * 2,
+    )
+
+    start = time.perf_counter()
+    expected = df.apply(lambda x: integrate_f(x["a"], x["b"], x["N"]), axis=1)
+    print(f"df.apply: {time.perf_counter() - start:.3f}s")
+
+    # python engine: same loop, no Series per row
+    result = apply_rows(integrate_f, df, ["a", "b", "N"], engine="python", n_threads=3)
+    assert result.index.equals(df.index) and np.allclose(result, expected)
+
+    # numba, when installed: the helper the kernel calls is compiled too
+    if NUMBA_AVAILABLE:
+        f = njit(f)
+
+        @njit(nogil=True)
+        def integrate_f_nb(a, b, N):
+            s = 0.0
+            dx = (b - a) / N
+            for i in range(N):
+                s += f(a + i * dx)
+            return s * dx
+
+        apply_rows(integrate_f_nb, df.iloc[:10], ["a", "b", "N"])  # compile
+        for n_threads in (1, 4):
+            start = time.perf_counter()
+            result = apply_rows(integrate_f_nb, df, ["a", "b", "N"], n_threads=n_threads)
+            print(f"apply_rows numba, {n_threads} threads: {time.perf_counter() - start:.4f}s")
+            assert result.index.equals(df.index) and np.allclose(result, expected)
+
+    # a plain python kernel is compiled (numba engine), nullable columns come as float with nan
+    nullable = pd.DataFrame({"a": pd.array([1, None, 3], dtype="Int64"), "b": [1.0, 2.0, 3.0]})
+    result = apply_rows(lambda a, b: a * b, nullable, ["a", "b"])
+    assert np.allclose(result, [1.0, np.nan, 9.0], equal_nan=True)
+    try:
+        apply_rows(integrate_f, df, ["x", "b", "N"])
+        raise AssertionError("object column")
+    except TypeError:
+        pass
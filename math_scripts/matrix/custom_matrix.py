@@ -1,5 +1,10 @@
+import math
+
+import math_scripts.matrix.matrix_io as matrix_io
+import math_scripts.matrix.sparse_support as sparse_support
 import numpy as np
 import pandas as pd
+from scipy import sparse
 
 
 class CustomMatrix(object):
@@ -14,11 +19,35 @@ class CustomMatrix(object):
         - to be used as a base class for more specialized matrixes, with more
             functionalities
 
+    Data is cleaned (copied, None / nan / inf replaced, converted to float) once,
+    when it enters through the constructor or from_dataframe. Results of internal
+    operations are already clean and are wrapped with from_clean, without copy:
+    indexing, T and reshape return views of the same buffer, like numpy.
+
+    The matrix is a dense numpy array, or a scipy.sparse csr / csc array for
+    mostly zero 2D matrixes: backend="sparse" / "csr" / "csc", or "auto" by density.
+    Operators keep sparse results sparse when zeros stay zeros (e.g. * / @ sum of
+    sparse matrixes) and densify otherwise (e.g. adding a scalar), numpy functions
+    run on the dense array.
     """
 
-    # invariant: matrix is a numpy array or matrix
-    def __init__(self, matrix: np.ndarray | np.matrix | int | float):
-        if isinstance(matrix, np.matrix):
+    # ufuncs that keep finite inputs finite, results of any other ufunc are cleaned in place,
+    # incl. add / subtract / multiply / matmul, which overflow to inf
+    _FINITE_UFUNCS = frozenset(
+        [np.negative, np.positive, np.absolute, np.maximum, np.minimum, np.fmax, np.fmin,
+         np.sign, np.floor, np.ceil, np.rint, np.trunc,
+         np.equal, np.not_equal, np.less, np.less_equal, np.greater, np.greater_equal,
+         np.logical_and, np.logical_or, np.logical_xor, np.logical_not]
+    )
+
+    # invariant: matrix is a numpy array, or a csr / csc array without stored zeros
+    #   backend: dense, sparse (csr), csr, csc or auto, default as the input
+    def __init__(self, matrix: np.ndarray | np.matrix | sparse.sparray | int | float, backend=None):
+        if sparse.issparse(matrix):
+            if matrix.ndim != 2:
+                raise TypeError(f"Input sparse array is not 2D, but {matrix.ndim}D")
+            matrix = sparse_support.clean_sparse(matrix, copy=True)
+        elif isinstance(matrix, np.matrix):
             matrix = self.clean_array(matrix)
         elif isinstance(matrix, np.ndarray):
             if matrix.ndim > 2:
@@ -37,12 +66,12 @@ class CustomMatrix(object):
                 "Input matrix is not a numpy array or matrix or int or float, "
                 f"but {type(matrix)}"
             )
-        self.matrix = matrix
+        self.matrix = sparse_support.to_backend(matrix, backend)
 
     # initialize from a pandas DataFrame
     # require all numeric
     @classmethod
-    def from_dataframe(cls, df: pd.DataFrame):
+    def from_dataframe(cls, df: pd.DataFrame, backend=None):
         if not isinstance(df, pd.DataFrame):
             raise TypeError(f"Input is not a pandas DataFrame, but {type(df)}")
         if not df.select_dtypes(include=np.number).columns.equals(df.columns):
@@ -50,36 +79,97 @@ class CustomMatrix(object):
 
         # convert to numpy array, each row in df becomes rows in the matrix
         matrix = df.to_numpy()  # .T
-        return cls(matrix)
+        return cls(matrix, backend=backend)
 
     def to_dataframe(self):
-        return pd.DataFrame(self.matrix)
+        return pd.DataFrame(self.toarray())
 
     def to_csv(self, path, **kwargs):
         self.to_dataframe().to_csv(path, **kwargs)
 
+    # binary save / load, see matrix_io: .npy (dense) or .npz (sparse), metadata in a json sidecar
+    def save(self, path):
+        return matrix_io.save_matrix(path, self.matrix, self._metadata())
+
+    # mmap_mode: r, r+ or c to memory-map a dense matrix instead of reading it
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        matrix, metadata = matrix_io.load_matrix(path, mmap_mode=mmap_mode)
+        return cls._from_saved(matrix, metadata)
+
+    # metadata saved with the matrix, subclasses add theirs
+    def _metadata(self):
+        return {}
+
+    @classmethod
+    def _from_saved(cls, matrix, metadata):
+        return cls.from_clean(matrix)
+
     # initialize list of mat from a pandas dataframe with a column of label that
     #  will be used as the index for matrixes
+    #   matrixes are views of consecutive rows of one clean array, see group_rows_by_label
     @classmethod
     def from_dataframe_with_label(cls, df: pd.DataFrame, label: str):
-        labels = np.sort(df[label].unique())
-        df_list = [df[df[label] == l].drop(columns=label).copy() for l in labels]
-        matrixes = [cls.from_dataframe(df) for df in df_list]
+        labels, offsets, matrix = group_rows_by_label(df, label)
+        matrixes = [cls.from_clean(matrix[start:stop]) for start, stop in zip(offsets[:-1], offsets[1:])]
         return matrixes
 
+    # trusted fast path for clean data, e.g. results of internal operations
+    #   matrix must be a float numpy array without nan / inf, it is used as is: no copy, no cleaning
+    @classmethod
+    def from_clean(cls, matrix: np.ndarray):
+        obj = cls.__new__(cls)
+        obj.matrix = matrix
+        return obj
+
+    # wrap the result of an internal operation, same class (and metadata in subclasses) as self
+    def _wrap(self, matrix: np.ndarray):
+        return self.from_clean(matrix)
+
+    # lazy expression of elementwise operations, evaluated at once, see LazyMatrix
+    def lazy(self):
+        from math_scripts.matrix.lazy_matrix import LazyMatrix
+
+        return LazyMatrix.leaf(self)
+
+    # backend
+    @property
+    def is_sparse(self):
+        return sparse.issparse(self.matrix)
+
+    @property
+    def density(self):
+        return sparse_support.density(self.matrix)
+
+    # dense numpy array, the buffer itself when dense
+    def toarray(self):
+        return sparse_support.to_dense(self.matrix)
+
+    def to_dense(self):
+        return self._wrap(self.toarray()) if self.is_sparse else self
+
+    def to_sparse(self, format="csr"):
+        return self._wrap(sparse_support.to_backend(self.matrix, format))
+
+    # sparse results of indexing / reshape: 2D in the same format, 1D dense
+    def _wrap_sparse(self, matrix):
+        if matrix.ndim == 2:
+            return self._wrap(sparse_support.clean_sparse(matrix, self.matrix.format, trusted=True))
+        return self._wrap(matrix.toarray())
+
     # copy
     def copy(self):
-        return self.__class__(self.matrix)
+        return self._wrap(self.matrix.copy())
 
     # clean the input matrix
     #   fill all sorts of nan, NA, None with 0
     #   convert to float
+    #   a single float copy, nan and inf are then replaced in place
     def clean_array(self, matrix):
-        matrix = matrix.copy()
-        matrix = np.where(matrix == None, 0, matrix)
-        matrix = matrix.astype(float)
-        matrix = np.nan_to_num(matrix)
-        return matrix
+        if matrix.dtype == object:
+            matrix = np.where(matrix == None, 0, matrix)  # noqa: E711
+        matrix = np.array(matrix, dtype=float)
+        return np.nan_to_num(matrix, copy=False)
 
     # display the matrix
     #  use the __str__ method
@@ -97,42 +187,142 @@ class CustomMatrix(object):
             payload += f"\n{self.matrix}"
         else:
             payload = f"CustomMatrix: {self.shape}"
+            if self.is_sparse:
+                payload += f", sparse {self.matrix.format}, density: {self.density:.2%}"
             row, col = self.shape
             if row > 5 or col > 5:
                 payload += ", Top 5 rows and columns:"
-                payload += f"\n{self.matrix[:5, :5]}"
+                payload += f"\n{sparse_support.to_dense(self.matrix[:5, :5])}"
             else:
-                payload += f"\n{self.matrix}"
+                payload += f"\n{self.toarray()}"
 
         return payload
 
     # despatch various operations to numpy
     def _dispatch_to_numpy(self, other, method):
         if isinstance(other, CustomMatrix):
-            return self.__class__(method(self.matrix, other.matrix))
+            operand = other.matrix
+            trusted = True
         elif isinstance(other, np.ndarray):
-            res = method(self.matrix, other)
-            return self.__class__(res)
+            # external data, may contain nan
+            operand = other
+            trusted = False
         elif isinstance(other, (int, float)):
-            return self.__class__(method(self.matrix, other))
+            operand = other
+            trusted = bool(np.isfinite(other))
         else:
+            from math_scripts.matrix.lazy_matrix import LazyMatrix
+            from math_scripts.matrix.matrix_batch import MatrixBatch
+
+            if isinstance(other, (LazyMatrix, MatrixBatch)):
+                # let the expression build the tree, e.g. cm - lazy, or the batch broadcast
+                return NotImplemented
             raise TypeError(
                 f"Cannot operate on a CustomMatrix and a {type(other)} object. "
                 "Try converting it to a CustomMatrix first."
             )
 
+        res = None
+        if self.is_sparse or sparse.issparse(operand):
+            res = sparse_support.sparse_operation(self.matrix, operand, method)
+        if res is None:
+            res = method(self.toarray(), sparse_support.to_dense(operand))
+        return self._from_result(res, trusted and method in self._FINITE_UFUNCS)
+
+    # wrap a fresh numpy result, cleaning it in place only when it may hold nan / inf
+    def _from_result(self, res, trusted=True):
+        if sparse.issparse(res):
+            format = self.matrix.format if self.is_sparse else None
+            return self._wrap(sparse_support.clean_sparse(res, format, trusted=trusted))
+        if not isinstance(res, np.ndarray) or res.ndim == 0:
+            res = np.array([res], dtype=float)
+        elif res.dtype != np.float64:
+            # e.g. booleans of comparisons
+            res = res.astype(float)
+        if not trusted:
+            np.nan_to_num(res, copy=False)
+        return self._wrap(res)
+
+    # numpy protocols
+    #   numpy functions and ufuncs run on the underlying buffer, float 1D / 2D results
+    #   come back as the same class, other results (scalars, booleans, indices) as they are
+    def __array__(self, dtype=None, copy=None):
+        matrix = self.toarray()
+        if dtype is not None and np.dtype(dtype) != matrix.dtype:
+            return matrix.astype(dtype)
+        return matrix.copy() if copy and not self.is_sparse else matrix
+
+    def _wrap_numpy_result(self, res, inputs, trusted):
+        if not isinstance(res, np.ndarray) or res.dtype.kind != "f" or res.ndim not in (1, 2):
+            return res
+        if res.dtype != np.float64:
+            res = res.astype(float)
+        # views of clean buffers are clean, fresh results are cleaned in place when needed
+        elif not trusted and not any(
+            isinstance(x, CustomMatrix) and not x.is_sparse and np.may_share_memory(res, x.matrix)
+            for x in inputs
+        ):
+            np.nan_to_num(res, copy=False)
+        return self._wrap_for(res, inputs)
+
+    # wrap a result computed from several inputs, subclasses combine their metadata here
+    def _wrap_for(self, matrix, inputs):
+        return self._wrap(matrix)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, out=None, **kwargs):
+        args = [_unwrap(x) for x in inputs]
+        if out is not None:
+            if any(isinstance(x, CustomMatrix) and x.is_sparse for x in out):
+                raise TypeError("out= cannot be a sparse CustomMatrix, convert it with to_dense() first")
+            kwargs["out"] = tuple(_unwrap(x) for x in out)
+
+        results = getattr(ufunc, method)(*args, **kwargs)
+        if method == "at":
+            return None
+
+        trusted = ufunc in self._FINITE_UFUNCS and all(
+            isinstance(x, CustomMatrix) or (np.isscalar(x) and np.isfinite(x)) for x in inputs
+        )
+        if out is not None:
+            # evaluated in place, hand back the given out objects
+            for buffer in kwargs["out"]:
+                if not trusted and buffer.dtype.kind == "f":
+                    np.nan_to_num(buffer, copy=False)
+            return out[0] if len(out) == 1 else out
+
+        if ufunc.nout == 1:
+            return self._wrap_numpy_result(results, inputs, trusted)
+        return tuple(self._wrap_numpy_result(res, inputs, trusted) for res in results)
+
+    def __array_function__(self, func, types, args, kwargs):
+        if not all(issubclass(t, (CustomMatrix, np.ndarray)) for t in types):
+            return NotImplemented
+        out = kwargs.get("out")
+        res = func(*_unwrap(args), **_unwrap(kwargs))
+        if out is not None:
+            return out
+
+        inputs = [x for x in _flatten(args) if isinstance(x, CustomMatrix)]
+        if isinstance(res, tuple):
+            return tuple(self._wrap_numpy_result(r, inputs, False) for r in res)
+        return self._wrap_numpy_result(res, inputs, False)
+
     # some magical methods
     def __getitem__(self, key):
         res = self.matrix[key]
         if isinstance(res, np.ndarray):
-            res = self.__class__(res)
+            res = self._wrap(res)
+        elif sparse.issparse(res):
+            res = self._wrap_sparse(res)
         return res
 
     def __setitem__(self, key, value):
         self.matrix[key] = value
+        if self.is_sparse:
+            self.matrix.eliminate_zeros()
 
     def __len__(self):
-        return len(self.matrix)
+        return self.shape[0]
 
     def __and__(self, other):
         return self._dispatch_to_numpy(other, np.logical_and)
@@ -161,7 +351,7 @@ class CustomMatrix(object):
         return self.matrix.sum(axis=axis)
 
     def flatten(self):
-        return self.matrix.flatten()
+        return self.toarray().flatten()
 
     @property
     def shape(self):
@@ -169,7 +359,7 @@ class CustomMatrix(object):
 
     @property
     def size(self):
-        return self.matrix.size
+        return math.prod(self.shape)
 
     @property
     def ndim(self):
@@ -177,30 +367,37 @@ class CustomMatrix(object):
 
     @property
     def T(self):
-        return self.__class__(self.matrix.T)
+        return self._wrap(self.matrix.T)
 
     def reshape(self, *args, **kwargs):
-        return self.__class__(self.matrix.reshape(*args, **kwargs))
+        if self.is_sparse:
+            return self._wrap_sparse(self.matrix.reshape(*args, **kwargs))
+        return self._wrap(self.matrix.reshape(*args, **kwargs))
 
     def mean(self, axis=None):
         return self.matrix.mean(axis=axis)
 
     def std(self, axis=None):
-        return self.matrix.std(axis=axis)
+        return self.toarray().std(axis=axis)
 
     def min(self, axis=None):
-        return self.matrix.min(axis=axis)
+        return sparse_support.to_dense(self.matrix.min(axis=axis))
 
     def max(self, axis=None):
-        return self.matrix.max(axis=axis)
+        return sparse_support.to_dense(self.matrix.max(axis=axis))
 
     def median(self, axis=None):
-        return np.median(self.matrix, axis=axis)
+        return np.median(self.toarray(), axis=axis)
 
+    # sparse: from the index structure
     def count_nonzero(self, axis=None):
+        if self.is_sparse:
+            return sparse_support.count_nonzero(self.matrix, axis=axis)
         return np.count_nonzero(self.matrix, axis=axis)
 
     def row_all_zero(self):
+        if self.is_sparse:
+            return sparse_support.count_nonzero(self.matrix, axis=1) == 0
         if self.ndim == 1:
             axis = 0
         else:
@@ -248,6 +445,53 @@ class CustomMatrix(object):
         return self._dispatch_to_numpy(other, np.matmul)
 
 
+def group_rows_by_label(df: pd.DataFrame, label: str):
+    """
+    group the rows of a dataframe by a label column in one pass
+        - the label is factorized (sorted) once, rows are ordered by a stable sort of the codes
+        - the numeric columns become one clean, C-contiguous float array in that order
+        - rows of the i-th label are matrix[offsets[i]:offsets[i + 1]]
+    rows with a missing label are dropped
+
+    :return: sorted labels, offsets (len(labels) + 1), matrix
+    """
+    if not isinstance(df, pd.DataFrame):
+        raise TypeError(f"Input is not a pandas DataFrame, but {type(df)}")
+    values = df.drop(columns=label)
+    if not values.select_dtypes(include=np.number).columns.equals(values.columns):
+        raise TypeError("Not all columns are numeric")
+
+    codes, labels = pd.factorize(df[label], sort=True)
+    order = np.argsort(codes, kind="stable")
+    # missing labels have code -1, they sort first
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(codes[codes >= 0], minlength=len(labels)))])
+    offsets += len(codes) - offsets[-1]
+
+    # rows taken in label order into a fresh array, cleaned in place
+    matrix = np.take(values.to_numpy(dtype=float), order[offsets[0]:], axis=0)
+    matrix = np.nan_to_num(matrix, copy=False)
+    return np.asarray(labels), offsets - offsets[0], matrix
+
+
+# replace CustomMatrix by its (dense) buffer, also inside the (nested) lists / tuples / dicts numpy functions take
+def _unwrap(obj):
+    if isinstance(obj, CustomMatrix):
+        return obj.toarray()
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_unwrap(x) for x in obj)
+    if isinstance(obj, dict):
+        return {k: _unwrap(v) for k, v in obj.items()}
+    return obj
+
+
+def _flatten(obj):
+    if isinstance(obj, (list, tuple)):
+        for x in obj:
+            yield from _flatten(x)
+    else:
+        yield obj
+
+
 if __name__ == "__main__":
     # if run interactively
     """
@@ -325,6 +569,16 @@ if __name__ == "__main__":
     lst[1]
     lst[2]
 
+    # grouped in one pass: views of one array, same as filtering label by label
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(1000, 3)), columns=list("abc"))
+    df["b"] = df["b"].where(df["b"] > -1)
+    df["label"] = rng.choice(["x", "y", "z", None], 1000)
+    lst = CustomMatrix.from_dataframe_with_label(df, "label")
+    assert len(lst) == 3 and lst[0].matrix.base is lst[2].matrix.base
+    for cm, l in zip(lst, ["x", "y", "z"]):
+        assert np.array_equal(cm.matrix, CustomMatrix.from_dataframe(df[df["label"] == l].drop(columns="label")).matrix)
+
     # from 1d array
     m = np.array([1, 2, 3])
     cm = CustomMatrix(m)
@@ -415,6 +669,12 @@ if __name__ == "__main__":
     # unary minus
     assert (-cm)[0, 0] == -1
 
+    # overflow of clean inputs is cleaned like the constructor does, to +/- max float
+    big = CustomMatrix(np.full((2, 2), 1e308))
+    with np.errstate(over="ignore"):
+        for res in [big * 10, big + big, big - -big, big @ big, np.multiply(big, big), -big * 10]:
+            assert np.isfinite(res.matrix).all()
+
     # average of 3 matrices
     cm2 = CustomMatrix(m) * 2
     cm3 = CustomMatrix(m) - 1
@@ -462,3 +722,87 @@ if __name__ == "__main__":
     cm = CustomMatrix(m)
     assert cm.count_nonzero() == 5
     assert (cm.row_all_zero() == np.array([False, True, False])).sum() == 3
+
+    # results of internal operations are not cleaned again, but stay clean
+    cm = CustomMatrix(np.array([[1.0, 2.0], [3.0, 4.0]]))
+    res = cm + cm
+    assert res.matrix.dtype == np.float64 and isinstance(res, CustomMatrix)
+    assert np.shares_memory(cm.T.matrix, cm.matrix)
+    assert not np.shares_memory(cm.copy().matrix, cm.matrix)
+    assert (cm / 0).max() == np.finfo(float).max
+    assert (cm - cm / 0 * 0).sum() == cm.sum()
+    assert (cm + np.array([np.nan, 1.0]))[0, 0] == 0
+    assert (cm > 2).sum() == 2 and (cm > 2).matrix.dtype == np.float64
+    assert (cm[0, :] @ cm[:, 0]).shape == (1,)
+
+    # numpy protocols, ufuncs / functions run on the buffer and return CustomMatrix
+    cm = CustomMatrix(np.array([[1.0, 2.0], [3.0, 4.0]]))
+    assert np.shares_memory(np.asarray(cm), cm.matrix)
+    assert isinstance(np.exp(cm), CustomMatrix) and np.exp(cm)[0, 0] == np.e
+    assert isinstance(np.mean(cm, axis=0), CustomMatrix) and np.sum(cm) == 10
+    assert np.concatenate([cm, cm]).shape == (4, 2)
+    assert np.isclose(cm, cm).all() and np.argmax(cm) == 3
+    assert (np.ones((2, 2)) + cm)[0, 0] == 2 and isinstance(np.ones((2, 2)) + cm, CustomMatrix)
+    assert np.log(cm - 1)[0, 0] == -np.finfo(float).max
+    # in place with out=
+    buffer = cm.matrix
+    res = np.multiply(cm, 2, out=cm)
+    assert res is cm and cm.matrix is buffer and cm[1, 1] == 8
+    np.sqrt(cm, out=cm)
+    assert cm[1, 1] == np.sqrt(8)
+
+    # sparse backend, same operator surface
+    m = np.zeros((6, 5))
+    m[[0, 2, 2, 5], [1, 0, 4, 4]] = [1.0, 2.0, np.nan, 3.0]
+    dense = CustomMatrix(m)
+    cm = CustomMatrix(m, backend="sparse")
+    assert cm.is_sparse and cm.matrix.format == "csr" and cm.matrix.nnz == 3
+    assert CustomMatrix(m, backend="auto").is_sparse is False
+    assert CustomMatrix(np.eye(20), backend="auto").is_sparse
+    assert CustomMatrix(sparse.coo_array(m), backend="csc").matrix.format == "csc"
+    assert np.array_equal(cm.count_nonzero(axis=0), dense.count_nonzero(axis=0))
+    assert np.array_equal(cm.count_nonzero(axis=1), dense.count_nonzero(axis=1))
+    assert np.array_equal(cm.row_all_zero(), dense.row_all_zero())
+    assert np.array_equal(cm.T.row_all_zero(), dense.T.row_all_zero()) and cm.T.matrix.format == "csc"
+    # zeros stay zeros: sparse, otherwise dense
+    for res, expected in [(cm * 2, dense * 2), (cm / 0, dense / 0), (cm**2, dense**2), (cm > 1, dense > 1),
+                          (cm + cm, dense + dense), (cm - cm.T.T, dense - dense), (cm * m, dense * m),
+                          (cm @ cm.T, dense @ dense.T), (-cm, -dense)]:
+        assert res.is_sparse and np.array_equal(res.toarray(), expected.matrix)
+    for res, expected in [(cm + 1, dense + 1), (1 - cm, 1 - dense), (cm @ dense.matrix.T, dense @ dense.matrix.T),
+                          (cm**0, dense**0),
+                          (cm + dense, dense + dense), (cm == cm, dense == dense), (cm / m[0], dense / m[0])]:
+        assert not res.is_sparse and np.array_equal(res.matrix, expected.matrix)
+    assert (cm - cm).count_nonzero() == 0 and (cm - cm).matrix.nnz == 0
+    assert cm[2, 0] == 2 and cm[2:, :].is_sparse and not cm[:, 0].is_sparse and cm[:, 0].shape == (6,)
+    assert cm.reshape(5, 6).is_sparse and cm.reshape(-1).shape == (30,)
+    assert cm.sum() == 6 and cm.max() == 3 and np.array_equal(cm.max(axis=0), dense.max(axis=0))
+    assert len(cm) == 6 and cm.size == 30 and cm.median() == 0
+    assert isinstance(np.exp(cm), CustomMatrix) and np.exp(cm)[0, 0] == 1
+    assert cm.to_dataframe().equals(dense.to_dataframe())
+    cm[0, 1] = 0
+    assert cm.count_nonzero() == 2
+
+    # binary save / load, memory-mapped
+    import os
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dense = CustomMatrix(np.arange(12).reshape(3, 4))
+        path = dense.save(os.path.join(tmp, "dense"))
+        assert path.endswith(".npy") and not os.path.exists(path + ".json")
+        loaded = CustomMatrix.load(path, mmap_mode="r")
+        assert isinstance(loaded.matrix, np.memmap) and np.array_equal(loaded.matrix, dense.matrix)
+        assert (loaded * 2)[2, 3] == 22
+        loaded = CustomMatrix.load(CustomMatrix(np.eye(4), backend="csc").save(os.path.join(tmp, "sparse")))
+        assert loaded.is_sparse and loaded.matrix.format == "csc" and loaded.count_nonzero() == 4
+        try:
+            CustomMatrix(np.eye(4), backend="sparse").save(os.path.join(tmp, "sparse.npy"))
+        except ValueError as e:
+            assert "saved as .npz" in str(e)
+        # a .npy not written by save is cleaned on load
+        np.save(os.path.join(tmp, "dirty.npy"), np.array([[1, 2], [3, 4]]))
+        assert CustomMatrix.load(os.path.join(tmp, "dirty.npy")).matrix.dtype == np.float64
+        np.save(os.path.join(tmp, "dirty.npy"), np.array([[np.nan, np.inf], [3.0, 4.0]]))
+        assert np.isfinite(CustomMatrix.load(os.path.join(tmp, "dirty.npy"), mmap_mode="r").matrix).all()
+        del loaded
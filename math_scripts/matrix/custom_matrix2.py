@@ -2,12 +2,12 @@ import math_scripts.matrix.custom_matrix2_support as custom_matrix2_support
 import numpy as np
 import openpyxl
 import pandas as pd
-from math_scripts.matrix.custom_matrix import CustomMatrix
+from math_scripts.matrix.custom_matrix import CustomMatrix, group_rows_by_label
 
 
 class CustomMatrix2(CustomMatrix):
-    def __init__(self, matrix, info=None):
-        super().__init__(matrix)
+    def __init__(self, matrix, info=None, backend=None):
+        super().__init__(matrix, backend=backend)
         self.info = info
 
     def __str__(self):
@@ -20,13 +20,32 @@ class CustomMatrix2(CustomMatrix):
         res += f", all zero rows: {self.row_all_zero().sum()}"
         return res
 
+    # the label of each matrix becomes its info
     @classmethod
     def from_dataframe_with_label(cls, df: pd.DataFrame, label: str):
-        res = super().from_dataframe_with_label(df, label)
-        labels = np.sort(df[label].unique())
-        for i, cm in enumerate(res):
-            cm.info = labels[i]
-        return res
+        labels, offsets, matrix = group_rows_by_label(df, label)
+        return [
+            cls.from_clean(matrix[start:stop], info=l)
+            for l, start, stop in zip(labels, offsets[:-1], offsets[1:])
+        ]
+
+    # trusted fast path, see CustomMatrix.from_clean
+    @classmethod
+    def from_clean(cls, matrix, info=None):
+        obj = super().from_clean(matrix)
+        obj.info = info
+        return obj
+
+    def _wrap(self, matrix):
+        return self.from_clean(matrix, info=self.info)
+
+    # the info is saved in the json sidecar, numpy scalars come back as python ones, timestamps as timestamps
+    def _metadata(self):
+        return {} if self.info is None else {"info": self.info}
+
+    @classmethod
+    def _from_saved(cls, matrix, metadata):
+        return cls.from_clean(matrix, info=metadata.get("info"))
 
     def _combine_potential_infos(self, other):
         # if both are CustomMatrix2 and both have info not none
@@ -41,35 +60,30 @@ class CustomMatrix2(CustomMatrix):
             info = self.info
         return info
 
-    # override usage of self.__class__
+    # numpy ufuncs / functions keep the info, combined over all inputs like the operators
+    def _wrap_for(self, matrix, inputs):
+        res = self._wrap(matrix)
+        if any(x is not self and self._combine_potential_infos(x) is None for x in inputs):
+            res.info = None
+        return res
+
+    # indexing, T, reshape and copy keep the info through _wrap
 
     def __copy__(self):
-        return self.__class__(self.matrix, info=self.info)
+        return self.copy()
 
     def _dispatch_to_numpy(self, other, func):
-        info = self._combine_potential_infos(other)
         res = super()._dispatch_to_numpy(other, func)
-        return self.__class__(res.matrix, info=info)
-
-    def __getitem__(self, key):
-        res = super().__getitem__(key)
-        if isinstance(res, CustomMatrix):
-            res = self.__class__(res.matrix, info=self.info)
+        if res is NotImplemented:
+            return res
+        res.info = self._combine_potential_infos(other)
         return res
 
-    @property
-    def T(self):
-        return self.__class__(self.matrix.T, info=self.info)
-
-    @property
-    def reshape(self, *args, **kwargs):
-        return self.__class__(self.matrix.reshape(*args, **kwargs), info=self.info)
-
     # new methods
 
     def calculate(self):
         res = calculate(matrix=self)
-        return self.__class__(res.matrix, info=self.info)
+        return self.from_clean(res.matrix, info=self.info)
 
     def calculate2(self, other):
         if not isinstance(other, CustomMatrix):
@@ -78,7 +92,7 @@ class CustomMatrix2(CustomMatrix):
                 "Try converting it to a CustomMatrix first."
             )
         res = custom_matrix2_support.calculate2(self, other)
-        return self.__class__(res.matrix, info=self.info)
+        return self.from_clean(res.matrix, info=self.info)
 
     def calculate3(self, other):
         if not isinstance(other, CustomMatrix):
@@ -87,13 +101,17 @@ class CustomMatrix2(CustomMatrix):
                 "Try converting it to a CustomMatrix first."
             )
         res = custom_matrix2_support.calculate3(self, other)
-        return self.__class__(res.matrix, info=self.info)
+        return self.from_clean(res.matrix, info=self.info)
 
-    def to_excel_with_color_scale(self) -> openpyxl.Workbook:
-        df = self.to_dataframe()
-        wb = custom_matrix2_support.to_excel_with_color_scale(df)
+    def to_excel_with_color_scale(self, write_only=False) -> openpyxl.Workbook:
+        wb = custom_matrix2_support.to_excel_with_color_scale(self.toarray(), write_only)
         return wb
 
+    # many matrixes, one sheet each titled by the info, in one workbook
+    @staticmethod
+    def to_excel_many(matrixes, write_only=False) -> openpyxl.Workbook:
+        return custom_matrix2_support.matrixes_to_excel_with_color_scale(matrixes, write_only)
+
 
 def calculate(matrix):
     res = matrix**2
@@ -152,6 +170,9 @@ if __name__ == "__main__":
 
     cm == 3
     cm.copy() == cm
+    assert cm.copy().info == "cm"
+    assert cm.reshape(-1, 1).info == "cm"
+    assert cm.reshape(-1, 1).shape == (9, 1)
     assert cm[0, 1] == 2
     assert cm.T[0, 1] == 4
     assert cm.T.info == "cm"
@@ -174,3 +195,41 @@ if __name__ == "__main__":
     # to excel
     wb = cm.to_excel_with_color_scale()
     wb.save("test.xlsx")
+    ws = openpyxl.load_workbook("test.xlsx")["Sheet"]
+    assert ws["B2"].value == 1 and ws["D4"].value == 9 and ws["E2"].value is None
+    assert [str(r.sqref) for r in ws.conditional_formatting] == ["B2:D4"]
+
+    # many matrixes in one workbook
+    wb = CustomMatrix2.to_excel_many([cm, cm2, cm_noinfo, CustomMatrix2(m, info="cm")])
+    assert wb["cm"]["B2"].value == 1
+    # large exports opt in to streaming the rows
+    wb = CustomMatrix2.to_excel_many([cm, cm2, cm_noinfo, CustomMatrix2(m, info="cm")], write_only=True)
+    wb.save("test.xlsx")
+    assert openpyxl.load_workbook("test.xlsx").sheetnames == ["cm", "cm2", "2", "cm_1"]
+
+    # save / load keep the info
+    import os
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        assert CustomMatrix2.load(cm.save(os.path.join(tmp, "cm"))).info == "cm"
+        assert CustomMatrix2.load(cm_noinfo.save(os.path.join(tmp, "cm"))).info is None
+        assert CustomMatrix2.load(cm_list[0].save(os.path.join(tmp, "cm")), mmap_mode="r").info == "a"
+        # dates come back as timestamps, and still combine with the info of the original
+        dated = CustomMatrix2(np.eye(2), info=pd.Timestamp("2020-01-31"))
+        loaded = CustomMatrix2.load(dated.save(os.path.join(tmp, "dated")))
+        assert loaded.info == pd.Timestamp("2020-01-31") and (dated + loaded).info == dated.info
+
+    # numpy protocols keep the info
+    assert np.sqrt(cm).info == "cm"
+    assert np.add(cm, cm2).info is None
+    assert np.add(cm, cm_noinfo).info == "cm"
+    assert np.clip(cm, 2, 5).info == "cm"
+    res = np.add(cm, 1, out=cm.copy())
+    assert isinstance(res, CustomMatrix2) and res.info == "cm"
+
+    # sparse backend keeps the info
+    sparse_cm = CustomMatrix2(np.eye(4), info="sparse", backend="sparse")
+    assert (sparse_cm * 2).info == "sparse" and (sparse_cm * 2).is_sparse
+    assert sparse_cm.to_dense().info == "sparse" and sparse_cm[1:, :].info == "sparse"
+    assert "sparse csr" in str(sparse_cm) and "non-zeros: 4, all zero rows: 0" in str(sparse_cm)
@@ -3,37 +3,89 @@ import pandas as pd
 from math_scripts.matrix.custom_matrix import CustomMatrix
 
 
-def calculate2(left: CustomMatrix, right: CustomMatrix):
+# lazy: evaluate the whole expression at once, without the intermediate matrices
+def calculate2(left: CustomMatrix, right: CustomMatrix, lazy=True):
+    if lazy:
+        return (left.lazy() ** 2 - right.lazy() * 2 + 2).evaluate()
     res = left**2 - right * 2 + 2
     return res
 
 
-def calculate3(left: CustomMatrix, right: CustomMatrix):
+def calculate3(left: CustomMatrix, right: CustomMatrix, lazy=True):
+    if lazy:
+        return (left.lazy() * 2 - right).evaluate()
     res = left * 2 - right
     return res
 
 
 import openpyxl
+from openpyxl.formatting.rule import ColorScaleRule
+from openpyxl.utils import get_column_letter
 
+# excel sheet titles: at most 31 characters, none of these
+_INVALID_TITLE_CHARACTERS = str.maketrans({c: "_" for c in "[]:*?/\\"})
 
-def to_excel_with_color_scale(data: pd.DataFrame) -> openpyxl.Workbook:
-    """wb.save(f"{here}/table2.xlsx")"""
-    wb = openpyxl.Workbook()
-    ws = wb.active
 
-    for i in range(data.shape[0]):
-        for j in range(data.shape[1]):
-            cell = ws.cell(row=i + 2, column=j + 2)
-            cell.value = data.iloc[i, j]
+def to_excel_with_color_scale(data, write_only=False) -> openpyxl.Workbook:
+    """
+    data from B2, with a red to green color scale over the data range
+    data: DataFrame / 2D array, or dict of sheet title -> DataFrame / 2D array (or a list of
+        such pairs) for one sheet each
 
-    ws.conditional_formatting.add(
-        f"B2:E{data.shape[0]+1}",
-        openpyxl.formatting.rule.ColorScaleRule(
-            start_type="min",
-            start_color="00FF0000",
-            end_type="max",
-            end_color="0000FF00",
-        ),
-    )
+    write_only=True streams the rows into the workbook, for large exports: it can then only be
+    saved (once), not read or edited through ws.cell() / ws["A1"]
+
+    wb.save(f"{here}/table2.xlsx")
+    """
+    wb = openpyxl.Workbook(write_only=write_only)
+    if not write_only:
+        wb.remove(wb.active)
+    if isinstance(data, dict):
+        sheets = data.items()
+    elif isinstance(data, list):
+        sheets = data
+    else:
+        sheets = [("Sheet", data)]
+
+    titles = set()
+    for title, values in sheets:
+        title = str(title).translate(_INVALID_TITLE_CHARACTERS)[:31] or "Sheet"
+        # keep titles unique after the truncation
+        base, i = title, 1
+        while title.lower() in titles:
+            suffix = f"_{i}"
+            title, i = base[: 31 - len(suffix)] + suffix, i + 1
+        titles.add(title.lower())
+        _write_with_color_scale(wb.create_sheet(title), values)
 
     return wb
+
+
+def _write_with_color_scale(ws, data):
+    values = data.to_numpy() if isinstance(data, pd.DataFrame) else np.asarray(data)
+    values = values.reshape(len(values), -1)
+
+    # whole rows from the buffer, one append each
+    ws.append([])
+    for row in values.tolist():
+        ws.append([None] + row)
+
+    if values.size:
+        ws.conditional_formatting.add(
+            f"B2:{get_column_letter(values.shape[1] + 1)}{values.shape[0] + 1}",
+            ColorScaleRule(
+                start_type="min",
+                start_color="00FF0000",
+                end_type="max",
+                end_color="0000FF00",
+            ),
+        )
+
+
+def matrixes_to_excel_with_color_scale(matrixes, write_only=False) -> openpyxl.Workbook:
+    """one sheet per matrix of a list of CustomMatrix2 or a MatrixBatch, titled by the info / label"""
+    sheets = [
+        (cm.info if getattr(cm, "info", None) is not None else i, cm.toarray())
+        for i, cm in enumerate(matrixes)
+    ]
+    return to_excel_with_color_scale(sheets, write_only)
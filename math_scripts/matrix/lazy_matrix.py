@@ -0,0 +1,211 @@
+import numpy as np
+from math_scripts.matrix.custom_matrix import CustomMatrix
+
+try:
+    import numexpr
+
+    NUMEXPR_AVAILABLE = True
+except ImportError:
+    NUMEXPR_AVAILABLE = False
+
+ENGINES = ("numexpr", "numpy")
+
+# elementwise operations: ufunc and numexpr template
+_OPERATIONS = {
+    "add": (np.add, "({} + {})"),
+    "subtract": (np.subtract, "({} - {})"),
+    "multiply": (np.multiply, "({} * {})"),
+    "divide": (np.divide, "({} / {})"),
+    "power": (np.power, "({} ** {})"),
+    "negative": (np.negative, "(-{})"),
+}
+
+
+class LazyMatrix(object):
+    """
+    Lazy elementwise expression of CustomMatrix objects, arrays and scalars
+        - operators build an expression tree, nothing is computed
+        - evaluate() computes the whole tree at once:
+            numexpr: a single fused pass, no temporaries
+            numpy: ufuncs with out= into the result buffer, plus one
+                scratch buffer per level of nesting of the right operands
+        - the result is cleaned in place only if the expression can create nan / inf
+
+    e.g. (left.lazy() ** 2 - right.lazy() * 2 + 2).evaluate() allocates the result and one
+    buffer, instead of four CustomMatrix intermediates
+    """
+
+    # numpy arrays on the left defer to the reflected operators
+    __array_ufunc__ = None
+
+    def __init__(self, operation, operands):
+        # operation None for a leaf: a CustomMatrix, numpy array or scalar
+        self.operation = operation
+        self.operands = operands
+
+    @classmethod
+    def leaf(cls, value):
+        if isinstance(value, LazyMatrix):
+            return value
+        if not isinstance(value, (CustomMatrix, np.ndarray, int, float, np.number)):
+            raise TypeError(
+                f"Cannot operate on a LazyMatrix and a {type(value)} object. "
+                "Try converting it to a CustomMatrix first."
+            )
+        return cls(None, (value,))
+
+    def _leaves(self):
+        if self.operation is None:
+            yield self.operands[0]
+        else:
+            for operand in self.operands:
+                yield from operand._leaves()
+
+    def _operations(self):
+        if self.operation is not None:
+            yield self.operation
+            for operand in self.operands:
+                yield from operand._operations()
+
+    @property
+    def shape(self):
+        return np.broadcast_shapes(*(np.shape(_buffer(x)) for x in self._leaves()))
+
+    def __repr__(self):
+        return f"LazyMatrix: {self.shape}\n{self._expression({})}"
+
+    # build the tree
+    def _binary(self, other, operation, reflected=False):
+        operands = (LazyMatrix.leaf(other), self) if reflected else (self, LazyMatrix.leaf(other))
+        return LazyMatrix(operation, operands)
+
+    def __add__(self, other):
+        return self._binary(other, "add")
+
+    def __radd__(self, other):
+        return self._binary(other, "add", reflected=True)
+
+    def __sub__(self, other):
+        return self._binary(other, "subtract")
+
+    def __rsub__(self, other):
+        return self._binary(other, "subtract", reflected=True)
+
+    def __mul__(self, other):
+        return self._binary(other, "multiply")
+
+    def __rmul__(self, other):
+        return self._binary(other, "multiply", reflected=True)
+
+    def __truediv__(self, other):
+        return self._binary(other, "divide")
+
+    def __rtruediv__(self, other):
+        return self._binary(other, "divide", reflected=True)
+
+    def __pow__(self, other):
+        return self._binary(other, "power")
+
+    def __neg__(self):
+        return LazyMatrix("negative", (self,))
+
+    # evaluate
+    def _expression(self, names):
+        if self.operation is None:
+            value = self.operands[0]
+            if id(value) not in names:
+                names[id(value)] = (f"v{len(names)}", _buffer(value))
+            return names[id(value)][0]
+        return _OPERATIONS[self.operation][1].format(*(x._expression(names) for x in self.operands))
+
+    def _evaluate_numpy(self, out, scratch):
+        """evaluate into out, scratch holds spare buffers for the right operands by depth"""
+        if self.operation is None:
+            out[...] = _buffer(self.operands[0])
+            return out
+        ufunc = _OPERATIONS[self.operation][0]
+        first = self.operands[0]
+        first = _buffer(first.operands[0]) if first.operation is None else first._evaluate_numpy(out, scratch)
+        if len(self.operands) == 1:
+            return ufunc(first, out=out)
+
+        second = self.operands[1]
+        if second.operation is None:
+            second = _buffer(second.operands[0])
+        else:
+            if not scratch:
+                scratch.append(np.empty_like(out))
+            buffer = scratch.pop()
+            second = second._evaluate_numpy(buffer, scratch)
+            ufunc(first, second, out=out)
+            scratch.append(buffer)
+            return out
+        return ufunc(first, second, out=out)
+
+    def evaluate(self, engine=None):
+        """
+        :param engine: numexpr or numpy, default numexpr when installed
+        :return: CustomMatrix of the class (and info) of the first CustomMatrix operand
+        """
+        engine = engine or ("numexpr" if NUMEXPR_AVAILABLE else "numpy")
+        assert engine in ENGINES, f"engine must be one of {ENGINES}"
+        if engine == "numexpr" and not NUMEXPR_AVAILABLE:
+            raise ImportError("numexpr is not installed, pip install numexpr or use engine='numpy'")
+
+        leaves = list(self._leaves())
+        out = np.empty(self.shape, dtype=float)
+        if engine == "numexpr":
+            names = {}
+            expression = self._expression(names)
+            numexpr.evaluate(expression, local_dict=dict(names.values()), out=out, casting="unsafe")
+        else:
+            self._evaluate_numpy(out, [])
+
+        finite = all(_OPERATIONS[op][0] in CustomMatrix._FINITE_UFUNCS for op in self._operations())
+        trusted = finite and all(
+            isinstance(x, CustomMatrix) or (np.isscalar(x) and np.isfinite(x)) for x in leaves
+        )
+        if not trusted:
+            np.nan_to_num(out, copy=False)
+
+        matrixes = [x for x in leaves if isinstance(x, CustomMatrix)]
+        if not matrixes:
+            return CustomMatrix.from_clean(out)
+        return matrixes[0]._wrap_for(out, matrixes)
+
+    @property
+    def matrix(self):
+        return self.evaluate().matrix
+
+
+def _buffer(value):
+    return value.toarray() if isinstance(value, CustomMatrix) else value
+
+
+if __name__ == "__main__":
+    from math_scripts.matrix.custom_matrix2 import CustomMatrix2
+    from math_scripts.matrix.lazy_matrix import LazyMatrix  # the class lazy() returns, not __main__'s
+
+    m = np.arange(12, dtype=float).reshape(3, 4)
+    left, right = CustomMatrix2(m, info="left"), CustomMatrix2(m * 2, info="left")
+
+    eager = left**2 - right * 2 + 2
+    expression = left.lazy() ** 2 - right.lazy() * 2 + 2
+    for engine in ENGINES if NUMEXPR_AVAILABLE else ("numpy",):
+        res = expression.evaluate(engine)
+        assert isinstance(res, CustomMatrix2) and res.info == "left"
+        assert np.array_equal(res.matrix, eager.matrix)
+
+    # nested right operands, reflected operators, arrays and scalars
+    expression = 1 - (left.lazy() * 2 - (right - (left + 1) * 3)) / (right + 1) + np.ones(4)
+    eager = 1 - (left * 2 - (right - (left + 1) * 3)) / (right + 1) + np.ones(4)
+    assert np.allclose(expression.evaluate("numpy").matrix, eager.matrix)
+    assert np.allclose((-left.lazy()).matrix, -m)
+    assert isinstance(right - left.lazy(), LazyMatrix) and np.array_equal((right - left.lazy()).matrix, m)
+    assert isinstance(np.ones(4) * left.lazy(), LazyMatrix)
+    assert np.array_equal(left.calculate3(right).matrix, np.zeros((3, 4)))
+    assert np.array_equal(left.calculate2(right).matrix, (left**2 - right * 2 + 2).matrix)
+
+    # nan / inf from the expression are cleaned like the eager operators
+    assert (left.lazy() / 0).evaluate("numpy")[0, 0] == 0
+    assert (left.lazy() / 0).evaluate("numpy")[0, 1] == np.finfo(float).max
@@ -0,0 +1,326 @@
+import math_scripts.matrix.custom_matrix2_support as custom_matrix2_support
+import math_scripts.matrix.matrix_io as matrix_io
+import numpy as np
+import pandas as pd
+from math_scripts.matrix.custom_matrix import CustomMatrix, group_rows_by_label
+from math_scripts.matrix.custom_matrix2 import CustomMatrix2
+
+
+class MatrixBatch(object):
+    """
+    MatrixBatch is a stack of same-shaped matrixes, one per label
+        - one clean 3D float array: label x rows x columns
+        - labels: pandas Index, metadata: DataFrame with one row per label
+        - operators broadcast across the batch: a batch with the same labels, a
+            CustomMatrix / 2D array (every label), a 3D array or a scalar
+        - reductions over the 3D array: axis 0 is the label axis, e.g.
+            mean(axis=(1, 2)) one value per label, mean(axis=0) the mean matrix
+        - batch[label] is a CustomMatrix2 view with the label as info
+
+    One numpy call per operation on the whole stack, instead of one per matrix.
+    """
+
+    def __init__(self, matrixes, labels=None, metadata=None):
+        if isinstance(matrixes, np.ndarray):
+            array = matrixes
+        else:
+            array = np.stack([x.toarray() if isinstance(x, CustomMatrix) else np.asarray(x) for x in matrixes])
+            if labels is None and all(getattr(x, "info", None) is not None for x in matrixes):
+                labels = [x.info for x in matrixes]
+        if array.ndim != 3:
+            raise TypeError(f"Input is not a 3D array or a list of 2D matrixes, but {array.ndim}D")
+        # clean once, like CustomMatrix
+        if array.dtype == object:
+            array = np.where(array == None, 0, array)  # noqa: E711
+        array = np.nan_to_num(np.array(array, dtype=float), copy=False)
+        self._set(array, labels, metadata)
+
+    def _set(self, array, labels, metadata):
+        self.array = array
+        self.labels = pd.Index(range(len(array)) if labels is None else labels)
+        if len(self.labels) != len(array):
+            raise ValueError(f"{len(self.labels)} labels for {len(array)} matrixes")
+        self.metadata = pd.DataFrame(index=self.labels) if metadata is None else metadata
+
+    # trusted fast path, see CustomMatrix.from_clean
+    @classmethod
+    def from_clean(cls, array, labels=None, metadata=None):
+        obj = cls.__new__(cls)
+        obj._set(array, labels, metadata)
+        return obj
+
+    def _wrap(self, array):
+        return self.from_clean(array, self.labels, self.metadata)
+
+    # initialize from a dataframe with a label column, every label must have the same number of rows
+    #   no copy beyond group_rows_by_label: the grouped rows are reshaped into the stack
+    @classmethod
+    def from_dataframe_with_label(cls, df: pd.DataFrame, label: str):
+        labels, offsets, matrix = group_rows_by_label(df, label)
+        rows = np.diff(offsets)
+        if len(rows) and (rows != rows[0]).any():
+            raise ValueError(f"Labels have different numbers of rows, from {rows.min()} to {rows.max()}")
+        n_rows = rows[0] if len(rows) else 0
+        return cls.from_clean(matrix.reshape(len(labels), n_rows, matrix.shape[1]), labels)
+
+    def copy(self):
+        return self.from_clean(self.array.copy(), self.labels, self.metadata.copy())
+
+    # binary save / load: the stack as .npy (memory-mappable), labels and metadata in the json sidecar
+    def save(self, path):
+        metadata = {"labels": list(self.labels), "metadata": self.metadata.to_dict(orient="list")}
+        return matrix_io.save_matrix(path, self.array, metadata)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        array, metadata = matrix_io.load_matrix(path, mmap_mode=mmap_mode)
+        labels = pd.Index(metadata["labels"])
+        return cls.from_clean(array, labels, pd.DataFrame(metadata["metadata"], index=labels))
+
+    # long format, the rows of every label under each other, for parquet / arrow
+    #   the label column is an ordered categorical in the order of the labels, which
+    #   from_dataframe_with_label groups by, so the round trip keeps the order
+    def to_dataframe_with_label(self, label="label"):
+        df = pd.DataFrame(self.array.reshape(-1, self.shape[2]), columns=[str(i) for i in range(self.shape[2])])
+        df[label] = pd.Categorical(np.repeat(self.labels, self.shape[1]), categories=self.labels, ordered=True)
+        return df
+
+    # parquet needs pyarrow (or fastparquet), labels and their order are kept, metadata is not
+    def to_parquet(self, path, label="label"):
+        self.to_dataframe_with_label(label).to_parquet(path, index=False)
+
+    @classmethod
+    def from_parquet(cls, path, label="label"):
+        return cls.from_dataframe_with_label(pd.read_parquet(path), label)
+
+    def to_list(self):
+        return list(self)
+
+    # one sheet per label, see CustomMatrix2.to_excel_many
+    def to_excel_with_color_scale(self, write_only=False):
+        return custom_matrix2_support.matrixes_to_excel_with_color_scale(self, write_only)
+
+    # display
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        payload = f"MatrixBatch: {len(self)} x {self.shape[1:]}"
+        labels = list(self.labels[:5])
+        payload += f"\nlabels: {labels}{' ...' if len(self) > 5 else ''}"
+        if len(self.metadata.columns):
+            payload += f"\nmetadata: {list(self.metadata.columns)}"
+        return payload
+
+    # labels
+    def __len__(self):
+        return len(self.array)
+
+    def __iter__(self):
+        for label, matrix in zip(self.labels, self.array):
+            yield CustomMatrix2.from_clean(matrix, info=label)
+
+    def __getitem__(self, key):
+        if isinstance(key, (list, np.ndarray, pd.Index)):
+            position = self.labels.get_indexer(key)
+            if (position < 0).any():
+                raise KeyError(f"Labels not in the batch: {list(pd.Index(key)[position < 0])}")
+            return self.from_clean(self.array[position], self.labels[position], self.metadata.iloc[position])
+        return CustomMatrix2.from_clean(self.array[self.labels.get_loc(key)], info=key)
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+    # operators, broadcast across the batch
+    #   numpy arrays on the left defer to the reflected operators
+    __array_ufunc__ = None
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is not None and np.dtype(dtype) != self.array.dtype:
+            return self.array.astype(dtype)
+        return self.array.copy() if copy else self.array
+
+    def _dispatch_to_numpy(self, other, method, reflected=False):
+        if isinstance(other, MatrixBatch):
+            if not self.labels.equals(other.labels):
+                raise ValueError("Cannot operate on batches with different labels")
+            operand, trusted = other.array, True
+        elif isinstance(other, CustomMatrix):
+            operand, trusted = other.toarray(), True
+        elif isinstance(other, np.ndarray):
+            # external data, may contain nan
+            operand, trusted = other, False
+        elif isinstance(other, (int, float)):
+            operand, trusted = other, bool(np.isfinite(other))
+        else:
+            raise TypeError(
+                f"Cannot operate on a MatrixBatch and a {type(other)} object. "
+                "Try converting it to a CustomMatrix first."
+            )
+        res = method(operand, self.array) if reflected else method(self.array, operand)
+        if res.dtype != np.float64:
+            # e.g. booleans of comparisons
+            res = res.astype(float)
+        if not (trusted and method in CustomMatrix._FINITE_UFUNCS):
+            np.nan_to_num(res, copy=False)
+        return self._wrap(res)
+
+    def __add__(self, other):
+        return self._dispatch_to_numpy(other, np.add)
+
+    def __radd__(self, other):
+        return self._dispatch_to_numpy(other, np.add, reflected=True)
+
+    def __sub__(self, other):
+        return self._dispatch_to_numpy(other, np.subtract)
+
+    def __rsub__(self, other):
+        return self._dispatch_to_numpy(other, np.subtract, reflected=True)
+
+    def __neg__(self):
+        return self._dispatch_to_numpy(-1, np.multiply)
+
+    def __mul__(self, other):
+        return self._dispatch_to_numpy(other, np.multiply)
+
+    def __rmul__(self, other):
+        return self._dispatch_to_numpy(other, np.multiply, reflected=True)
+
+    def __truediv__(self, other):
+        return self._dispatch_to_numpy(other, np.divide)
+
+    def __rtruediv__(self, other):
+        return self._dispatch_to_numpy(other, np.divide, reflected=True)
+
+    def __pow__(self, other):
+        return self._dispatch_to_numpy(other, np.power)
+
+    def __matmul__(self, other):
+        return self._dispatch_to_numpy(other, np.matmul)
+
+    def __rmatmul__(self, other):
+        return self._dispatch_to_numpy(other, np.matmul, reflected=True)
+
+    def __lt__(self, other):
+        return self._dispatch_to_numpy(other, np.less)
+
+    def __le__(self, other):
+        return self._dispatch_to_numpy(other, np.less_equal)
+
+    def __gt__(self, other):
+        return self._dispatch_to_numpy(other, np.greater)
+
+    def __ge__(self, other):
+        return self._dispatch_to_numpy(other, np.greater_equal)
+
+    def __eq__(self, other):
+        return self._dispatch_to_numpy(other, np.equal)
+
+    # batched reductions, axis of the 3D array
+    #   label axis kept: Series / DataFrame by label, reduced: CustomMatrix2 for a matrix, else as numpy
+    def _reduce(self, func, axis):
+        res = func(self.array, axis=axis)
+        if axis is None:
+            return res
+        axes = {a % 3 for a in np.atleast_1d(axis)}
+        if 0 not in axes:
+            return pd.Series(res, index=self.labels) if res.ndim == 1 else pd.DataFrame(res, index=self.labels)
+        if res.ndim == 2:
+            return CustomMatrix2.from_clean(res)
+        return res
+
+    def sum(self, axis=None):
+        return self._reduce(np.sum, axis)
+
+    def mean(self, axis=None):
+        return self._reduce(np.mean, axis)
+
+    def std(self, axis=None):
+        return self._reduce(np.std, axis)
+
+    def min(self, axis=None):
+        return self._reduce(np.min, axis)
+
+    def max(self, axis=None):
+        return self._reduce(np.max, axis)
+
+    def median(self, axis=None):
+        return self._reduce(np.median, axis)
+
+    def count_nonzero(self, axis=None):
+        return self._reduce(np.count_nonzero, axis)
+
+    # per label, like CustomMatrix2.__str__
+    def row_all_zero(self):
+        return pd.DataFrame(~self.array.any(axis=2), index=self.labels)
+
+
+if __name__ == "__main__":
+    from math_scripts.matrix.matrix_batch import MatrixBatch  # the class CustomMatrix defers to, not __main__'s
+
+    rng = np.random.default_rng(0)
+    mats = [CustomMatrix2(rng.integers(0, 10, size=(4, 3)), info=f"m{i}") for i in range(6)]
+    batch = MatrixBatch(mats)
+    assert batch.shape == (6, 4, 3) and list(batch.labels) == [f"m{i}" for i in range(6)]
+    print(batch)
+
+    # operators against the same loop over the list
+    other = mats[0]
+    for res, expected in [
+        ((batch - other) ** 2, [(m - other) ** 2 for m in mats]),
+        (2 * batch / (batch + 1), [2 * m / (m + 1) for m in mats]),
+        (batch @ other.T, [m @ other.T for m in mats]),
+        (-batch + np.ones(3), [-m + np.ones(3) for m in mats]),
+        (batch / 0, [m / 0 for m in mats]),
+        (batch > 5, [m > 5 for m in mats]),
+    ]:
+        assert isinstance(res, MatrixBatch) and res.labels.equals(batch.labels)
+        assert all(np.array_equal(res[m.info].matrix, e.matrix) for m, e in zip(mats, expected))
+    assert isinstance(other - batch, MatrixBatch) and (other - batch)["m0"].sum() == 0
+    assert (batch - batch).sum() == 0
+
+    # reductions: per label, the mean matrix, the objective of mat_opt_with_constaint
+    assert np.allclose(batch.mean(axis=(1, 2)), [m.mean() for m in mats])
+    assert batch.sum(axis=2).shape == (6, 4) and np.allclose(batch.sum(axis=2).loc["m3"], mats[3].sum(axis=1))
+    assert np.allclose(batch.mean(axis=0).matrix, np.mean([m.matrix for m in mats], axis=0))
+    assert np.isclose(((batch - other) ** 2).mean(), np.mean([np.mean((other.matrix - m.matrix) ** 2) for m in mats]))
+    assert batch.count_nonzero(axis=(1, 2))["m2"] == mats[2].count_nonzero()
+
+    # labels and metadata
+    batch.metadata["weight"] = np.arange(6)
+    sub = batch[["m4", "m1"]]
+    assert list(sub.labels) == ["m4", "m1"] and list(sub.metadata["weight"]) == [4, 1]
+    assert (batch * 2).metadata is batch.metadata and batch["m1"].info == "m1"
+    assert [m.info for m in batch] == list(batch.labels)
+
+    # from a dataframe, stacked without copying the grouped rows
+    df = pd.DataFrame(rng.normal(size=(12, 3)), columns=list("abc"))
+    df["label"] = np.repeat(["x", "y", "z"], 4)[rng.permutation(12)]
+    batch = MatrixBatch.from_dataframe_with_label(df, "label")
+    assert batch.shape == (3, 4, 3)
+    assert np.array_equal(batch["y"].matrix, CustomMatrix2.from_dataframe_with_label(df, "label")[1].matrix)
+    assert batch.to_excel_with_color_scale().sheetnames == ["x", "y", "z"]
+
+    # save / load memory-mapped, long format round trip
+    import os
+    import tempfile
+
+    batch.metadata["n"] = [1, 2, 3]
+    with tempfile.TemporaryDirectory() as tmp:
+        loaded = MatrixBatch.load(batch.save(os.path.join(tmp, "batch")), mmap_mode="r")
+        assert isinstance(loaded.array, np.memmap) and np.array_equal(loaded.array, batch.array)
+        assert loaded.labels.equals(batch.labels) and list(loaded.metadata["n"]) == [1, 2, 3]
+        del loaded
+        dated = MatrixBatch(batch.array, labels=pd.date_range("2021-01-01", periods=3))
+        loaded = MatrixBatch.load(dated.save(os.path.join(tmp, "dated")))
+        assert loaded.labels.equals(dated.labels) and loaded[pd.Timestamp("2021-01-02")].info == pd.Timestamp("2021-01-02")
+    long = MatrixBatch.from_dataframe_with_label(batch.to_dataframe_with_label(), "label")
+    assert np.array_equal(long.array, batch.array) and long.labels.equals(batch.labels)
+
+    # the labels keep their order, not sorted, through parquet
+    unsorted = batch[["z", "x", "y"]]
+    with tempfile.TemporaryDirectory() as tmp:
+        unsorted.to_parquet(os.path.join(tmp, "batch.parquet"))
+        loaded = MatrixBatch.from_parquet(os.path.join(tmp, "batch.parquet"))
+    assert list(loaded.labels) == ["z", "x", "y"] and np.array_equal(loaded.array, unsorted.array)
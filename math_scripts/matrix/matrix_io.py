@@ -0,0 +1,82 @@
+import datetime
+import json
+import os
+
+import math_scripts.matrix.sparse_support as sparse_support
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def _to_json(obj):
+    # numpy scalars as python ones, timestamps tagged to come back as timestamps, anything else as text
+    if isinstance(obj, (pd.Timestamp, np.datetime64, datetime.datetime)):
+        return {"__timestamp__": pd.Timestamp(obj).isoformat()}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return str(obj)
+
+
+def _from_json(obj):
+    if obj.keys() == {"__timestamp__"}:
+        return pd.Timestamp(obj["__timestamp__"])
+    return obj
+
+
+def _sidecar(path):
+    return f"{path}.json"
+
+
+def save_matrix(path, matrix, metadata=None):
+    """
+    save a clean matrix without text serialization
+        - dense: .npy, loaded back memory-mapped with mmap_mode
+        - sparse: .npz of scipy.sparse (uncompressed)
+        - metadata (info, labels, ...): a json sidecar, path + ".json"
+
+    :return: the path, with the extension added when missing
+    """
+    path = os.fspath(path)
+    extension = ".npz" if sparse.issparse(matrix) else ".npy"
+    if not os.path.splitext(path)[1]:
+        path += extension
+    if not path.endswith(extension):
+        raise ValueError(f"{'Sparse' if extension == '.npz' else 'Dense'} matrixes are saved as {extension}, not {path}")
+
+    if sparse.issparse(matrix):
+        sparse.save_npz(path, matrix, compressed=False)
+    else:
+        np.save(path, matrix, allow_pickle=False)
+
+    sidecar = _sidecar(path)
+    if metadata:
+        with open(sidecar, "w") as f:
+            json.dump(metadata, f, default=_to_json)
+    elif os.path.exists(sidecar):
+        # left over from an earlier save
+        os.remove(sidecar)
+    return path
+
+
+def load_matrix(path, mmap_mode=None):
+    """
+    load a matrix saved by save_matrix, as it was saved: no parsing, no copy
+    mmap_mode: r, r+ or c to map a .npy lazily instead of reading it, e.g. for matrixes bigger than RAM
+    files not written from a clean matrix (not float, nan / inf) are cleaned into memory, like the constructor
+
+    :return: matrix, metadata ({} without sidecar)
+    """
+    path = os.fspath(path)
+    if path.endswith(".npz"):
+        # freshly loaded, cleaned in place
+        matrix = sparse_support.clean_sparse(sparse.load_npz(path))
+    else:
+        matrix = np.load(path, mmap_mode=mmap_mode, allow_pickle=False)
+        if matrix.dtype != np.float64 or not np.isfinite(matrix).all():
+            matrix = np.nan_to_num(np.array(matrix, dtype=float), copy=False)
+
+    metadata = {}
+    if os.path.exists(_sidecar(path)):
+        with open(_sidecar(path)) as f:
+            metadata = json.load(f, object_hook=_from_json)
+    return matrix, metadata
@@ -0,0 +1,92 @@
+import numpy as np
+from scipy import sparse
+
+BACKENDS = ("dense", "sparse", "csr", "csc", "auto")
+SPARSE_FORMATS = {"csr": sparse.csr_array, "csc": sparse.csc_array}
+
+# share of non-zero cells below which backend="auto" chooses sparse
+#   csr / csc keep 12 bytes per non-zero (value + index) against 8 bytes per cell dense,
+#   the margin pays for the slower elementwise operations
+AUTO_SPARSE_DENSITY = 0.1
+
+
+def to_dense(matrix):
+    return matrix.toarray() if sparse.issparse(matrix) else matrix
+
+
+def density(matrix):
+    size = np.prod(matrix.shape)
+    nonzero = matrix.nnz if sparse.issparse(matrix) else np.count_nonzero(matrix)
+    return nonzero / size if size else 0.0
+
+
+def clean_sparse(matrix, format=None, copy=False, trusted=False):
+    """
+    float csr / csc array without nan / inf and without stored zeros, other formats become csr
+    the stored values are cleaned in place, so the matrix must be fresh unless copy=True
+    """
+    if format is None:
+        format = matrix.format if matrix.format in SPARSE_FORMATS else "csr"
+    matrix = SPARSE_FORMATS[format](matrix, dtype=float, copy=copy)
+    if not trusted:
+        np.nan_to_num(matrix.data, copy=False)
+    matrix.sum_duplicates()
+    # no stored zeros: count_nonzero and row_all_zero read the index structure
+    matrix.eliminate_zeros()
+    return matrix
+
+
+def to_backend(matrix, backend):
+    """convert a clean matrix to the backend, None keeps it as it is"""
+    if backend is None:
+        return matrix
+    assert backend in BACKENDS, f"backend must be one of {BACKENDS}"
+    if backend == "auto":
+        backend = "sparse" if matrix.ndim == 2 and density(matrix) < AUTO_SPARSE_DENSITY else "dense"
+    if backend == "dense":
+        return to_dense(matrix)
+    if matrix.ndim != 2:
+        raise TypeError(f"The sparse backend needs a 2D matrix, not {matrix.ndim}D")
+    format = "csr" if backend == "sparse" else backend
+    return SPARSE_FORMATS[format](matrix)
+
+
+def sparse_operation(left, right, method):
+    """
+    method(left, right) where an operand is sparse, computed on the stored values when zeros stay zeros
+        - scalars: f(0, scalar) == 0, e.g. * / ** > on the stored values only
+        - matrixes of the same shape: sparse + - sparse, * by anything, @ by anything
+    Returns None when the result is dense anyway, e.g. adding a scalar, the caller densifies
+    """
+    if np.isscalar(right):
+        if method is np.matmul:
+            return None
+        with np.errstate(all="ignore"):
+            zero = np.nan_to_num(method(0.0, right))
+        if zero != 0:
+            return None
+        res = left.copy()
+        res.data = method(left.data, right)
+        return res
+
+    if method is np.matmul:
+        return left @ right
+    if left.shape != right.shape:
+        # broadcasting, e.g. a row vector
+        return None
+    if method in (np.add, np.subtract) and sparse.issparse(left) and sparse.issparse(right):
+        return left + right if method is np.add else left - right
+    if method is np.multiply:
+        return left.multiply(right) if sparse.issparse(left) else right.multiply(left)
+    return None
+
+
+def count_nonzero(matrix, axis=None):
+    """non-zeros of a clean csr / csc array, from the index structure"""
+    if axis is None:
+        return matrix.nnz
+    axis = axis % 2
+    if (matrix.format == "csr") == (axis == 1):
+        # along the compressed axis
+        return np.diff(matrix.indptr)
+    return np.bincount(matrix.indices, minlength=matrix.shape[1 - axis])
@@ -6,6 +6,8 @@ import numpy as np
 # list of 5 by 5 matrixes
 mats = [np.random.randint(0, 10, size=(5, 5)) for i in range(5)]
 mats
+# stacked once, one numpy call per evaluation instead of one per matrix
+stack = np.stack(mats).astype(float)
 
 
 # function to be minimized
@@ -17,7 +19,7 @@ def objective(x: np.ndarray):
         objective(x = np.array(range(1,26)))
     """
     mat = np.array(x).reshape(5, 5)
-    return np.mean([np.mean((mat - m) ** 2) for m in mats])
+    return ((stack - mat) ** 2).mean()
 
 
 # bounds
@@ -366,6 +368,7 @@ from mystic.solvers import diffev2
 size = 10
 n_mats = 5
 mats = [np.random.randint(0, 50, size=(size, size)) for i in range(n_mats)]
+stack = np.stack(mats).astype(float)
 
 
 # function to be minimized
@@ -377,7 +380,7 @@ def objective(x: np.ndarray):
         objective(x = np.array(range(1,101)))
     """
     mat = np.array(x).reshape(size, size)
-    return np.mean([np.mean((mat - m) ** 2) for m in mats])
+    return ((stack - mat) ** 2).mean()
 
 
 # bounds
@@ -443,6 +446,42 @@ penalty_continuous(result[0])
 # MSE of the optimized matrix
 result[1]
 
+# the whole population per call: objective and penalty batched, diffev2 hands each
+# generation to batch_map, so the penalty is not passed to the solver: batch_map does not
+# call the solver's wrapped cost, penalty= / constraints= / evalmon= given to diffev2 are ignored
+from math_scripts.optimization.population import MatrixMSE, MonotonePenalty, PopulationObjective
+
+population_objective = PopulationObjective(batch=MatrixMSE(stack), batch_penalty=MonotonePenalty((size, size)))
+result_batched = diffev2(
+    population_objective,
+    x0=mat.flatten(),
+    bounds=bounds,
+    npop=10,
+    gtol=500,
+    disp=False,
+    full_output=True,
+    map=population_objective.batch_map,
+)
+result_batched[1]
+
+# the same problem solved directly, for large matrixes too:
+#   projection of the mean matrix on the monotone matrixes, see monotone_fit
+from math_scripts.optimization.monotone_fit import monotone_matrix_fit
+
+fit = monotone_matrix_fit(stack, bounds=(min_in_mats, max_in_mats))
+fit["x"]
+# exactly monotone, and the optimum: diffev2 only penalizes decreasing neighbours, so compare
+# with a feasible reference, SLSQP with the differences as constraints
+from scipy.optimize import minimize
+
+monotone_constraints = {
+    "type": "ineq",
+    "fun": lambda x: np.concatenate([np.diff(x.reshape(size, size), axis=a).ravel() for a in (0, 1)]),
+}
+reference = minimize(objective, np.full(size**2, stack.mean()), bounds=bounds,
+                     constraints=monotone_constraints, method="SLSQP", options={"ftol": 1e-12, "maxiter": 1000})
+assert fit["violation"] < 1e-6 and fit["mse"] <= reference.fun + 1e-6
+
 # plot result
 plot_matrix_as_3d_surface(mat=result[0].reshape(size, size))
 plt.show()
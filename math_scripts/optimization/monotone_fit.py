@@ -0,0 +1,178 @@
+# fit a monotone matrix to a list of matrixes, min mean squared error
+#
+#   min_X  mean_k mean((X - M_k) ** 2)  s.t. X monotone along rows and columns
+#
+# the objective is mean((X - M) ** 2) + const with M the mean matrix, so the solution
+# is the projection of M on the monotone matrixes: a 2D isotonic regression, solved by
+# ADMM splitting into row-monotone and column-monotone matrixes, each step is an
+# isotonic regression (pool adjacent violators) of every line
+########################################
+import numpy as np
+from scipy.optimize import isotonic_regression
+
+try:
+    from numba import njit, prange
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _pava_rows(x, weights, increasing):
+        """isotonic regression of every row, pool adjacent violators with a stack of blocks"""
+        n_rows, n_cols = x.shape
+        out = np.empty_like(x)
+        for i in prange(n_rows):
+            values = np.empty(n_cols)
+            totals = np.empty(n_cols)
+            sizes = np.empty(n_cols, dtype=np.int64)
+            n_blocks = 0
+            for j in range(n_cols):
+                values[n_blocks] = x[i, j]
+                totals[n_blocks] = weights[i, j]
+                sizes[n_blocks] = 1
+                n_blocks += 1
+                # merge while the last two blocks violate the order
+                while n_blocks > 1 and (values[n_blocks - 2] > values[n_blocks - 1]) == increasing:
+                    total = totals[n_blocks - 2] + totals[n_blocks - 1]
+                    values[n_blocks - 2] = (values[n_blocks - 2] * totals[n_blocks - 2] +
+                                            values[n_blocks - 1] * totals[n_blocks - 1]) / total
+                    totals[n_blocks - 2] = total
+                    sizes[n_blocks - 2] += sizes[n_blocks - 1]
+                    n_blocks -= 1
+            j = 0
+            for b in range(n_blocks):
+                for _ in range(sizes[b]):
+                    out[i, j] = values[b]
+                    j += 1
+        return out
+
+
+def _isotonic_lines(x, weights, increasing=True):
+    """isotonic regression of every row of x, rows that are already monotone are kept as they are"""
+    if NUMBA_AVAILABLE:
+        return _pava_rows(x, weights, increasing)
+
+    diffs = np.diff(x, axis=1)
+    violated = np.flatnonzero((diffs < 0 if increasing else diffs > 0).any(axis=1))
+    if len(violated) == 0:
+        return x
+    x = x.copy()
+    for i in violated:
+        x[i] = isotonic_regression(x[i], weights=weights[i], increasing=increasing).x
+    return x
+
+
+def monotone_projection(target, weights=None, increasing=(True, True), tol=1e-8, max_iter=10000, rho=30.0):
+    """
+    projection of a matrix on the matrixes monotone along both axes, weighted least squares
+
+    ADMM on min 1/2 sum(w (x - target) ** 2) s.t. x row-monotone, z column-monotone, x = z
+        x: weighted isotonic regression of the rows, z: isotonic regression of the columns
+        rho is rebalanced so that the primal (x - z) and dual residuals shrink together
+
+    :param target: 2D array
+    :param weights: 2D array of positive weights of the cells, default equal
+    :param increasing: direction along axis 0 (down the columns) and axis 1 (along the rows)
+    :param tol: stop when both residuals are below tol times the scale of target
+    :return: monotone matrix, no of iterations
+    """
+    target = np.asarray(target, dtype=float)
+    weights = np.ones_like(target) if weights is None else np.asarray(weights, dtype=float)
+    ones = np.ones_like(target)
+    tol = tol * max(1.0, np.abs(target).max())
+
+    z, u = target.copy(), np.zeros_like(target)
+    for n_iter in range(1, max_iter + 1):
+        x = _isotonic_lines((weights * target + rho * (z - u)) / (weights + rho), weights + rho, increasing[1])
+        z_old = z
+        z = _isotonic_lines((x + u).T, ones.T, increasing[0]).T
+        u += x - z
+
+        primal, dual = np.abs(x - z).max(), rho * np.abs(z - z_old).max()
+        if primal < tol and dual < tol:
+            break
+        if n_iter % 10 == 0 and max(primal, dual) > 10 * min(primal, dual):
+            # residual balancing, u is scaled by 1 / rho
+            factor = 2.0 if primal > dual else 0.5
+            rho *= factor
+            u /= factor
+    return z, n_iter
+
+
+def monotone_violation(x, increasing=(True, True)):
+    """largest decrease (increase) between neighbours, 0 for a monotone matrix"""
+    signs = [1 if inc else -1 for inc in increasing]
+    return max(0.0, -(signs[0] * np.diff(x, axis=0)).min(initial=0), -(signs[1] * np.diff(x, axis=1)).min(initial=0))
+
+
+def monotone_matrix_fit(mats, increasing=(True, True), bounds=None, weights=None, tol=1e-8, max_iter=10000):
+    """
+    monotone matrix with the least mean squared error to a list of matrixes
+
+    :param mats: list of 2D arrays / CustomMatrix of the same shape, a MatrixBatch or a 3D array
+    :param increasing: direction along axis 0 and axis 1
+    :param bounds: (low, high) of the cells, the monotone fit is clipped, which keeps it monotone
+        and optimal; it is within the range of the mean matrix anyway
+    :param weights: 2D array of weights of the cells
+    :return: dict of x (the matrix), mse (objective as in mat_opt_with_constaint), violation and n_iter
+    """
+    if isinstance(mats, list):
+        mats = np.stack([np.asarray(m) for m in mats])
+    stack = np.asarray(mats, dtype=float)
+    # the mean and the spread around it, once
+    mean = stack.mean(axis=0)
+    spread = ((stack - mean) ** 2).mean()
+
+    x, n_iter = monotone_projection(mean, weights, increasing, tol, max_iter)
+    if bounds is not None:
+        x = np.clip(x, *bounds)
+
+    return {
+        "x": x,
+        "mse": ((x - mean) ** 2).mean() + spread,
+        "violation": monotone_violation(x, increasing),
+        "n_iter": n_iter,
+    }
+
+
+if __name__ == "__main__":
+    import time
+
+    from scipy.optimize import minimize
+
+    rng = np.random.default_rng(0)
+
+    # one row is the 1D isotonic regression
+    y = rng.normal(size=30).cumsum()
+    assert np.allclose(monotone_projection(y[None, :])[0][0], isotonic_regression(y).x)
+
+    # against a QP with the difference constraints
+    size = 6
+    mats = [rng.integers(0, 50, size=(size, size)) for _ in range(5)]
+    fit = monotone_matrix_fit(mats)
+
+    def objective(x):
+        return np.mean([np.mean((x.reshape(size, size) - m) ** 2) for m in mats])
+
+    constraints = {"type": "ineq",
+                   "fun": lambda x: np.concatenate([np.diff(x.reshape(size, size), axis=a).ravel() for a in (0, 1)])}
+    qp = minimize(objective, np.full(size**2, 25.0), constraints=constraints, method="SLSQP",
+                  options={"ftol": 1e-12, "maxiter": 1000})
+    assert fit["violation"] < 1e-6 and np.isclose(fit["mse"], objective(fit["x"].ravel()))
+    assert fit["mse"] <= qp.fun + 1e-6 and np.allclose(fit["x"].ravel(), qp.x, atol=1e-3)
+
+    # decreasing along the rows, weights, bounds
+    fit = monotone_matrix_fit(mats, increasing=(True, False), bounds=(10, 40), weights=rng.uniform(1, 2, (size, size)))
+    assert fit["violation"] < 1e-6 and fit["x"].min() >= 10 and fit["x"].max() <= 40
+
+    # scales to large matrixes
+    size = 500
+    noisy = np.add.outer(np.arange(size), np.arange(size)) / size + rng.normal(0, 0.5, (size, size))
+    start = time.perf_counter()
+    fit = monotone_matrix_fit([noisy])
+    print(f"{size}x{size}: {time.perf_counter() - start:.2f}s, {fit['n_iter']} iterations, "
+          f"violation {fit['violation']:.1e}")
+    assert fit["violation"] < 1e-6
@@ -0,0 +1,205 @@
+# evaluate the objective of a whole population of candidate solutions at once
+#
+# population based solvers (mystic diffev2, scipy differential_evolution) evaluate npop
+# candidates per generation, one python call each; here a population is a 2D array
+# candidates x dims evaluated by one vectorized call, or mapped over a process pool when
+# the objective cannot be vectorized
+########################################
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+class ParallelMap(object):
+    """
+    map over a process pool that is kept for all the calls, e.g. one per generation
+    map= of mystic solvers, or workers= of scipy differential_evolution
+    func must be picklable, i.e. defined at module level
+    """
+
+    def __init__(self, n_jobs=None, chunksize=None):
+        self.n_jobs = n_jobs
+        self.chunksize = chunksize
+        self._executor = None
+
+    def __call__(self, func, *iterables):
+        n_jobs = self.n_jobs or os.cpu_count()
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=n_jobs)
+        iterables = [list(x) for x in iterables]
+        # a few chunks per process, a task per candidate costs more than a cheap objective
+        chunksize = self.chunksize or max(1, len(iterables[0]) // (4 * n_jobs))
+        return list(self._executor.map(func, *iterables, chunksize=chunksize))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getstate__(self):
+        # a pool does not pickle, e.g. with the objective sent to workers
+        return {**self.__dict__, "_executor": None}
+
+
+class PopulationObjective(object):
+    """
+    objective plus penalty of candidate solutions, one at a time or a whole population at once
+        - batch / batch_penalty: population (candidates x dims) -> one value per candidate,
+            a single vectorized call per population
+        - func / penalty: one candidate -> value, mapped over the population, by a
+            process pool with n_jobs != 1
+        - n_evaluations counts the candidates evaluated
+
+    adapters
+        - objective(x): one candidate, the cost of mystic / scipy.optimize.minimize
+        - evaluate(population): the values of a population
+        - batch_map: map= of mystic solvers, evaluates the population handed over by the
+            solver with evaluate, so the penalty goes here and not to the solver
+        - scipy_vectorized: func of differential_evolution(..., vectorized=True)
+    """
+
+    def __init__(self, func=None, batch=None, penalty=None, batch_penalty=None, n_jobs=1, chunksize=None):
+        assert func is not None or batch is not None, "need a func or a batch objective"
+        self.func = func
+        self.batch = batch
+        self.penalty = penalty
+        self.batch_penalty = batch_penalty
+        self.mapper = map if n_jobs == 1 else ParallelMap(n_jobs, chunksize)
+        self.n_evaluations = 0
+
+    def _values(self, single, batch, population):
+        if batch is not None:
+            return np.asarray(batch(population), dtype=float)
+        return np.array(list(self.mapper(single, population)), dtype=float)
+
+    def evaluate(self, population):
+        population = np.atleast_2d(np.asarray(population, dtype=float))
+        self.n_evaluations += len(population)
+        values = self._values(self.func, self.batch, population)
+        if self.penalty is not None or self.batch_penalty is not None:
+            values = values + self._values(self.penalty, self.batch_penalty, population)
+        return values
+
+    def __call__(self, x):
+        if self.func is None or (self.batch_penalty is not None and self.penalty is None):
+            return self.evaluate(np.asarray(x)[None, :])[0]
+        self.n_evaluations += 1
+        value = self.func(x)
+        return value if self.penalty is None else value + self.penalty(x)
+
+    # mystic calls map(cost, population, **mapconfig), cost is its wrapper of the objective:
+    # it is not called, so penalty= / constraints= / evalmon= given to the solver are dropped,
+    # penalties belong to this objective and the evaluation monitor stays empty;
+    # diffev2 then counts the returned values as function calls, so maxfun still holds
+    def batch_map(self, func, population, *args, **kwds):
+        return list(self.evaluate(population))
+
+    # scipy passes dims x candidates, or a single candidate when polishing
+    def scipy_vectorized(self, x):
+        x = np.asarray(x)
+        return self(x) if x.ndim == 1 else self.evaluate(x.T)
+
+    def close(self):
+        if isinstance(self.mapper, ParallelMap):
+            self.mapper.close()
+
+
+# problems of mat_opt_with_constaint, batched
+class MatrixMSE(object):
+    """
+    mean over matrixes of the mean squared error of a candidate matrix, for every candidate
+    mean_k mean((x - M_k) ** 2) = mean((x - M) ** 2) + spread, M the mean matrix: no loop over the
+    matrixes, M and spread are computed once
+    """
+
+    def __init__(self, mats):
+        if isinstance(mats, list):
+            mats = np.stack([np.asarray(m) for m in mats])
+        stack = np.asarray(mats, dtype=float)
+        mean = stack.mean(axis=0)
+        self.shape = mean.shape
+        self.mean = mean.ravel()
+        self.spread = ((stack - mean) ** 2).mean()
+
+    def __call__(self, population):
+        population = np.atleast_2d(population)
+        return ((population - self.mean) ** 2).mean(axis=1) + self.spread
+
+
+class MonotonePenalty(object):
+    """squared count of decreasing neighbours of every candidate matrix, penalty_continuous batched"""
+
+    def __init__(self, shape):
+        self.shape = shape
+
+    def __call__(self, population):
+        mats = np.atleast_2d(population).reshape(-1, *self.shape)
+        count = (np.diff(mats, axis=1) < 0).sum(axis=(1, 2)) + (np.diff(mats, axis=2) < 0).sum(axis=(1, 2))
+        return count.astype(float) ** 2
+
+
+def _rosen(x):
+    return np.sum(100.0 * (x[1:] - x[:-1] ** 2) ** 2 + (1 - x[:-1]) ** 2)
+
+
+if __name__ == "__main__":
+    import time
+
+    from scipy.optimize import differential_evolution
+
+    rng = np.random.default_rng(0)
+    size = 5
+    mats = [rng.integers(0, 10, size=(size, size)) for _ in range(5)]
+
+    def objective(x):
+        mat = np.array(x).reshape(size, size)
+        return np.mean([np.mean((mat - m) ** 2) for m in mats])
+
+    def penalty_continuous(x):
+        mat = np.array(x).reshape(size, size)
+        return (np.sum(np.diff(mat, axis=0) < 0) + np.sum(np.diff(mat, axis=1) < 0)) ** 2
+
+    # batched values equal the loop, one candidate at a time
+    population = rng.uniform(0, 10, size=(40, size**2))
+    batched = PopulationObjective(batch=MatrixMSE(mats), batch_penalty=MonotonePenalty((size, size)))
+    single = PopulationObjective(objective, penalty=penalty_continuous)
+    assert np.allclose(batched.evaluate(population), single.evaluate(population))
+    assert np.isclose(batched(population[3]), single(population[3]))
+    assert np.allclose(batched.batch_map(None, list(population)), single.evaluate(population))
+    assert batched.n_evaluations == 40 + 1 + 40
+
+    # mystic diffev2 with the population mapped at once, when installed
+    try:
+        from mystic.solvers import diffev2
+    except ImportError:
+        diffev2 = None
+    if diffev2 is not None:
+        problem = PopulationObjective(batch=MatrixMSE(mats), batch_penalty=MonotonePenalty((size, size)))
+        res = diffev2(problem, x0=np.zeros(size**2), bounds=[(0, 10)] * size**2, npop=10, maxfun=500,
+                      disp=False, full_output=True, map=problem.batch_map)
+        # the solver counts the candidates evaluated in the batch, and stops at maxfun
+        assert res[3] == problem.n_evaluations <= 500
+        assert np.isclose(res[1], problem(res[0]))
+
+    # scipy differential evolution, the whole population per call
+    problem = PopulationObjective(batch=MatrixMSE(mats))
+    bounds = [(0, 10)] * size**2
+    start = time.perf_counter()
+    res = differential_evolution(problem.scipy_vectorized, bounds, vectorized=True, updating="deferred", seed=1)
+    print(f"vectorized: {time.perf_counter() - start:.2f}s, {problem.n_evaluations} evaluations")
+    assert np.allclose(res.x.reshape(size, size), np.mean(mats, axis=0), atol=1e-4)
+
+    # a process pool for objectives that are not vectorized, same values as the serial map
+    population = rng.uniform(-2, 2, size=(64, 6))
+    with ParallelMap(n_jobs=2) as parallel_map:
+        assert np.allclose(parallel_map(_rosen, population), [_rosen(x) for x in population])
+    pooled = PopulationObjective(_rosen, n_jobs=2)
+    assert np.allclose(pooled.evaluate(population), PopulationObjective(_rosen).evaluate(population))
+    pooled.close()
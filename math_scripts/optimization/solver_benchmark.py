@@ -0,0 +1,197 @@
+# benchmark solvers on a registry of problems
+#
+# every (problem, solver, seed) run records the wall time, the objective evaluations, the
+# objective of the solution and its constraint violation; independent runs go to a
+# process pool and the results table is appended to a csv, to compare solvers over time
+########################################
+import importlib.util
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import LinearConstraint, differential_evolution, minimize, rosen
+from scipy.sparse import eye, kron, vstack
+
+from math_scripts.optimization.monotone_fit import monotone_matrix_fit, monotone_violation
+from math_scripts.optimization.population import MatrixMSE, MonotonePenalty, PopulationObjective
+
+COLUMNS = ["problem", "solver", "seed", "status", "time", "n_evaluations", "objective", "violation"]
+
+
+# problems: a dict of
+#   func / batch: objective of one candidate / of a population (candidates x dims)
+#   penalty / batch_penalty: for the solvers that only know bounds
+#   bounds, constraints (scipy), violation(x): largest constraint violation, 0 when feasible
+def rosenbrock_problem(n_dims=6):
+    return {
+        "func": rosen,
+        "batch": lambda population: rosen(population.T),
+        "bounds": [(-2.0, 2.0)] * n_dims,
+        "violation": lambda x: 0.0,
+    }
+
+
+# scipy_opt_tute
+def sin_problem():
+    return {
+        "func": lambda x: x[0] ** 2 + 10 * np.sin(x[0]),
+        "batch": lambda population: population[:, 0] ** 2 + 10 * np.sin(population[:, 0]),
+        "bounds": [(-10.0, 10.0)],
+        "violation": lambda x: 0.0,
+    }
+
+
+# mat_opt_with_constaint: matrix with the least mse to a list of matrixes, monotone along rows and columns
+def matrix_fit_problem(size=10, n_mats=5, seed=0):
+    rng = np.random.default_rng(seed)
+    mats = [rng.integers(0, 50, size=(size, size)) for _ in range(n_mats)]
+    # differences of neighbours >= 0, along axis 0 and axis 1 of the flattened matrix
+    diff = eye(size - 1, size, k=1) - eye(size - 1, size)
+    differences = vstack([kron(diff, eye(size)), kron(eye(size), diff)]).tocsr()
+    return {
+        "batch": MatrixMSE(mats),
+        "batch_penalty": MonotonePenalty((size, size)),
+        "bounds": [(float(np.min(mats)), float(np.max(mats)))] * size**2,
+        "constraints": LinearConstraint(differences, 0, np.inf),
+        "violation": lambda x: monotone_violation(np.reshape(x, (size, size))),
+        "mats": mats,
+    }
+
+
+PROBLEMS = {
+    "rosenbrock": rosenbrock_problem,
+    "sin": sin_problem,
+    "matrix_fit": matrix_fit_problem,
+}
+
+
+# solvers: run(problem, objective, seed) -> solution, objective is a PopulationObjective that counts
+#   the evaluations, with the penalty for the solvers with penalty=True
+def _run_scipy_de(problem, objective, seed):
+    res = differential_evolution(objective.scipy_vectorized, problem["bounds"], vectorized=True,
+                                 updating="deferred", seed=seed, polish=False)
+    return res.x
+
+
+def _run_scipy_slsqp(problem, objective, seed):
+    bounds = np.array(problem["bounds"])
+    x0 = np.random.default_rng(seed).uniform(bounds[:, 0], bounds[:, 1])
+    res = minimize(objective, x0, method="SLSQP", bounds=problem["bounds"], constraints=problem.get("constraints", ()),
+                   options={"maxiter": 1000})
+    return res.x
+
+
+def _run_mystic_diffev2(problem, objective, seed):
+    from mystic.solvers import diffev2
+    from mystic.tools import random_seed
+
+    random_seed(seed)
+    res = diffev2(objective, x0=problem["bounds"], bounds=problem["bounds"], npop=10 * len(problem["bounds"]),
+                  gtol=200, disp=False, full_output=True, map=objective.batch_map)
+    return res[0]
+
+
+def _run_monotone_projection(problem, objective, seed):
+    return monotone_matrix_fit(problem["mats"], bounds=problem["bounds"][0])["x"].ravel()
+
+
+SOLVERS = {
+    "scipy_de": {"run": _run_scipy_de, "penalty": True},
+    "scipy_slsqp": {"run": _run_scipy_slsqp, "penalty": False},
+    "mystic_diffev2": {"run": _run_mystic_diffev2, "penalty": True, "module": "mystic"},
+    # direct solver of the monotone matrix fit only
+    "monotone_projection": {"run": _run_monotone_projection, "penalty": False, "requires": "mats"},
+}
+
+
+def run_one(problem_name, solver_name, seed=0):
+    """one run, a row of the results table, status ok / skipped (not applicable or not installed) / error"""
+    row = dict.fromkeys(COLUMNS, np.nan)
+    row.update(problem=problem_name, solver=solver_name, seed=seed)
+    problem, solver = PROBLEMS[problem_name](), SOLVERS[solver_name]
+    if solver.get("requires", "bounds") not in problem or (
+            "module" in solver and importlib.util.find_spec(solver["module"]) is None):
+        row["status"] = "skipped"
+        return row
+
+    penalty = solver["penalty"]
+    objective = PopulationObjective(problem.get("func"), problem.get("batch"),
+                                    problem.get("penalty") if penalty else None,
+                                    problem.get("batch_penalty") if penalty else None)
+    start = time.perf_counter()
+    try:
+        x = np.asarray(solver["run"](problem, objective, seed), dtype=float)
+    except Exception as e:
+        row.update(status=f"error: {e}", time=time.perf_counter() - start)
+        return row
+    row["time"] = time.perf_counter() - start
+
+    # the objective without penalty, not counted
+    plain = PopulationObjective(problem.get("func"), problem.get("batch"))
+    row.update(status="ok", n_evaluations=objective.n_evaluations, objective=float(plain.evaluate(x)[0]),
+               violation=float(problem["violation"](x)))
+    return row
+
+
+def _run_task(task):
+    return run_one(*task)
+
+
+def run_benchmark(problems=None, solvers=None, seeds=(0,), n_jobs=1, path=None):
+    """
+    run every solver on every problem for every seed
+
+    :param problems: names in PROBLEMS, default all
+    :param solvers: names in SOLVERS, default all
+    :param n_jobs: no of processes for the independent runs, None for all cores, 1 to run in process;
+        runs sharing cores time each other's contention, use 1 for timings to compare
+    :param path: csv the results are appended to, with the time of the benchmark
+    :return: DataFrame, one row per run
+    """
+    tasks = [(problem, solver, seed) for problem in problems or PROBLEMS for solver in solvers or SOLVERS
+             for seed in seeds]
+    if n_jobs == 1 or len(tasks) == 1:
+        rows = [_run_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            rows = list(executor.map(_run_task, tasks))
+
+    results = pd.DataFrame(rows, columns=COLUMNS)
+    if path is not None:
+        results.assign(run_at=pd.Timestamp.now()).to_csv(path, mode="a", index=False, header=not os.path.exists(path))
+    return results
+
+
+def summarize(results):
+    """median time / evaluations and best objective / worst violation of the ok runs, by problem and solver"""
+    ok = results[results["status"] == "ok"]
+    return ok.groupby(["problem", "solver"]).agg(
+        runs=("seed", "size"),
+        time=("time", "median"),
+        n_evaluations=("n_evaluations", "median"),
+        best_objective=("objective", "min"),
+        worst_violation=("violation", "max"),
+    )
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "results.csv")
+        results = run_benchmark(seeds=(0, 1), n_jobs=2, path=path)
+        run_benchmark(problems=["sin"], solvers=["scipy_slsqp"], path=path)
+        assert len(pd.read_csv(path)) == len(results) + 1
+
+    print(summarize(results))
+    assert set(results["status"]) <= {"ok", "skipped"}
+    assert (results.query("solver == 'monotone_projection'")["status"] == "ok").sum() == 2
+
+    summary = summarize(results).loc["matrix_fit"]
+    # the direct solver is exact: feasible, and no worse than the feasible runs of the general solvers
+    feasible = summary[summary["worst_violation"] < 1e-6]
+    assert feasible["best_objective"].idxmin() == "monotone_projection"
+    assert summary.loc["monotone_projection", "n_evaluations"] == 0
+    assert np.isclose(summarize(results).loc[("rosenbrock", "scipy_slsqp"), "best_objective"], 0, atol=1e-4)
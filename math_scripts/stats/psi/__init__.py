@@ -0,0 +1,6 @@
+from math_scripts.stats.psi.drift_metrics import drift_metrics, feature_drift
+from math_scripts.stats.psi.psi import calculate_psi
+from math_scripts.stats.psi.psi_baseline import PSIBaseline
+from math_scripts.stats.psi.psi_engine import population_stability_index
+from math_scripts.stats.psi.psi_grouped import grouped_psi
+from math_scripts.stats.psi.psi_stream import QuantileSketch, iter_chunks, parquet_batches
@@ -0,0 +1,65 @@
+"""
+Benchmarks of the PSI engine, run with pytest-benchmark, e.g.
+
+    pytest math_scripts/stats/psi/benchmarks --benchmark-autosave
+    pytest math_scripts/stats/psi/benchmarks --benchmark-compare --benchmark-compare-fail=mean:10%
+
+Cases above PSI_BENCHMARK_MAX_CELLS rows x columns (default 2e7, i.e. 160 MB per sample) are skipped,
+raise it on a machine with enough memory to cover up to 1e7 rows and 5,000 columns.
+"""
+import functools
+import os
+
+import numpy as np
+import pytest
+
+from math_scripts.stats.psi import PSIBaseline, calculate_psi, population_stability_index
+
+pytest.importorskip("pytest_benchmark")
+
+MAX_CELLS = float(os.environ.get("PSI_BENCHMARK_MAX_CELLS", 2e7))
+ROWS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+COLUMNS = (1, 10, 100, 1_000, 5_000)
+
+
+@functools.lru_cache(maxsize=2)
+def samples(n_rows, n_columns):
+    rng = np.random.default_rng(0)
+    expected = rng.normal(size=(n_rows, n_columns))
+    actual = rng.normal(0.1, 1.1, size=(n_rows, n_columns))
+    return expected, actual
+
+
+def skip_large(n_rows, n_columns):
+    if n_rows * n_columns > MAX_CELLS:
+        pytest.skip(f"{n_rows} x {n_columns} is above PSI_BENCHMARK_MAX_CELLS")
+
+
+@pytest.mark.parametrize("buckettype", ["bins", "quantiles"])
+@pytest.mark.parametrize("n_columns", COLUMNS)
+@pytest.mark.parametrize("n_rows", ROWS)
+def test_population_stability_index(benchmark, n_rows, n_columns, buckettype):
+    skip_large(n_rows, n_columns)
+    expected, actual = samples(n_rows, n_columns)
+    benchmark.group = f"psi-{buckettype}-{n_columns}"
+    psi_values = benchmark(population_stability_index, expected, actual, buckettype)
+    assert psi_values.shape == (n_columns,) and np.all(psi_values >= 0)
+
+
+@pytest.mark.parametrize("buckettype", ["bins", "quantiles"])
+@pytest.mark.parametrize("n_columns", COLUMNS)
+@pytest.mark.parametrize("n_rows", ROWS)
+def test_baseline_score(benchmark, n_rows, n_columns, buckettype):
+    skip_large(n_rows, n_columns)
+    expected, actual = samples(n_rows, n_columns)
+    baseline = PSIBaseline(buckettype).fit(expected)
+    benchmark.group = f"score-{buckettype}-{n_columns}"
+    psi_values = benchmark(baseline.score, actual)
+    assert np.allclose(psi_values, population_stability_index(expected, actual, buckettype))
+
+
+@pytest.mark.parametrize("n_rows", ROWS[:3])
+def test_calculate_psi_single_variable(benchmark, n_rows):
+    expected, actual = samples(n_rows, 1)
+    benchmark.group = "legacy-signature"
+    assert np.isscalar(benchmark(calculate_psi, expected[:, 0], actual[:, 0]))
@@ -0,0 +1,149 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from math_scripts.stats.psi.psi_engine import EPSILON, _as_columns, bucket_edges, psi_from_percents
+
+METRICS = ("psi", "csi", "ks", "js", "wasserstein")
+
+
+def _sorted_valid(values):
+    values = np.sort(values)
+    return values[:len(values) - np.count_nonzero(np.isnan(values))]
+
+
+def _sorted_bucket_counts(sorted_values, edges):
+    """Bucket counts of sorted values, np.histogram convention, from one searchsorted per edge"""
+    positions = np.searchsorted(sorted_values, edges, side="left")
+    positions[-1] = np.searchsorted(sorted_values, edges[-1], side="right")
+    return np.diff(positions), positions
+
+
+def feature_drift(expected, actual, buckettype="bins", buckets=10, epsilon=EPSILON, points=None):
+    """Drift metrics of a single variable, every metric derived from the same sorted samples
+
+    Each sample is sorted once, the buckets are counted by searchsorted on the sorted values and the
+    ECDFs are read off the sorted values, so no metric re-sorts or re-bins the data.
+
+    Args:
+       expected: 1-D array of original values
+       actual: 1-D array of new values
+       buckettype: bins or quantiles, buckets of PSI, CSI and JS
+       buckets: number of buckets
+       epsilon: replaces empty buckets in the PSI sum
+       points: scorecard points of each bucket for CSI, default the mean expected value of the bucket
+
+    Returns:
+       dict of psi, csi, ks, js and wasserstein
+    """
+    n_expected, n_actual = len(expected), len(actual)
+    expected, actual = _sorted_valid(expected), _sorted_valid(actual)
+    if len(expected) == 0 or len(actual) == 0:
+        return dict.fromkeys(METRICS, np.nan)
+
+    if buckettype == "bins":
+        edges = bucket_edges(expected[[0, -1], None], "bins", buckets)[:, 0]
+    else:
+        edges = np.quantile(expected, np.arange(buckets + 1) / buckets)
+
+    expected_counts, positions = _sorted_bucket_counts(expected, edges)
+    actual_counts, _ = _sorted_bucket_counts(actual, edges)
+
+    # PSI with the same proportions as calculate_psi, i.e. over all rows incl. uncounted ones
+    expected_percents, actual_percents = expected_counts / n_expected, actual_counts / n_actual
+    psi = psi_from_percents(expected_percents[:, None], actual_percents[:, None], epsilon)[0]
+
+    # CSI, shift of the score (or of the feature mean) due to the change of the bucket mix
+    if points is None:
+        sums = np.diff(np.concatenate([[0.0], np.cumsum(expected)])[positions])
+        points = np.divide(sums, expected_counts, out=np.zeros(buckets), where=expected_counts > 0)
+    csi = np.sum((actual_percents - expected_percents) * np.asarray(points, dtype=float))
+
+    # Jensen-Shannon divergence (natural log) of the bucket distributions
+    p = expected_counts / max(expected_counts.sum(), 1)
+    q = actual_counts / max(actual_counts.sum(), 1)
+    m = 0.5 * (p + q)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        js = 0.5 * np.sum(np.where(p > 0, p * np.log(p / m), 0.0)) + 0.5 * np.sum(
+            np.where(q > 0, q * np.log(q / m), 0.0))
+
+    # KS and Wasserstein-1 from the two ECDFs on the merged sorted sample
+    # two sorted runs, which the stable sort (timsort) merges in linear time
+    grid = np.sort(np.concatenate([expected, actual]), kind="stable")
+    cdf_gap = np.abs(np.searchsorted(expected, grid, side="right") / len(expected) -
+                     np.searchsorted(actual, grid, side="right") / len(actual))
+    ks = cdf_gap.max()
+    wasserstein = np.sum(cdf_gap[:-1] * np.diff(grid))
+
+    return {"psi": psi, "csi": csi, "ks": ks, "js": js, "wasserstein": wasserstein}
+
+
+def _block_drift(args):
+    expected, actual, buckettype, buckets, epsilon, points = args
+    return [feature_drift(expected[:, i], actual[:, i], buckettype, buckets, epsilon,
+                          None if points is None else points[i]) for i in range(expected.shape[1])]
+
+
+def drift_metrics(expected, actual, buckettype="bins", buckets=10, axis=0, epsilon=EPSILON, points=None,
+                  n_jobs=1, block_size=64):
+    """Calculate PSI, CSI, KS, Jensen-Shannon and Wasserstein of all variables
+
+    Args:
+       expected: numpy matrix or DataFrame of original values
+       actual: numpy matrix or DataFrame of new values, same variables as expected
+       buckettype: type of strategy for creating buckets, bins splits into even splits, quantiles splits into quantile buckets
+       buckets: number of buckets to use in bucketing variables
+       axis: axis by which variables are defined, 0 for vertical, 1 for horizontal
+       epsilon: replaces empty buckets in the PSI sum
+       points: dict of variable -> scorecard points per bucket for CSI, default the bucket means
+       n_jobs: no of processes, None for all cores, 1 to run in process
+       block_size: no of variables per task sent to a process
+
+    Returns:
+       DataFrame of the metrics, one row per variable
+    """
+    expected, labels = _as_columns(expected, axis)
+    actual, _ = _as_columns(actual, axis)
+    assert expected.shape[1] == actual.shape[1], "expected and actual must have the same number of variables"
+    points = None if points is None else [points.get(label) for label in labels]
+
+    tasks = [(expected[:, start:start + block_size], actual[:, start:start + block_size], buckettype, buckets,
+              epsilon, None if points is None else points[start:start + block_size])
+             for start in range(0, expected.shape[1], block_size)]
+
+    if n_jobs == 1 or len(tasks) == 1:
+        blocks = [_block_drift(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            blocks = list(executor.map(_block_drift, tasks))
+
+    return pd.DataFrame([metrics for block in blocks for metrics in block], index=labels, columns=list(METRICS))
+
+
+if __name__ == "__main__":
+    from scipy import spatial, stats
+
+    from math_scripts.stats.psi.psi_engine import population_stability_index
+
+    rng = np.random.default_rng(0)
+    expected = rng.normal(size=(4000, 150))
+    actual = rng.normal(0.2, 1.2, size=(3000, 150))
+    actual[::50, 3] = np.nan
+
+    for buckettype in ("bins", "quantiles"):
+        metrics = drift_metrics(expected, actual, buckettype)
+        assert np.allclose(metrics["psi"], population_stability_index(expected, actual, buckettype))
+
+    # against scipy, one variable at a time
+    for i in (0, 3, 149):
+        e, a = expected[:, i], actual[:, i][~np.isnan(actual[:, i])]
+        assert np.isclose(metrics["ks"][i], stats.ks_2samp(e, a).statistic)
+        assert np.isclose(metrics["wasserstein"][i], stats.wasserstein_distance(e, a))
+        edges = np.quantile(e, np.linspace(0, 1, 11))
+        p, q = np.histogram(e, edges)[0], np.histogram(a, edges)[0]
+        assert np.isclose(metrics["js"][i], spatial.distance.jensenshannon(p, q) ** 2)
+
+    # csi with the default bucket means is the part of the mean shift explained by the buckets
+    assert abs(metrics["csi"].mean() - 0.2) < 0.05
+    assert metrics.equals(drift_metrics(expected, actual, "quantiles", n_jobs=2, block_size=40))
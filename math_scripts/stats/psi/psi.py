@@ -1,9 +1,14 @@
 import numpy as np
 
+from math_scripts.stats.psi.psi_engine import population_stability_index
+
 
 def calculate_psi(expected, actual, buckettype="bins", buckets=10, axis=0):
     """Calculate the PSI (population stability index) across all variables
 
+    Thin wrapper of psi_engine.population_stability_index with the original signature, use that directly
+    to get a Series labelled by variable.
+
     Args:
        expected: numpy matrix of original values
        actual: numpy matrix of new values, same size as expected
@@ -12,78 +17,14 @@ def calculate_psi(expected, actual, buckettype="bins", buckets=10, axis=0):
        axis: axis by which variables are defined, 0 for vertical, 1 for horizontal
 
     Returns:
-       psi_values: ndarray of psi values for each variable
+       psi_values: ndarray of psi values for each variable, a float for a single variable
 
     Author:
        Matthew Burke
        github.com/mwburke
        worksofchart.com
     """
-
-    def psi(expected_array, actual_array, buckets):
-        """Calculate the PSI for a single variable
-
-        Args:
-           expected_array: numpy array of original values
-           actual_array: numpy array of new values, same size as expected
-           buckets: number of percentile ranges to bucket the values into
-
-        Returns:
-           psi_value: calculated PSI value
-        """
-
-        def scale_range(input, min, max):
-            input += -(np.min(input))
-            input /= np.max(input) / (max - min)
-            input += min
-            return input
-
-        breakpoints = np.arange(0, buckets + 1) / (buckets) * 100
-
-        if buckettype == "bins":
-            breakpoints = scale_range(
-                breakpoints, np.min(expected_array), np.max(expected_array)
-            )
-        elif buckettype == "quantiles":
-            breakpoints = np.stack(
-                [np.percentile(expected_array, b) for b in breakpoints]
-            )
-
-        expected_percents = np.histogram(expected_array, breakpoints)[0] / len(
-            expected_array
-        )
-        actual_percents = np.histogram(actual_array, breakpoints)[0] / len(actual_array)
-
-        def sub_psi(e_perc, a_perc):
-            """Calculate the actual PSI value from comparing the values.
-            Update the actual value to a very small number if equal to zero
-            """
-            if a_perc == 0:
-                a_perc = 0.0001
-            if e_perc == 0:
-                e_perc = 0.0001
-
-            value = (e_perc - a_perc) * np.log(e_perc / a_perc)
-            return value
-
-        psi_value = np.sum(
-            sub_psi(expected_percents[i], actual_percents[i])
-            for i in range(0, len(expected_percents))
-        )
-
-        return psi_value
-
-    if len(expected.shape) == 1:
-        psi_values = np.empty(len(expected.shape))
-    else:
-        psi_values = np.empty(expected.shape[axis])
-
-    for i in range(0, len(psi_values)):
-        if len(psi_values) == 1:
-            psi_values = psi(expected, actual, buckets)
-        elif axis == 0:
-            psi_values[i] = psi(expected[:, i], actual[:, i], buckets)
-        elif axis == 1:
-            psi_values[i] = psi(expected[i, :], actual[i, :], buckets)
-
+    psi_values = population_stability_index(expected, actual, buckettype, buckets, axis).to_numpy()
+    if np.ndim(expected) == 1:
+        return psi_values[0]
     return psi_values
@@ -0,0 +1,223 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from math_scripts.stats.psi.psi_engine import EPSILON, _as_columns, bucket_counts, bucket_edges, psi_from_percents
+from math_scripts.stats.psi.psi_stream import QuantileSketch, is_reiterable, iter_chunks
+
+
+class PSIBaseline:
+    """Fit the buckets of the expected sample once, then score any number of actual samples against it
+
+    Only the bucket edges and expected proportions are kept, (buckets + 1) x n_variables numbers in total,
+    so the expected sample itself can be dropped after fit.
+
+    Args:
+       buckettype: type of strategy for creating buckets, bins splits into even splits, quantiles splits into quantile buckets
+       buckets: number of buckets to use in bucketing variables
+       epsilon: replaces empty buckets in the PSI sum
+    """
+
+    def __init__(self, buckettype="bins", buckets=10, epsilon=EPSILON):
+        assert buckettype in ("bins", "quantiles"), "buckettype must be either bins or quantiles"
+        assert buckets >= 1, "number of buckets cannot be less than one"
+        self.buckettype = buckettype
+        self.buckets = buckets
+        self.epsilon = epsilon
+        self.edges = None
+        self.expected_percents = None
+        self.labels = None
+
+    def fit(self, expected, axis=0):
+        """Calculate bucket edges and expected proportions
+
+        Args:
+           expected: numpy matrix or DataFrame of original values
+           axis: axis by which variables are defined, 0 for vertical, 1 for horizontal
+
+        Returns:
+           self
+        """
+        expected, labels = _as_columns(expected, axis)
+        self.edges = bucket_edges(expected, self.buckettype, self.buckets)
+        self.expected_percents = bucket_counts(expected, self.edges) / len(expected)
+        self.labels = pd.Index(labels)
+        return self
+
+    def score(self, actual, axis=0):
+        """Calculate the PSI of a new sample, only a binning pass over actual
+
+        Args:
+           actual: numpy matrix or DataFrame of new values, a DataFrame is aligned to the fitted variables by name
+           axis: axis by which variables are defined, 0 for vertical, 1 for horizontal
+
+        Returns:
+           psi_values: Series of psi values indexed by variable
+        """
+        assert self.edges is not None, "baseline is not fitted, call fit or load first"
+        if isinstance(actual, pd.DataFrame):
+            actual = actual[self.labels] if axis == 0 else actual.loc[self.labels]
+        actual, _ = _as_columns(actual, axis)
+        assert actual.shape[1] == len(self.labels), "actual must have the same number of variables as the baseline"
+
+        actual_percents = bucket_counts(actual, self.edges) / len(actual)
+        return pd.Series(psi_from_percents(self.expected_percents, actual_percents, self.epsilon),
+                         index=self.labels, name="psi")
+
+    def fit_chunks(self, expected, columns=None, sketch_size=200, fix_random_seed=False):
+        """Fit from chunks without holding the expected sample in memory
+
+        A re-iterable source (Parquet path, list of chunks) is read twice: bucket edges from the first pass
+        (exact min / max for bins, KLL sketch quantiles for quantiles), exact counts from the second. A one
+        shot iterator is read once and the expected proportions are estimated from the sketch as well.
+
+        Args:
+           expected: chunked source of original values, see psi_stream.iter_chunks
+           columns: columns to select from DataFrame / Arrow chunks, default the columns of the first chunk
+           sketch_size: k of the quantile sketch
+           fix_random_seed: boolean or integer, for the sketch compactions
+
+        Returns:
+           self
+        """
+        two_pass = is_reiterable(expected)
+        sketch = None
+        for chunk, labels in iter_chunks(expected, columns):
+            if sketch is None:
+                sketch = QuantileSketch(chunk.shape[1], sketch_size, fix_random_seed)
+            sketch.update(chunk)
+        assert sketch is not None and sketch.count > 0, "expected is empty"
+
+        if self.buckettype == "bins":
+            self.edges = bucket_edges(np.stack([sketch.min, sketch.max]), "bins", self.buckets)
+        else:
+            self.edges = sketch.quantile(np.arange(self.buckets + 1) / self.buckets)
+
+        if two_pass:
+            counts = sum(bucket_counts(chunk, self.edges) for chunk, _ in iter_chunks(expected, columns))
+        else:
+            counts = sketch.bucket_counts(self.edges)
+        self.expected_percents = counts / sketch.count
+        self.labels = pd.Index(labels)
+        return self
+
+    def score_chunks(self, actual, columns=None):
+        """Calculate the PSI of a chunked sample, memory bounded by the bucket counts and one chunk
+
+        Args:
+           actual: chunked source of new values, see psi_stream.iter_chunks
+           columns: columns to select from DataFrame / Arrow chunks, default the fitted variables when they are names
+
+        Returns:
+           psi_values: Series of psi values indexed by variable
+        """
+        assert self.edges is not None, "baseline is not fitted, call fit or load first"
+        if columns is None and not isinstance(self.labels, pd.RangeIndex):
+            columns = list(self.labels)
+
+        counts, n_rows = 0, 0
+        for chunk, _ in iter_chunks(actual, columns):
+            assert chunk.shape[1] == len(self.labels), "actual must have the same number of variables as the baseline"
+            counts = counts + bucket_counts(chunk, self.edges)
+            n_rows += len(chunk)
+        assert n_rows > 0, "actual is empty"
+
+        return pd.Series(psi_from_percents(self.expected_percents, counts / n_rows, self.epsilon),
+                         index=self.labels, name="psi")
+
+    def to_dict(self):
+        assert self.edges is not None, "baseline is not fitted, call fit or load first"
+        return {
+            "buckettype": self.buckettype,
+            "buckets": self.buckets,
+            "epsilon": self.epsilon,
+            "labels": self.labels.tolist(),
+            "edges": self.edges.tolist(),
+            "expected_percents": self.expected_percents.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        baseline = cls(state["buckettype"], int(state["buckets"]), float(state["epsilon"]))
+        baseline.edges = np.asarray(state["edges"], dtype=float)
+        baseline.expected_percents = np.asarray(state["expected_percents"], dtype=float)
+        baseline.labels = pd.Index(list(state["labels"]))
+        return baseline
+
+    def save(self, path):
+        """Save to .json (readable, exact float round trip) or .npz (compact binary), chosen by the suffix
+
+        Args:
+           path: file path ending in .json or .npz
+        """
+        path = Path(path)
+        state = self.to_dict()
+        if path.suffix == ".json":
+            path.write_text(json.dumps(state))
+        elif path.suffix == ".npz":
+            np.savez_compressed(path, **{k: np.asarray(v) for k, v in state.items()})
+        else:
+            raise ValueError("path must end in .json or .npz")
+
+    @classmethod
+    def load(cls, path):
+        """Load a baseline saved by save
+
+        Args:
+           path: file path ending in .json or .npz
+
+        Returns:
+           fitted PSIBaseline
+        """
+        path = Path(path)
+        if path.suffix == ".json":
+            return cls.from_dict(json.loads(path.read_text()))
+        elif path.suffix == ".npz":
+            with np.load(path, allow_pickle=False) as data:
+                state = {k: data[k] for k in data.files}
+            state = dict(state, buckettype=str(state["buckettype"]), labels=state["labels"].tolist())
+            return cls.from_dict(state)
+        raise ValueError("path must end in .json or .npz")
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    from math_scripts.stats.psi.psi_engine import population_stability_index
+
+    rng = np.random.default_rng(0)
+    columns = [f"feature_{i}" for i in range(20)]
+    expected = pd.DataFrame(rng.normal(size=(5000, 20)), columns=columns)
+    daily = [pd.DataFrame(rng.normal(0.01 * day, 1.0, size=(1000, 20)), columns=columns) for day in range(5)]
+
+    for buckettype in ("bins", "quantiles"):
+        baseline = PSIBaseline(buckettype).fit(expected)
+        for actual in daily:
+            assert np.allclose(baseline.score(actual), population_stability_index(expected, actual, buckettype))
+
+        # round trip through both formats, and columns are aligned by name
+        with tempfile.TemporaryDirectory() as directory:
+            for suffix in (".json", ".npz"):
+                path = Path(directory) / f"baseline{suffix}"
+                baseline.save(path)
+                loaded = PSIBaseline.load(path)
+                assert np.array_equal(loaded.edges, baseline.edges)
+                assert loaded.labels.equals(baseline.labels)
+                assert np.allclose(loaded.score(daily[-1][columns[::-1]]), baseline.score(daily[-1]))
+
+    # chunked fit and score, against the in memory results
+    chunks = [expected.iloc[i:i + 700] for i in range(0, len(expected), 700)]
+    exact = PSIBaseline("bins").fit(expected)
+    streamed = PSIBaseline("bins").fit_chunks(chunks)
+    assert np.allclose(streamed.edges, exact.edges) and np.allclose(streamed.expected_percents,
+                                                                    exact.expected_percents)
+    assert np.allclose(streamed.score_chunks(iter([daily[-1]])), exact.score(daily[-1]))
+
+    for source in (chunks, iter(chunks)):
+        # quantile edges from the sketch, exact (list) or sketched (iterator) proportions
+        streamed = PSIBaseline("quantiles").fit_chunks(source, fix_random_seed=True)
+        assert np.allclose(streamed.expected_percents, 0.1, atol=0.01)
+        assert np.allclose(streamed.score_chunks(daily[-1][i:i + 100] for i in range(0, 1000, 100)),
+                           population_stability_index(expected, daily[-1], "quantiles"), atol=0.01)
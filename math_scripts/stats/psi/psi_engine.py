@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+
+EPSILON = 0.0001
+# rows are binned in blocks of about this many cells, which keeps the working set in cache
+BLOCK_CELLS = 2 ** 16
+
+
+def _as_columns(values, axis=0):
+    """Return values as a 2-D float array with one variable per column, plus the variable labels
+
+    Args:
+       values: 1-D / 2-D numpy array or pandas Series / DataFrame
+       axis: axis by which variables are defined, 0 for vertical, 1 for horizontal
+
+    Returns:
+       (array of shape (n_rows, n_variables), variable labels)
+    """
+    if isinstance(values, pd.DataFrame):
+        labels = values.columns if axis == 0 else values.index
+    elif isinstance(values, pd.Series):
+        labels = pd.Index([values.name])
+    else:
+        labels = None
+
+    array = np.asarray(values, dtype=float)
+    if array.ndim == 1:
+        array = array[:, None]
+    elif axis == 1:
+        array = array.T
+
+    if labels is None:
+        labels = pd.RangeIndex(array.shape[1])
+    # DataFrames and transposes come out column major, the binning walks over blocks of rows
+    return np.ascontiguousarray(array), labels
+
+
+def bucket_edges(expected, buckettype="bins", buckets=10):
+    """Calculate the bucket breakpoints of all variables at once, NaN values are ignored
+
+    Args:
+       expected: 2-D array of original values, one variable per column
+       buckettype: bins splits into even splits, quantiles splits into quantile buckets
+       buckets: number of buckets
+
+    Returns:
+       edges: array of shape (buckets + 1, n_variables)
+    """
+    if buckettype == "bins":
+        low, high = np.nanmin(expected, axis=0), np.nanmax(expected, axis=0)
+        # same floating point steps as scale_range of calculate_psi, so values on an edge land alike
+        percents = (np.arange(0, buckets + 1) / buckets * 100)[:, None]
+        return percents / (100 / (high - low)) + low
+    elif buckettype == "quantiles":
+        return np.nanquantile(expected, np.arange(buckets + 1) / buckets, axis=0)
+    raise ValueError("buckettype must be either bins or quantiles")
+
+
+def bucket_index(values, edges):
+    """Assign every value to its bucket, with the same convention as np.histogram
+
+    Buckets are half open [e_k, e_k+1) except the last one which includes the upper edge. Values outside
+    [e_0, e_n] (and NaN) get -1. The index is accumulated one interior edge at a time over the whole
+    (n_rows, n_variables) block, i.e. the python loop is over buckets, never over variables.
+
+    Args:
+       values: 2-D array, one variable per column
+       edges: array of shape (buckets + 1, n_variables)
+
+    Returns:
+       index: int array with the shape of values
+    """
+    # a small integer type keeps the accumulation cheap, the index is only widened for the bincount
+    index = np.zeros(values.shape, dtype=np.int8 if len(edges) <= 128 else np.int32)
+    for edge in edges[1:-1]:
+        index += values >= edge
+    index[~((values >= edges[0]) & (values <= edges[-1]))] = -1
+    return index
+
+
+def bucket_counts(values, edges):
+    """Count the values per bucket for all variables, one bincount per block of rows
+
+    Args:
+       values: 2-D array, one variable per column
+       edges: array of shape (buckets + 1, n_variables)
+
+    Returns:
+       counts: array of shape (buckets, n_variables)
+    """
+    buckets, n_variables = edges.shape[0] - 1, edges.shape[1]
+    # slot 0 of each variable collects the out of range values, then buckets 1..n, variables side by side
+    offsets = (buckets + 1) * np.arange(n_variables)
+    counts = np.zeros((buckets + 1) * n_variables, dtype=np.int64)
+
+    block_rows = max(1, BLOCK_CELLS // max(n_variables, 1))
+    for start in range(0, len(values), block_rows):
+        index = bucket_index(values[start:start + block_rows], edges)
+        counts += np.bincount((index + 1 + offsets).ravel(), minlength=len(counts))
+
+    return counts.reshape(n_variables, buckets + 1)[:, 1:].T
+
+
+def psi_from_percents(expected_percents, actual_percents, epsilon=EPSILON):
+    """Calculate the PSI of every variable from bucket proportions
+
+    Args:
+       expected_percents: array of shape (buckets, n_variables)
+       actual_percents: array of shape (buckets, n_variables)
+       epsilon: replaces empty buckets, as in calculate_psi
+
+    Returns:
+       psi_values: array of shape (n_variables,)
+    """
+    e_perc = np.where(expected_percents == 0, epsilon, expected_percents)
+    a_perc = np.where(actual_percents == 0, epsilon, actual_percents)
+    return np.sum((e_perc - a_perc) * np.log(e_perc / a_perc), axis=0)
+
+
+def population_stability_index(expected, actual, buckettype="bins", buckets=10, axis=0):
+    """Calculate the PSI (population stability index) of all variables without looping over them
+
+    Same buckets and result as calculate_psi: breakpoints for all columns come from one min / max or
+    np.quantile(..., axis=0) call, all columns are binned together and the PSI is evaluated with array ops.
+
+    Args:
+       expected: numpy matrix or DataFrame of original values
+       actual: numpy matrix or DataFrame of new values, same variables as expected (rows may differ)
+       buckettype: type of strategy for creating buckets, bins splits into even splits, quantiles splits into quantile buckets
+       buckets: number of buckets to use in bucketing variables
+       axis: axis by which variables are defined, 0 for vertical, 1 for horizontal
+
+    Returns:
+       psi_values: Series of psi values indexed by variable (column names of a DataFrame)
+    """
+    expected, labels = _as_columns(expected, axis)
+    actual, _ = _as_columns(actual, axis)
+    assert expected.shape[1] == actual.shape[1], "expected and actual must have the same number of variables"
+
+    edges = bucket_edges(expected, buckettype, buckets)
+    expected_percents = bucket_counts(expected, edges) / len(expected)
+    actual_percents = bucket_counts(actual, edges) / len(actual)
+
+    return pd.Series(psi_from_percents(expected_percents, actual_percents), index=labels, name="psi")
+
+
+if __name__ == "__main__":
+
+    def psi_loop(expected_array, actual_array, buckettype):
+        # one variable at a time with np.percentile / np.histogram, as the original calculate_psi
+        breakpoints = np.arange(0, 11) / 10 * 100
+        if buckettype == "bins":
+            low, high = np.min(expected_array), np.max(expected_array)
+            breakpoints = breakpoints / (100 / (high - low)) + low
+        else:
+            breakpoints = np.stack([np.percentile(expected_array, b) for b in breakpoints])
+        e_perc = np.histogram(expected_array, breakpoints)[0] / len(expected_array)
+        a_perc = np.histogram(actual_array, breakpoints)[0] / len(actual_array)
+        e_perc, a_perc = np.where(e_perc == 0, 0.0001, e_perc), np.where(a_perc == 0, 0.0001, a_perc)
+        return np.sum((e_perc - a_perc) * np.log(e_perc / a_perc))
+
+    rng = np.random.default_rng(0)
+    expected = rng.normal(size=(5000, 40))
+    actual = rng.normal(0.1, 1.1, size=(4000, 40))
+
+    for buckettype in ("bins", "quantiles"):
+        loop = [psi_loop(expected[:, i], actual[:, i], buckettype) for i in range(40)]
+        assert np.allclose(population_stability_index(expected, actual, buckettype).values, loop)
+        assert np.allclose(population_stability_index(expected.T, actual.T, buckettype, axis=1).values, loop)
+
+    # a single variable and DataFrame labels
+    assert np.isclose(population_stability_index(expected[:, 0], actual[:, 0])[0],
+                      psi_loop(expected[:, 0], actual[:, 0], "bins"))
+    frame = pd.DataFrame(expected[:, :3], columns=["age", "income", "score"])
+    assert list(population_stability_index(frame, frame).index) == ["age", "income", "score"]
+    assert np.allclose(population_stability_index(frame, frame), 0)
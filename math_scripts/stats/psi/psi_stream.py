@@ -0,0 +1,184 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from math_scripts.stats.psi.psi_engine import bucket_index
+
+
+def parquet_batches(path, columns=None, batch_size=65536):
+    """Iterate over a Parquet file in record batches, only one batch is in memory at a time
+
+    Args:
+       path: Parquet file path
+       columns: columns to read, default all
+       batch_size: maximum number of rows per batch
+
+    Returns:
+       iterator of pyarrow RecordBatches
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("reading Parquet in chunks requires pyarrow, pip install pyarrow")
+    return pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns)
+
+
+def iter_chunks(source, columns=None):
+    """Iterate over a chunked source as 2-D float arrays, one variable per column
+
+    Args:
+       source: Parquet file path, or an iterable of pandas DataFrames (e.g. read_csv(..., chunksize=...)),
+          pyarrow RecordBatches / Tables or 1-D / 2-D numpy arrays
+       columns: columns to select from DataFrame / Arrow chunks, default the columns of the first chunk
+
+    Returns:
+       iterator of (array of shape (n_rows, n_variables), variable labels)
+    """
+    if isinstance(source, (str, Path)):
+        source = parquet_batches(source, columns)
+
+    for chunk in source:
+        if hasattr(chunk, "to_pandas"):
+            chunk = chunk.to_pandas()
+        if isinstance(chunk, pd.DataFrame):
+            if columns is None:
+                columns = list(chunk.columns)
+            yield chunk[columns].to_numpy(dtype=float), pd.Index(columns)
+        else:
+            chunk = np.asarray(chunk, dtype=float)
+            chunk = chunk[:, None] if chunk.ndim == 1 else chunk
+            yield chunk, pd.RangeIndex(chunk.shape[1])
+
+
+def is_reiterable(source):
+    """True if the source can be iterated over twice, i.e. a path or a container rather than an iterator"""
+    return isinstance(source, (str, Path)) or iter(source) is not source
+
+
+class QuantileSketch:
+    """KLL quantile sketch of many variables at once (Karnin, Lang and Liberty, 2016)
+
+    Every variable receives the same rows, so the levels are kept synchronized across variables and each
+    compaction is a single np.sort(..., axis=0) of a (level size, n_variables) block. Level h items stand for
+    2^h values, level capacities decay by 2/3 from the top level down, so memory is about 3 * k items per
+    variable whatever the number of rows, for a rank error of roughly 1 / k. NaN values are counted but
+    ignored by the quantiles.
+
+    Args:
+       n_variables: number of variables
+       k: capacity of the top level, accuracy / memory trade off
+       fix_random_seed: boolean or integer, for the random offset of the compactions
+    """
+
+    def __init__(self, n_variables, k=200, fix_random_seed=False):
+        assert k >= 8, "k cannot be less than 8"
+        self.n_variables = n_variables
+        self.k = k
+        if type(fix_random_seed) is bool:
+            self._rng = np.random.default_rng(15000 if fix_random_seed else None)
+        else:
+            self._rng = np.random.default_rng(fix_random_seed)
+
+        self._levels = [np.empty((0, n_variables))]
+        self.count = 0
+        self.min = np.full(n_variables, np.inf)
+        self.max = np.full(n_variables, -np.inf)
+
+    def _capacity(self, level):
+        depth = len(self._levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        """Add a block of rows
+
+        Args:
+           values: 2-D array of shape (n_rows, n_variables)
+        """
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        with np.errstate(invalid="ignore"):
+            self.min = np.fmin(self.min, np.nanmin(values, axis=0))
+            self.max = np.fmax(self.max, np.nanmax(values, axis=0))
+
+        self._levels[0] = np.concatenate([self._levels[0], values])
+        level = 0
+        while level < len(self._levels):
+            items = self._levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self._levels):
+                    self._levels.append(np.empty((0, self.n_variables)))
+                items = np.sort(items, axis=0)
+                # an odd item stays behind, every other one of the rest is promoted with twice the weight
+                odd = len(items) % 2
+                offset = odd + self._rng.integers(2)
+                self._levels[level + 1] = np.concatenate([self._levels[level + 1], items[offset::2]])
+                self._levels[level] = items[:odd]
+            level += 1
+
+    def _items(self):
+        items = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self._levels)])
+        return items, weights
+
+    def quantile(self, q):
+        """Approximate quantiles, the exact min / max for q = 0 / 1
+
+        Args:
+           q: quantile or sequence of quantiles in [0, 1]
+
+        Returns:
+           array of shape (len(q), n_variables)
+        """
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        items, weights = self._items()
+        order = np.argsort(items, axis=0)
+        items = np.take_along_axis(items, order, axis=0)
+        cumulative = np.cumsum(np.where(np.isnan(items), 0.0, weights[order]), axis=0)
+
+        index = np.stack([np.argmax(cumulative >= p * cumulative[-1], axis=0) for p in q])
+        quantiles = np.take_along_axis(items, index, axis=0)
+        quantiles[q == 0] = self.min
+        quantiles[q == 1] = self.max
+        return quantiles
+
+    def bucket_counts(self, edges):
+        """Approximate number of values per bucket, same bucket convention as psi_engine.bucket_counts
+
+        Args:
+           edges: array of shape (buckets + 1, n_variables)
+
+        Returns:
+           counts: float array of shape (buckets, n_variables)
+        """
+        buckets = edges.shape[0] - 1
+        items, weights = self._items()
+        index = bucket_index(items, edges)
+        offsets = (buckets + 1) * np.arange(self.n_variables)
+        counts = np.bincount((index + 1 + offsets).ravel(), weights=np.repeat(weights, self.n_variables),
+                             minlength=(buckets + 1) * self.n_variables)
+        return counts.reshape(self.n_variables, buckets + 1)[:, 1:].T
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    values = np.column_stack([rng.normal(size=200000), rng.exponential(size=200000), rng.integers(0, 5, 200000)])
+
+    sketch = QuantileSketch(3, k=200, fix_random_seed=True)
+    for start in range(0, len(values), 7000):
+        sketch.update(values[start:start + 7000])
+
+    q = np.linspace(0, 1, 11)
+    assert sum(len(level) for level in sketch._levels) < 4 * sketch.k
+    # rank error of the sketch quantiles well within 1 / k
+    ranks = np.mean(values[:, None, :] <= sketch.quantile(q)[None], axis=0)
+    assert np.all(np.abs(ranks[1:-1, :2] - q[1:-1, None]) < 0.01)
+    assert np.array_equal(sketch.quantile([0, 1]), np.stack([values.min(0), values.max(0)]))
+
+    # chunks of DataFrames and arrays
+    frame = pd.DataFrame(values, columns=["a", "b", "c"])
+    chunks = list(iter_chunks((frame.iloc[i:i + 1000] for i in range(0, 5000, 1000)), columns=["b", "a"]))
+    assert len(chunks) == 5 and list(chunks[0][1]) == ["b", "a"]
+    assert np.array_equal(chunks[1][0], values[1000:2000, [1, 0]])
+    assert not is_reiterable(iter([values])) and is_reiterable([values])
@@ -4,7 +4,8 @@
 # Permission given to modify the code as long as you keep this        #
 # declaration at the top                                              #
 #######################################################################
-import numpy as np
+import math
+
 from numpy import log, exp, sqrt
 from scipy import stats
 from typing import Tuple
@@ -378,7 +379,7 @@ class BSMOptionValuation:
             100
         ):  # infinite series in the textbook, 100 is typically sufficient for convergence
             jump_diffusion_scale = (
-                exp(-lam_hat * self.T) * (lam_hat * self.T) ** i / np.math.factorial(i)
+                exp(-lam_hat * self.T) * (lam_hat * self.T) ** i / math.factorial(i)
             )
 
             # to calculate adjusted Black-Scholes option value
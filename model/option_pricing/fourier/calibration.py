@@ -0,0 +1,252 @@
+# -*- coding:utf-8 -*-
+"""
+Calibration of Heston and Merton jump diffusion parameters to an option chain.
+
+Every objective evaluation prices the whole chain in one vectorized call:
+    - Heston: Lewis (2001) single integral of the characteristic function, Gauss-Laguerre quadrature with
+      cached nodes, evaluated on (unique maturities x nodes) and broadcast to all strikes.
+    - Merton: the Poisson weighted Black-Scholes series of BSMOptionValuation.merton_jump_diffusion,
+      vectorized over (jumps x options) instead of re-pricing option by option.
+
+The fitted parameters plug straight into MonteCarloOptionPricing, e.g.
+MC.heston(kappa=..., theta=..., sigma_v=..., rho=...) with sigma=sqrt(v0), and
+stock_price_simulation_with_poisson_jump for Merton.
+"""
+import abc
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple
+
+import numpy as np
+from scipy import optimize, special, stats
+
+from characteristic_functions import heston_char_func
+
+
+@functools.lru_cache(maxsize=None)
+def laguerre_nodes(n_nodes: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Gauss-Laguerre nodes and weights for int_0^inf f(u) du ~ sum(weights * f(nodes)),
+    i.e. the exp(-u) of the Laguerre weight is already folded into the weights.
+    """
+    assert 0 < n_nodes <= 180, 'no of nodes must be between 1 and 180, the weights overflow beyond that'
+    nodes, weights = np.polynomial.laguerre.laggauss(n_nodes)
+    weights = weights * np.exp(nodes)
+    nodes.flags.writeable = False
+    weights.flags.writeable = False
+    return nodes, weights
+
+
+def bsm_call_prices(S0: float, K: np.ndarray, T: np.ndarray, r, div_yield: float, sigma) -> np.ndarray:
+    """
+    Black-Scholes-Merton call values, broadcast over all arguments.
+    """
+    sqrt_t = np.sqrt(T)
+    d1 = (np.log(S0 / K) + (r - div_yield + 0.5 * sigma ** 2) * T) / (sigma * sqrt_t)
+    d2 = d1 - sigma * sqrt_t
+    return S0 * np.exp(-div_yield * T) * stats.norm.cdf(d1) - K * np.exp(-r * T) * stats.norm.cdf(d2)
+
+
+def heston_call_prices(S0: float, K: np.ndarray, T: np.ndarray, r: float, div_yield: float, v0: float,
+                       kappa: float, theta: float, sigma_v: float, rho: float, n_nodes: int = 128) -> np.ndarray:
+    """
+    Heston call values for a whole chain, Lewis (2001):
+    C = S0 exp(-qT) - sqrt(S0 K) exp(-rT) / pi * int_0^inf Re[exp(iu ln(S0/K)) phi(u - i/2)] / (u^2 + 1/4) du
+    """
+    K, T = np.broadcast_arrays(np.asarray(K, dtype=float), np.asarray(T, dtype=float))
+    nodes, weights = laguerre_nodes(n_nodes)
+
+    # the characteristic function only depends on the maturity
+    unique_t, t_index = np.unique(T, return_inverse=True)
+    phi = heston_char_func(nodes - 0.5j, unique_t[:, None], r, div_yield, v0, kappa, theta, sigma_v, rho)
+
+    log_moneyness = np.log(S0 / K)[..., None]
+    integrand = (np.exp(1j * nodes * log_moneyness) * phi[t_index.reshape(T.shape)]).real / (nodes ** 2 + 0.25)
+
+    return S0 * np.exp(-div_yield * T) - np.sqrt(S0 * K) * np.exp(-r * T) / np.pi * (integrand @ weights)
+
+
+def merton_call_prices(S0: float, K: np.ndarray, T: np.ndarray, r: float, div_yield: float, sigma: float,
+                       avg_num_jumps: float, jump_size_mean: float, jump_size_std: float,
+                       n_terms: int = 50) -> np.ndarray:
+    """
+    Merton jump diffusion call values, sum_i Poisson(i; lam_hat * T) * BSM(r_i, sigma_i), same series and
+    parameters as BSMOptionValuation.merton_jump_diffusion.
+    """
+    K, T = np.broadcast_arrays(np.asarray(K, dtype=float), np.asarray(T, dtype=float))
+    i = np.arange(n_terms).reshape((-1,) + (1,) * K.ndim)
+
+    m = np.exp(jump_size_mean + 0.5 * jump_size_std ** 2)
+    lam_hat = avg_num_jumps * m
+    k = m - 1
+
+    # poisson weights in log space, factorials overflow long before 100 terms
+    log_weights = -lam_hat * T + special.xlogy(i, lam_hat * T) - special.gammaln(i + 1)
+    sigma_i = np.sqrt(sigma ** 2 + i * jump_size_std ** 2 / T)
+    r_i = r - avg_num_jumps * k + i * (jump_size_mean + 0.5 * jump_size_std ** 2) / T
+
+    return np.sum(np.exp(log_weights) * bsm_call_prices(S0, K, T, r_i, div_yield, sigma_i), axis=0)
+
+
+class ModelCalibration(abc.ABC):
+    """
+    Least squares fit of model parameters to an option chain
+
+    Attributes
+    ==========
+    S0: float
+        initial stock/index level
+    strikes: array
+        strike price of each option
+    maturities: array
+        time to maturity (in year fractions) of each option
+    market_prices: array
+        observed option prices
+    r: float
+        constant risk-free short rate
+    div_yield: float
+        dividend_yield, default = 0.0
+    option_types: array of 'call' / 'put'
+        default all calls, puts are priced by put call parity
+    weights: array
+        residual weights, e.g. 1 / vega or 1 / bid-ask spread, default 1
+    """
+
+    param_names: Tuple[str, ...] = ()
+    lower_bounds: Tuple[float, ...] = ()
+    upper_bounds: Tuple[float, ...] = ()
+
+    def __init__(self, S0: float, strikes, maturities, market_prices, r: float, div_yield: float = 0.0,
+                 option_types=None, weights=None):
+        self.S0 = float(S0)
+        self.strikes = np.asarray(strikes, dtype=float)
+        self.maturities = np.broadcast_to(np.asarray(maturities, dtype=float), self.strikes.shape)
+        self.market_prices = np.asarray(market_prices, dtype=float)
+        self.r = float(r)
+        self.div_yield = float(div_yield)
+
+        if option_types is None:
+            option_types = np.full(self.strikes.shape, 'call')
+        option_types = np.asarray(option_types)
+        assert np.all((option_types == 'call') | (option_types == 'put')), 'option type must be either call or put'
+        self.is_put = option_types == 'put'
+
+        self.weights = np.ones_like(self.strikes) if weights is None else np.asarray(weights, dtype=float)
+
+        assert self.strikes.ndim == 1, 'strikes must be one dimensional'
+        assert self.market_prices.shape == self.strikes.shape, 'one market price per strike is required'
+        assert np.all(self.maturities > 0), 'time to maturity must be positive'
+
+        # put call parity adjustment, constant over the calibration
+        self._put_adjustment = self.strikes * np.exp(-self.r * self.maturities) - self.S0 * np.exp(
+            -self.div_yield * self.maturities)
+
+    @abc.abstractmethod
+    def call_prices(self, params: np.ndarray) -> np.ndarray:
+        """
+        Model call values of the whole chain for the parameters in the order of param_names
+        """
+
+    def model_prices(self, params: np.ndarray) -> np.ndarray:
+        prices = self.call_prices(params)
+        return np.where(self.is_put, prices + self._put_adjustment, prices)
+
+    def residuals(self, params: np.ndarray) -> np.ndarray:
+        return self.weights * (self.model_prices(params) - self.market_prices)
+
+    def _fit(self, x0: np.ndarray) -> optimize.OptimizeResult:
+        return optimize.least_squares(self.residuals, x0, bounds=(self.lower_bounds, self.upper_bounds),
+                                      method='trf', x_scale='jac')
+
+    def calibrate(self, x0=None, n_starts: int = 1, n_jobs: int or None = None,
+                  fix_random_seed: bool or int = False) -> dict:
+        """
+        :param x0: initial guess, by default the middle of the bounds
+        :param n_starts: no of starting points, the extra ones are drawn uniformly within the bounds
+        :param n_jobs: no of processes for the multi-start, None for all cores, 1 to run in process
+        :param fix_random_seed: boolean or integer, for the extra starting points
+        :return: fitted parameters by name, plus rmse of the price residuals
+        """
+        assert n_starts >= 1, 'no of starts cannot be less than one'
+
+        if type(fix_random_seed) is bool:
+            rng = np.random.default_rng(15000 if fix_random_seed else None)
+        else:
+            rng = np.random.default_rng(fix_random_seed)
+
+        lower, upper = np.array(self.lower_bounds), np.array(self.upper_bounds)
+        x0 = 0.5 * (lower + upper) if x0 is None else np.asarray(x0, dtype=float)
+        starts = [x0] + list(rng.uniform(lower, upper, size=(n_starts - 1, len(lower))))
+
+        if n_starts == 1 or n_jobs == 1:
+            fits = [self._fit(start) for start in starts]
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                fits = list(executor.map(self._fit, starts))
+
+        best = min(fits, key=lambda fit: fit.cost)
+        self.result = best
+        self.params = dict(zip(self.param_names, best.x))
+        self.rmse = np.sqrt(np.mean((self.model_prices(best.x) - self.market_prices) ** 2))
+
+        print('-' * 64)
+        print(" %s calibration \n Options %i \n Starts %i \n RMSE %4.6f" % (
+            self.__class__.__name__, len(self.strikes), n_starts, self.rmse))
+        for name, value in self.params.items():
+            print(" %s %4.4f" % (name, value))
+        print('-' * 64)
+
+        return dict(self.params, rmse=self.rmse)
+
+
+class HestonCalibration(ModelCalibration):
+    param_names = ('v0', 'kappa', 'theta', 'sigma_v', 'rho')
+    lower_bounds = (1e-4, 1e-2, 1e-4, 1e-2, -0.99)
+    upper_bounds = (1.0, 10.0, 1.0, 2.0, 0.99)
+
+    def __init__(self, *args, n_nodes: int = 128, **kwargs):
+        """
+        :param n_nodes: no of Gauss-Laguerre nodes
+        """
+        super().__init__(*args, **kwargs)
+        self.n_nodes = n_nodes
+
+    def call_prices(self, params: np.ndarray) -> np.ndarray:
+        return heston_call_prices(self.S0, self.strikes, self.maturities, self.r, self.div_yield, *params,
+                                  n_nodes=self.n_nodes)
+
+
+class MertonCalibration(ModelCalibration):
+    param_names = ('sigma', 'avg_num_jumps', 'jump_size_mean', 'jump_size_std')
+    lower_bounds = (1e-3, 0.0, -1.0, 1e-3)
+    upper_bounds = (1.0, 5.0, 1.0, 1.0)
+
+    def __init__(self, *args, n_terms: int = 50, **kwargs):
+        """
+        :param n_terms: no of terms of the Poisson series
+        """
+        super().__init__(*args, **kwargs)
+        self.n_terms = n_terms
+
+    def call_prices(self, params: np.ndarray) -> np.ndarray:
+        return merton_call_prices(self.S0, self.strikes, self.maturities, self.r, self.div_yield, *params,
+                                  n_terms=self.n_terms)
+
+
+if __name__ == "__main__":
+    S0, r, div_yield = 100.0, 0.03, 0.01
+    strikes = np.tile(np.linspace(70, 130, 13), 3)
+    maturities = np.repeat([0.25, 0.5, 1.0], 13)
+
+    # synthetic chain, recover the parameters
+    heston_true = dict(v0=0.04, kappa=1.5, theta=0.06, sigma_v=0.5, rho=-0.7)
+    prices = heston_call_prices(S0, strikes, maturities, r, div_yield, **heston_true)
+    fit = HestonCalibration(S0, strikes, maturities, prices, r, div_yield).calibrate(n_starts=4,
+                                                                                     fix_random_seed=True)
+    assert np.allclose([fit[k] for k in heston_true], list(heston_true.values()), atol=1e-3)
+
+    merton_true = dict(sigma=0.15, avg_num_jumps=0.8, jump_size_mean=-0.2, jump_size_std=0.15)
+    prices = merton_call_prices(S0, strikes, maturities, r, div_yield, **merton_true)
+    fit = MertonCalibration(S0, strikes, maturities, prices, r, div_yield).calibrate(n_starts=4,
+                                                                                     fix_random_seed=True)
+    assert fit['rmse'] < 1e-4
@@ -0,0 +1,64 @@
+# -*- coding:utf-8 -*-
+"""
+Risk-neutral characteristic functions of the log return ln(S_T / S0), phi(u) = E[exp(i * u * ln(S_T / S0))].
+
+All functions broadcast over u and T, u may be complex (e.g. u - i/2 in the Lewis formula).
+Parameter names follow BSMOptionValuation and MonteCarloOptionPricing.
+"""
+import numpy as np
+
+
+def bsm_char_func(u, T, r: float, div_yield: float, sigma: float) -> np.ndarray:
+    """
+    Black-Scholes-Merton, ln(S_T / S0) ~ N((r - q - sigma^2 / 2) T, sigma^2 T).
+    """
+    return np.exp(T * (1j * u * (r - div_yield - 0.5 * sigma ** 2) - 0.5 * sigma ** 2 * u ** 2))
+
+
+def heston_char_func(u, T, r: float, div_yield: float, v0: float, kappa: float, theta: float, sigma_v: float,
+                     rho: float) -> np.ndarray:
+    """
+    Heston (1993), in the "little Heston trap" form of Albrecher et al. (2007) which avoids the branch cut
+    of the complex logarithm for long maturities.
+
+    dv(t) = kappa[theta - v(t)] * dt + sigma_v * sqrt(v(t)) * dZ
+    :param v0: initial variance, i.e. sigma ** 2 of MonteCarloOptionPricing
+    """
+    iu = 1j * u
+    beta = kappa - rho * sigma_v * iu
+    d = np.sqrt(beta ** 2 + sigma_v ** 2 * (iu + u ** 2))
+    g = (beta - d) / (beta + d)
+    exp_dt = np.exp(-d * T)
+
+    c = (r - div_yield) * iu * T + kappa * theta / sigma_v ** 2 * (
+        (beta - d) * T - 2 * np.log((1 - g * exp_dt) / (1 - g))
+    )
+    d_term = (beta - d) / sigma_v ** 2 * (1 - exp_dt) / (1 - g * exp_dt)
+
+    return np.exp(c + d_term * v0)
+
+
+def merton_char_func(u, T, r: float, div_yield: float, sigma: float, avg_num_jumps: float, jump_size_mean: float,
+                     jump_size_std: float) -> np.ndarray:
+    """
+    Merton (1976) jump diffusion, ln(jump_size) ~ N(jump_size_mean, jump_size_std), avg_num_jumps per year.
+    """
+    k = np.exp(jump_size_mean + 0.5 * jump_size_std ** 2) - 1
+    drift = r - div_yield - avg_num_jumps * k - 0.5 * sigma ** 2
+    jump = np.exp(1j * u * jump_size_mean - 0.5 * jump_size_std ** 2 * u ** 2) - 1
+
+    return np.exp(T * (1j * u * drift - 0.5 * sigma ** 2 * u ** 2 + avg_num_jumps * jump))
+
+
+def kou_char_func(u, T, r: float, div_yield: float, sigma: float, avg_num_jumps: float, prob_up: float,
+                  eta_up: float, eta_down: float) -> np.ndarray:
+    """
+    Kou (2002) double exponential jump diffusion, ln(jump_size) is Exp(eta_up) with probability prob_up
+    and -Exp(eta_down) otherwise, avg_num_jumps per year. eta_up > 1 for a finite expected jump.
+    """
+    prob_down = 1 - prob_up
+    k = prob_up * eta_up / (eta_up - 1) + prob_down * eta_down / (eta_down + 1) - 1
+    drift = r - div_yield - avg_num_jumps * k - 0.5 * sigma ** 2
+    jump = prob_up * eta_up / (eta_up - 1j * u) + prob_down * eta_down / (eta_down + 1j * u) - 1
+
+    return np.exp(T * (1j * u * drift - 0.5 * sigma ** 2 * u ** 2 + avg_num_jumps * jump))
@@ -0,0 +1,208 @@
+# -*- coding:utf-8 -*-
+"""
+Binomial (Cox-Ross-Rubinstein, Leisen-Reimer) and trinomial trees for European and American options.
+
+Contracts are batched: every argument broadcasts to (n_contracts,) and each time layer of the backward
+induction is a single (n_contracts, nodes) array operation, so a whole chain costs about as much Python
+overhead as a single contract.
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+
+METHODS = ('crr', 'leisen_reimer', 'trinomial')
+
+
+def _peizer_pratt(z: np.ndarray, n_steps: int) -> np.ndarray:
+    """
+    Peizer-Pratt method 2 inversion, binomial probability matching the normal cdf at z.
+    """
+    return 0.5 + np.sign(z) * np.sqrt(
+        0.25 - 0.25 * np.exp(-(z / (n_steps + 1 / 3 + 0.1 / (n_steps + 1))) ** 2 * (n_steps + 1 / 6))
+    )
+
+
+class LatticeOptionValuation:
+    """
+    Valuation of European and American options on recombining trees
+    Attributes
+    ==========
+    S0: float or array
+        initial stock/index level
+    K: float or array
+        strike price
+    T: float or array
+        time to maturity (in year fractions)
+    r: float or array
+        constant risk-free short rate
+    sigma: float or array
+        volatility factor in diffusion term
+    div_yield: float or array
+        dividend_yield, default = 0.0
+    option_type: str
+        call or put
+    exercise: str
+        american or european
+    """
+
+    def __init__(self, S0, K, T, r, sigma, div_yield=0.0, option_type: str = 'put', exercise: str = 'american'):
+        assert option_type == 'call' or option_type == 'put', 'option type must be either call or put'
+        assert exercise == 'american' or exercise == 'european', 'exercise must be either american or european'
+
+        self.S0, self.K, self.T, self.r, self.sigma, self.div_yield = np.broadcast_arrays(
+            *(np.atleast_1d(np.asarray(x, dtype=float)) for x in (S0, K, T, r, sigma, div_yield))
+        )
+        assert self.S0.ndim == 1, 'contract parameters must be scalars or one dimensional'
+        assert np.all(self.sigma > 0), 'volatility must be positive'
+        assert np.all(self.S0 > 0), 'initial stock price must be positive'
+        assert np.all(self.T > 0), 'time to maturity must be positive'
+        assert np.all(self.div_yield >= 0), 'dividend yield cannot be less than zero'
+
+        self.option_type = option_type
+        self.exercise = exercise
+        self._omega = 1.0 if option_type == 'call' else -1.0
+
+    def _payoff(self, stock_prices: np.ndarray) -> np.ndarray:
+        return np.maximum(self._omega * (stock_prices - self.K[:, None]), 0.0)
+
+    def _tree_parameters(self, method: str, n_steps: int) -> Tuple[np.ndarray, ...]:
+        """
+        :return: log up move, log down move, up / middle / down probabilities, discount factor per step
+        """
+        dt = self.T / n_steps
+        growth = np.exp((self.r - self.div_yield) * dt)
+
+        if method == 'crr':
+            log_u = self.sigma * np.sqrt(dt)
+            log_d = -log_u
+            p_up = (growth - np.exp(log_d)) / (np.exp(log_u) - np.exp(log_d))
+            p_mid = np.zeros_like(p_up)
+        elif method == 'leisen_reimer':
+            d1 = (np.log(self.S0 / self.K) + (self.r - self.div_yield + 0.5 * self.sigma ** 2) * self.T) / (
+                    self.sigma * np.sqrt(self.T))
+            d2 = d1 - self.sigma * np.sqrt(self.T)
+            p_up = _peizer_pratt(d2, n_steps)
+            u = growth * _peizer_pratt(d1, n_steps) / p_up
+            d = (growth - p_up * u) / (1 - p_up)
+            log_u, log_d = np.log(u), np.log(d)
+            p_mid = np.zeros_like(p_up)
+        else:
+            # Boyle / Hull trinomial, moves of sigma * sqrt(2 dt), matching mean and variance
+            half_move = np.exp(self.sigma * np.sqrt(0.5 * dt))
+            half_growth = np.exp(0.5 * (self.r - self.div_yield) * dt)
+            p_up = ((half_growth - 1 / half_move) / (half_move - 1 / half_move)) ** 2
+            p_down = ((half_move - half_growth) / (half_move - 1 / half_move)) ** 2
+            p_mid = 1 - p_up - p_down
+            log_u = self.sigma * np.sqrt(2 * dt)
+            log_d = -log_u
+
+        assert np.all((p_up > 0) & (p_up < 1) & (p_mid >= 0)), 'negative probabilities, increase n_steps'
+        p_down = 1 - p_up - p_mid
+        return log_u, log_d, p_up, p_mid, p_down, np.exp(-self.r * dt)
+
+    def _backward_induction(self, method: str, n_steps: int) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """
+        :return: {layer: (stock prices, option values)} for layers 0, 1 and 2, shape (n_contracts, nodes)
+        """
+        assert method in METHODS, f'method must be one of {METHODS}'
+        assert n_steps >= 2, 'no of steps cannot be less than two'
+        if method == 'leisen_reimer' and n_steps % 2 == 0:
+            n_steps += 1  # the Peizer-Pratt inversion is defined for odd no of steps
+
+        log_u, log_d, p_up, p_mid, p_down, discount = (x[:, None] for x in self._tree_parameters(method, n_steps))
+        log_s0 = np.log(self.S0)[:, None]
+        trinomial = method == 'trinomial'
+
+        def stock_prices(layer: int) -> np.ndarray:
+            # node j of a layer has j up moves (binomial), or j - layer net up moves (trinomial)
+            j = np.arange(2 * layer + 1 if trinomial else layer + 1)
+            if trinomial:
+                return np.exp(log_s0 + (j - layer) * log_u)
+            return np.exp(log_s0 + j * log_u + (layer - j) * log_d)
+
+        values = self._payoff(stock_prices(n_steps))
+        layers = {}
+        for layer in range(n_steps - 1, -1, -1):
+            if trinomial:
+                values = discount * (p_up * values[:, 2:] + p_mid * values[:, 1:-1] + p_down * values[:, :-2])
+            else:
+                values = discount * (p_up * values[:, 1:] + p_down * values[:, :-1])
+
+            if self.exercise == 'american' or layer <= 2:
+                prices = stock_prices(layer)
+                if self.exercise == 'american':
+                    values = np.maximum(values, self._payoff(prices))
+                if layer <= 2:
+                    layers[layer] = (prices, values)
+
+        self.n_steps = n_steps
+        return layers
+
+    def value(self, method: str = 'crr', n_steps: int = 500) -> np.ndarray:
+        """
+        :param method: crr, leisen_reimer or trinomial
+        :param n_steps: no of time steps
+        :return: option value of each contract
+        """
+        return self._backward_induction(method, n_steps)[0][1][:, 0]
+
+    def greeks(self, method: str = 'crr', n_steps: int = 500) -> Dict[str, np.ndarray]:
+        """
+        Value, delta, gamma and theta read off the first layers of the tree, no re-pricing needed.
+        Theta is annualized, divide by 252 for a per-day theta.
+        """
+        layers = self._backward_induction(method, n_steps)
+        dt = self.T / self.n_steps
+        v0 = layers[0][1][:, 0]
+        s1, v1 = layers[1]
+        s2, v2 = layers[2]
+
+        delta = (v1[:, -1] - v1[:, 0]) / (s1[:, -1] - s1[:, 0])
+
+        # three nodes around S0: layer 1 of a trinomial tree, layer 2 of a binomial tree
+        if method == 'trinomial':
+            s, v = s1, v1
+            theta = (v1[:, 1] - v0) / dt
+        else:
+            s, v = s2, v2
+            theta = (v2[:, 1] - v0) / (2 * dt)
+        delta_up = (v[:, 2] - v[:, 1]) / (s[:, 2] - s[:, 1])
+        delta_down = (v[:, 1] - v[:, 0]) / (s[:, 1] - s[:, 0])
+        gamma = (delta_up - delta_down) / (0.5 * (s[:, 2] - s[:, 0]))
+
+        return {'value': v0, 'delta': delta, 'gamma': gamma, 'theta': theta}
+
+
+if __name__ == "__main__":
+    import sys
+    from pathlib import Path
+
+    sys.path.append(str(Path(__file__).resolve().parents[1] / 'bsm'))
+    from BSM_option_class import BSMOptionValuation
+
+    strikes = np.linspace(80, 120, 41)
+
+    # european values converge to the closed form, leisen-reimer much faster than crr
+    european = LatticeOptionValuation(100, strikes, 0.75, 0.05, 0.25, 0.02, option_type='put', exercise='european')
+    closed_form = np.array([BSMOptionValuation(100, k, 0.75, 0.05, 0.25, 0.02).put_value() for k in strikes])
+    assert np.allclose(european.value('leisen_reimer', n_steps=201), closed_form, atol=1e-4)
+    assert np.allclose(european.value('crr', n_steps=2000), closed_form, atol=5e-3)
+    assert np.allclose(european.value('trinomial', n_steps=1000), closed_form, atol=5e-3)
+
+    bsm = BSMOptionValuation(100, 100, 0.75, 0.05, 0.25, 0.02)
+    # calendar time theta by finite difference on the time to maturity
+    bsm_theta = (BSMOptionValuation(100, 100, 0.75 - 1e-4, 0.05, 0.25, 0.02).call_value() -
+                 BSMOptionValuation(100, 100, 0.75 + 1e-4, 0.05, 0.25, 0.02).call_value()) / 2e-4
+    tree = LatticeOptionValuation(100, 100, 0.75, 0.05, 0.25, 0.02, option_type='call', exercise='european')
+    for method in ('crr', 'leisen_reimer', 'trinomial'):
+        greeks = tree.greeks(method, n_steps=501)
+        assert np.isclose(greeks['delta'][0], bsm.delta()[0], atol=1e-3)
+        assert np.isclose(greeks['gamma'][0], bsm.gamma(), atol=1e-3)
+        assert np.isclose(greeks['theta'][0], bsm_theta, atol=2e-2)
+
+    # american put chain, the three trees agree
+    american = LatticeOptionValuation(100, strikes, 0.75, 0.05, 0.25, 0.02, option_type='put')
+    values = np.array([american.value(method, n_steps=1001) for method in ('crr', 'leisen_reimer', 'trinomial')])
+    assert np.allclose(values, values[1], atol=5e-3)
+    assert np.all(values[1] >= closed_form)
+    print(np.column_stack([strikes, values[1], closed_form])[::10])
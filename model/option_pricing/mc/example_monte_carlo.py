@@ -42,6 +42,7 @@ MC = MonteCarloOptionPricing(
     no_of_slices=no_of_slice,
     # fix_random_seed=True,
     fix_random_seed=500,
+    # engine="numba",  # compiled kernels, falls back to numpy if numba is not installed
 )
 
 # stochastic interest rate
@@ -54,6 +55,7 @@ MC.cox_ingersoll_ross_model(
 MC.heston(kappa=2, theta=0.3, sigma_v=0.3, rho=0.5)  # heston model
 
 MC.stock_price_simulation()
+# MC.stock_price_simulation(store_paths=False)  # european / asian / lookback only, no path matrix
 # MT.stock_price_simulation_with_poisson_jump(jump_alpha=0.1, jump_std=0.25, poisson_lambda=0)
 MC.european_call()
 # MC.asian_avg_price_option(avg_method='arithmetic', option_type="call")
@@ -65,3 +67,8 @@ MC.european_call()
 #                   parisian_barrier_days=parisian_barrier_days)
 #
 # MC.look_back_european()
+
+# multilevel monte carlo for path-dependent payoffs with fine monitoring
+# from multilevel_monte_carlo import MultilevelMonteCarloPricing
+# MLMC = MultilevelMonteCarloPricing(S0=S0, K=K, T=T, r=r, sigma=sigma, div_yield=div_yield, fix_random_seed=500)
+# MLMC.price(payoff="asian_avg_price_option", payoff_kwargs={"option_type": "call"}, rmse=0.01)
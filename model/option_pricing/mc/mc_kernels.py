@@ -0,0 +1,166 @@
+# -*- coding:utf-8 -*-
+"""
+Compiled kernels for the hot loops of MonteCarloOptionPricing.
+
+Every kernel loops over paths in parallel and over slices sequentially, so a path is kept in registers
+instead of being rebuilt slice by slice as full-width NumPy temporaries. Numba is optional: when it is not
+installed, resolve_engine falls back to the NumPy implementation in monte_carlo_class.
+
+The kernels consume the same z_t arrays as the NumPy engine, so both engines give identical paths
+for the same random seed.
+"""
+import warnings
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+ENGINES = ('numpy', 'numba')
+
+
+def resolve_engine(engine: str) -> str:
+    assert engine in ENGINES, f'engine must be one of {ENGINES}'
+    if engine == 'numba' and not NUMBA_AVAILABLE:
+        warnings.warn('numba is not installed, falling back to the numpy engine')
+        return 'numpy'
+    return engine
+
+
+def path_statistics_numpy(s0: float, exp_mean: np.ndarray, exp_diffusion: np.ndarray, z_t: np.ndarray) -> \
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Terminal, arithmetic average, maximum and minimum price of every path, accumulated slice by slice
+    without keeping the price path matrix.
+    """
+    n_paths, n_slices = z_t.shape
+    price = np.full(n_paths, s0)
+    total = price.copy()
+    maximum = price.copy()
+    minimum = price.copy()
+
+    for i in range(1, n_slices):
+        price = price * np.exp(exp_mean[:, i - 1] + exp_diffusion[:, i - 1] * z_t[:, i - 1])
+        total += price
+        np.maximum(maximum, price, out=maximum)
+        np.minimum(minimum, price, out=minimum)
+
+    return price, total / n_slices, maximum, minimum
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def gbm_paths(s0, exp_mean, exp_diffusion, z_t):
+        n_paths, n_slices = z_t.shape
+        price_array = np.empty((n_paths, n_slices))
+        for p in prange(n_paths):
+            price_array[p, 0] = s0
+            for i in range(1, n_slices):
+                price_array[p, i] = price_array[p, i - 1] * np.exp(
+                    exp_mean[p, i - 1] + exp_diffusion[p, i - 1] * z_t[p, i - 1]
+                )
+        return price_array
+
+    @njit(parallel=True, cache=True)
+    def path_statistics(s0, exp_mean, exp_diffusion, z_t):
+        n_paths, n_slices = z_t.shape
+        terminal = np.empty(n_paths)
+        average = np.empty(n_paths)
+        maximum = np.empty(n_paths)
+        minimum = np.empty(n_paths)
+        for p in prange(n_paths):
+            price = s0
+            total = s0
+            hi = s0
+            lo = s0
+            for i in range(1, n_slices):
+                price *= np.exp(exp_mean[p, i - 1] + exp_diffusion[p, i - 1] * z_t[p, i - 1])
+                total += price
+                hi = max(hi, price)
+                lo = min(lo, price)
+            terminal[p] = price
+            average[p] = total / n_slices
+            maximum[p] = hi
+            minimum[p] = lo
+        return terminal, average, maximum, minimum
+
+    @njit(parallel=True, cache=True)
+    def heston_variance(v0, kappa, theta, sigma_v, dt, zt_v):
+        n_paths, n_slices = zt_v.shape
+        sqrt_dt = np.sqrt(dt)
+        variance_array = np.empty((n_paths, n_slices))
+        for p in prange(n_paths):
+            variance_array[p, 0] = v0
+            for i in range(1, n_slices):
+                previous = max(variance_array[p, i - 1], 0.0)
+                variance_array[p, i] = variance_array[p, i - 1] + kappa * (theta - previous) * dt + \
+                    sigma_v * np.sqrt(previous) * zt_v[p, i - 1] * sqrt_dt
+        return variance_array
+
+    @njit(parallel=True, cache=True)
+    def parisian_barrier_check(barrier_check, days_to_slices, parisian_barrier_days):
+        # rolling window sum, updated in O(1) per slice instead of re-summing the window
+        n_paths, n_slices = barrier_check.shape
+        n_windows = n_slices - days_to_slices
+        parisian_check = np.zeros((n_paths, n_windows))
+        for p in prange(n_paths):
+            window_sum = 0
+            for i in range(days_to_slices):
+                window_sum += barrier_check[p, i]
+            for i in range(n_windows):
+                if i > 0:
+                    window_sum += barrier_check[p, i + days_to_slices - 1] - barrier_check[p, i - 1]
+                if window_sum >= parisian_barrier_days:
+                    parisian_check[p, i] = 1.0
+        return parisian_check
+
+    @njit(cache=True)
+    def longstaff_schwartz_stopping_rule(price_array, intrinsic_val, r, poly_degree):
+        n_paths, n_slices = price_array.shape
+        cf = intrinsic_val[:, -1].copy()
+        exercise_slice = np.full(n_paths, -1)
+        for p in range(n_paths):
+            if intrinsic_val[p, -1] > 0:
+                exercise_slice[p] = n_slices - 1
+
+        for t in range(n_slices - 2, 0, -1):
+            n_itm = 0
+            for p in range(n_paths):
+                cf[p] *= np.exp(-r[p, t + 1])
+                if intrinsic_val[p, t] > 0:
+                    n_itm += 1
+
+            hold_val = np.zeros(n_paths)
+            if n_itm > 5:
+                # E[Y|X] by least squares on the polynomial basis of the in-the-money prices
+                x = np.empty((n_itm, poly_degree + 1))
+                y = np.empty(n_itm)
+                itm_path = np.empty(n_itm, dtype=np.int64)
+                k = 0
+                for p in range(n_paths):
+                    if intrinsic_val[p, t] > 0:
+                        for d in range(poly_degree + 1):
+                            x[k, d] = price_array[p, t] ** d
+                        y[k] = cf[p]
+                        itm_path[k] = p
+                        k += 1
+                coef = np.linalg.lstsq(x, y)[0]
+                fitted = x @ coef
+                for k in range(n_itm):
+                    hold_val[itm_path[k]] = fitted[k]
+
+            for p in range(n_paths):
+                if intrinsic_val[p, t] > hold_val[p]:
+                    exercise_slice[p] = t
+                    cf[p] = intrinsic_val[p, t]
+
+        stopping_rule = np.zeros((n_paths, n_slices))
+        for p in range(n_paths):
+            if exercise_slice[p] >= 0:
+                stopping_rule[p, exercise_slice[p]] = 1.0
+        return stopping_rule
@@ -9,10 +9,13 @@ import numpy as np
 import scipy.stats as sts
 from typing import Tuple
 
+import mc_kernels
+
 
 class MonteCarloOptionPricing:
     def __init__(self, r, S0: float, K: float, T: float, sigma: float, div_yield: float = 0.0,
-                 simulation_rounds: int = 10000, no_of_slices: int = 4, fix_random_seed: bool or int = False):
+                 simulation_rounds: int = 10000, no_of_slices: int = 4, fix_random_seed: bool or int = False,
+                 engine: str = 'numpy'):
         """
         An important reminder, by default the implementation assumes constant interest rate and volatility.
         To allow for stochastic interest rate and vol, run Vasicek/CIR for stochastic interest rate and
@@ -27,6 +30,8 @@ class MonteCarloOptionPricing:
         :param simulation_rounds: in general, monte carlo option pricing requires many simulations
         :param no_of_slices: between time 0 and time T, the number of slices PER YEAR, e.g. 252 if trading days are required
         :param fix_random_seed: boolean or integer
+        :param engine: 'numpy' or 'numba', numba runs the path, Heston, Parisian and Longstaff-Schwartz loops as
+            compiled kernels and falls back to numpy when numba is not installed
         """
         assert sigma >= 0, 'volatility cannot be less than zero'
         assert S0 >= 0, 'initial stock price cannot be less than zero'
@@ -51,7 +56,10 @@ class MonteCarloOptionPricing:
 
         self.sigma = np.full((self.simulation_rounds, self.no_of_slices), sigma)
 
+        self.engine = mc_kernels.resolve_engine(engine)
+
         self.terminal_prices = []
+        self.price_array = None
 
         self.z_t = np.random.standard_normal((self.simulation_rounds, self.no_of_slices))
 
@@ -144,31 +152,53 @@ class MonteCarloOptionPricing:
         _zt_v = _zt[:, :, 1]
 
         # step 2: simulation
-        for i in range(1, self.no_of_slices):
-            _previous_slice_variance = np.maximum(_variance_array[:, i - 1], 0)
-            _drift = kappa * (theta - _previous_slice_variance) * self._dt
-            _diffusion = sigma_v * np.sqrt(_previous_slice_variance) * \
-                         _zt_v[:, i - 1] * np.sqrt(self._dt)
-            _delta_vt = _drift + _diffusion
-            _variance_array[:, i] = _variance_array[:, i - 1] + _delta_vt
+        if self.engine == 'numba':
+            _variance_array = mc_kernels.heston_variance(self.sigma[0, 0] ** 2, kappa, theta, sigma_v, self._dt,
+                                                         np.ascontiguousarray(_zt_v))
+        else:
+            for i in range(1, self.no_of_slices):
+                _previous_slice_variance = np.maximum(_variance_array[:, i - 1], 0)
+                _drift = kappa * (theta - _previous_slice_variance) * self._dt
+                _diffusion = sigma_v * np.sqrt(_previous_slice_variance) * \
+                             _zt_v[:, i - 1] * np.sqrt(self._dt)
+                _delta_vt = _drift + _diffusion
+                _variance_array[:, i] = _variance_array[:, i - 1] + _delta_vt
 
         # re-define the interest rate and volatility path
         self.sigma = np.sqrt(np.maximum(_variance_array, 0))
         return self.sigma
 
-    def stock_price_simulation(self) -> np.ndarray:
+    def stock_price_simulation(self, store_paths: bool = True) -> np.ndarray:
+        """
+        :param store_paths: keep the full price path matrix. If False, only the terminal, average, maximum and
+            minimum price of each path are accumulated, which is enough for european, asian and lookback payoffs.
+            This only saves the (simulation_rounds, no_of_slices) price array: the z_t, sigma and r matrices
+            of the constructor and the exponents exp_mean and exp_diffusion are still full size
+        """
         self.exp_mean = (self.mue - self.div_yield - (self.sigma ** 2.0) * 0.5) * self._dt
         self.exp_diffusion = self.sigma * np.sqrt(self._dt)
 
-        self.price_array = np.zeros((self.simulation_rounds, self.no_of_slices))
-        self.price_array[:, 0] = self.S0
-
-        for i in range(1, self.no_of_slices):
-            self.price_array[:, i] = self.price_array[:, i - 1] * np.exp(
-                self.exp_mean[:, i - 1] + self.exp_diffusion[:, i - 1] * self.z_t[:, i - 1]
+        if not store_paths:
+            _path_statistics = mc_kernels.path_statistics if self.engine == 'numba' else \
+                mc_kernels.path_statistics_numpy
+            self.price_array = None
+            self.terminal_prices, self.average_prices, self.max_price, self.min_price = _path_statistics(
+                self.S0, self.exp_mean, self.exp_diffusion, np.ascontiguousarray(self.z_t)
             )
+        elif self.engine == 'numba':
+            self.price_array = mc_kernels.gbm_paths(self.S0, self.exp_mean, self.exp_diffusion,
+                                                    np.ascontiguousarray(self.z_t))
+        else:
+            self.price_array = np.zeros((self.simulation_rounds, self.no_of_slices))
+            self.price_array[:, 0] = self.S0
 
-        self.terminal_prices = self.price_array[:, -1]
+            for i in range(1, self.no_of_slices):
+                self.price_array[:, i] = self.price_array[:, i - 1] * np.exp(
+                    self.exp_mean[:, i - 1] + self.exp_diffusion[:, i - 1] * self.z_t[:, i - 1]
+                )
+
+        if store_paths:
+            self.terminal_prices = self.price_array[:, -1]
         self.stock_price_expectation = np.average(self.terminal_prices)
 
         print('-' * 64)
@@ -277,7 +307,10 @@ class MonteCarloOptionPricing:
         assert len(self.terminal_prices) != 0, 'Please simulate the stock price first'
         assert avg_method == 'arithmetic' or avg_method == 'geometric', 'arithmetic or geometric average?'
 
-        average_prices = np.average(self.price_array, axis=1)
+        if self.price_array is None:
+            average_prices = self.average_prices
+        else:
+            average_prices = np.average(self.price_array, axis=1)
 
         if option_type == 'call':
             self.terminal_profit = np.maximum((average_prices - self.K), 0.0)
@@ -311,44 +344,50 @@ class MonteCarloOptionPricing:
         """
         assert option_type == 'call' or option_type == 'put', 'option_type must be either call or put'
         assert len(self.terminal_prices) != 0, 'Please simulate the stock price first'
+        assert self.price_array is not None, 'Please simulate the stock price with store_paths=True'
 
         if option_type == 'call':
             self.intrinsic_val = np.maximum((self.price_array - self.K), 0.0)
         elif option_type == 'put':
             self.intrinsic_val = np.maximum((self.K - self.price_array), 0.0)
 
-        # last day cashflow == last day intrinsic value
-        cf = self.intrinsic_val[:, -1]
-
-        stopping_rule = np.zeros_like(self.price_array)
-        stopping_rule[:, -1] = np.where(self.intrinsic_val[:, -1] > 0, 1, 0)
-
-        # Longstaff and Schwartz iteration
-        for t in range(self.no_of_slices - 2, 0, -1):  # fill out the value table from backwards
-            # find out in-the-money path to better estimate the conditional expectation function
-            # where exercise is relevant and significantly improves the efficiency of the algorithm
-            itm_path = np.where(self.intrinsic_val[:, t] > 0)  # <==> self.price_array[:, t] vs. self.K
-
-            cf = cf * np.exp(-self.r[:, t + 1])
-            Y = cf[itm_path]
-            X = self.price_array[itm_path, t]
-
-            # initialize continuation value
-            hold_val = np.zeros(shape=self.simulation_rounds)
-            # if there is only 5 in-the-money paths (most likely appear in out-of-the-money options
-            # then simply assume that value of holding = 0.
-            # otherwise, run regression and compute conditional expectation E[Y|X].
-            if len(itm_path) > 5:
-                rg = np.polyfit(x=X[0], y=Y, deg=poly_degree)  # regression fitting
-                hold_val[itm_path] = np.polyval(p=rg, x=X[0])  # conditional expectation E[Y|X]
-
-            # 1 <==> exercise, 0 <==> hold
-            stopping_rule[:, t] = np.where(self.intrinsic_val[:, t] > hold_val, 1, 0)
-            # if exercise @ t, all future stopping rules = 0 as the option contract is exercised.
-            stopping_rule[np.where(self.intrinsic_val[:, t] > hold_val), (t + 1):] = 0
-
-            # cashflow @ t, if hold, cf = 0, if exercise, cf = intrinsic value @ t.
-            cf = np.where(self.intrinsic_val[:, t] > 0, self.intrinsic_val[:, t], 0)
+        if self.engine == 'numba':
+            stopping_rule = mc_kernels.longstaff_schwartz_stopping_rule(
+                np.ascontiguousarray(self.price_array), self.intrinsic_val, np.ascontiguousarray(self.r), poly_degree
+            )
+        else:
+            # last day cashflow == last day intrinsic value
+            cf = self.intrinsic_val[:, -1]
+
+            stopping_rule = np.zeros_like(self.price_array)
+            stopping_rule[:, -1] = np.where(self.intrinsic_val[:, -1] > 0, 1, 0)
+
+            # Longstaff and Schwartz iteration
+            for t in range(self.no_of_slices - 2, 0, -1):  # fill out the value table from backwards
+                # find out in-the-money path to better estimate the conditional expectation function
+                # where exercise is relevant and significantly improves the efficiency of the algorithm
+                itm_path = np.where(self.intrinsic_val[:, t] > 0)  # <==> self.price_array[:, t] vs. self.K
+
+                cf = cf * np.exp(-self.r[:, t + 1])
+                Y = cf[itm_path]
+                X = self.price_array[itm_path, t]
+
+                # initialize continuation value
+                hold_val = np.zeros(shape=self.simulation_rounds)
+                # if there is only 5 in-the-money paths (most likely appear in out-of-the-money options
+                # then simply assume that value of holding = 0.
+                # otherwise, run regression and compute conditional expectation E[Y|X].
+                if len(itm_path[0]) > 5:
+                    rg = np.polyfit(x=X[0], y=Y, deg=poly_degree)  # regression fitting
+                    hold_val[itm_path] = np.polyval(p=rg, x=X[0])  # conditional expectation E[Y|X]
+
+                # 1 <==> exercise, 0 <==> hold
+                stopping_rule[:, t] = np.where(self.intrinsic_val[:, t] > hold_val, 1, 0)
+                # if exercise @ t, all future stopping rules = 0 as the option contract is exercised.
+                stopping_rule[np.where(self.intrinsic_val[:, t] > hold_val), (t + 1):] = 0
+
+                # cashflow @ t, if hold, cf = discounted future cashflow, if exercise, cf = intrinsic value @ t.
+                cf = np.where(self.intrinsic_val[:, t] > hold_val, self.intrinsic_val[:, t], cf)
 
         simulation_vals = (self.intrinsic_val * stopping_rule * self.discount_table).sum(axis=1)
         self.expectation = np.average(simulation_vals)
@@ -365,6 +404,20 @@ class MonteCarloOptionPricing:
 
         return self.expectation
 
+    def _parisian_barrier_check(self, barrier_check: np.ndarray, parisian_barrier_days: int) -> np.ndarray:
+        days_to_slices = int(parisian_barrier_days * self.no_of_slices / (self.T * 252))
+
+        if self.engine == 'numba':
+            return mc_kernels.parisian_barrier_check(barrier_check, days_to_slices, parisian_barrier_days)
+
+        parisian_barrier_check = np.zeros((self.simulation_rounds, self.no_of_slices - days_to_slices))
+        for i in range(0, self.no_of_slices - days_to_slices):
+            parisian_barrier_check[:, i] = np.where(
+                np.sum(barrier_check[:, i:i + days_to_slices], axis=1) >= parisian_barrier_days, 1, 0
+            )
+
+        return parisian_barrier_check
+
     def barrier_option(self, option_type: str, barrier_price: float, barrier_type: str, barrier_direction: str,
                        parisian_barrier_days: int or None = None) -> float:
         assert option_type == "call" or option_type == "put", 'option type must be either call or put'
@@ -372,31 +425,18 @@ class MonteCarloOptionPricing:
             'barrier type must be either knock-in or knock-out'
         assert barrier_direction == "up" or barrier_direction == "down", \
             'barrier direction must be either up or down'
+        assert self.price_array is not None, 'Please simulate the stock price with store_paths=True'
         if barrier_direction == "up":
             barrier_check = np.where(self.price_array >= barrier_price, 1, 0)
 
             if parisian_barrier_days is not None:
-                days_to_slices = int(parisian_barrier_days * self.no_of_slices / (self.T * 252))
-                parisian_barrier_check = np.zeros((self.simulation_rounds, self.no_of_slices - days_to_slices))
-                for i in range(0, self.no_of_slices - days_to_slices):
-                    parisian_barrier_check[:, i] = np.where(
-                        np.sum(barrier_check[:, i:i + days_to_slices], axis=1) >= parisian_barrier_days, 1, 0
-                    )
-
-                barrier_check = parisian_barrier_check
+                barrier_check = self._parisian_barrier_check(barrier_check, parisian_barrier_days)
 
         elif barrier_direction == "down":
             barrier_check = np.where(self.price_array <= barrier_price, 1, 0)
 
             if parisian_barrier_days is not None:
-                days_to_slices = int(parisian_barrier_days * self.no_of_slices / (self.T * 252))
-                parisian_barrier_check = np.zeros((self.simulation_rounds, self.no_of_slices - days_to_slices))
-                for i in range(0, self.no_of_slices - days_to_slices):
-                    parisian_barrier_check[:, i] = np.where(
-                        np.sum(barrier_check[:, i:i + days_to_slices], axis=1) >= parisian_barrier_days, 1, 0
-                    )
-
-                barrier_check = parisian_barrier_check
+                barrier_check = self._parisian_barrier_check(barrier_check, parisian_barrier_days)
 
         if option_type == 'call':
             self.intrinsic_val = np.maximum((self.price_array - self.K), 0.0)
@@ -426,8 +466,9 @@ class MonteCarloOptionPricing:
         assert len(self.terminal_prices) != 0, 'Please simulate the stock price first'
         assert option_type == 'call' or option_type == 'put', 'option_type must be either call or put'
 
-        self.max_price = np.max(self.price_array, axis=1)
-        self.min_price = np.min(self.price_array, axis=1)
+        if self.price_array is not None:
+            self.max_price = np.max(self.price_array, axis=1)
+            self.min_price = np.min(self.price_array, axis=1)
 
         if option_type == "call":
             self.terminal_profit = np.maximum((self.max_price - self.K), 0.0)
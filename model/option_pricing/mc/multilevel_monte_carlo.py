@@ -0,0 +1,219 @@
+# -*- coding:utf-8 -*-
+
+import contextlib
+import io
+import math
+from typing import Tuple
+
+import numpy as np
+
+from monte_carlo_class import MonteCarloOptionPricing
+
+# payoff methods of MonteCarloOptionPricing that leave per-path payoffs in `terminal_profit`
+SUPPORTED_PAYOFFS = ("european_call", "asian_avg_price_option", "barrier_option", "look_back_european")
+
+
+class MultilevelMonteCarloPricing:
+    def __init__(self, r: float, S0: float, K: float, T: float, sigma: float, div_yield: float = 0.0,
+                 base_slices: int = 4, refinement_factor: int = 2, max_paths_per_batch: int = 50000,
+                 fix_random_seed: bool or int = False):
+        """
+        Multilevel Monte Carlo (Giles, 2008) driver on top of MonteCarloOptionPricing.
+
+        Level l simulates paths with base_slices * refinement_factor ** l slices. For l > 0 the coarse path is
+        built from the same Brownian increments as the fine path (the normals of every refinement_factor fine
+        slices are summed and rescaled), so P_fine - P_coarse has a small variance and most of the samples can
+        be spent on the cheap coarse levels.
+
+        Payoffs are the existing MonteCarloOptionPricing payoff methods, evaluated on each level as usual.
+        Only constant interest rate and volatility are supported, stochastic rate / vol models redraw z_t
+        and would break the coupling between levels.
+
+        :param S0: current price of the underlying asset (e.g. stock)
+        :param K: exercise price
+        :param T: time to maturity, in years, a float number
+        :param r: constant interest rate
+        :param sigma: volatility (in standard deviation) of the asset annual returns
+        :param div_yield: annual dividend yield
+        :param base_slices: no of slices of the coarsest level
+        :param refinement_factor: no of fine slices per coarse slice between two consecutive levels
+        :param max_paths_per_batch: paths are simulated in batches of at most this size to bound memory
+        :param fix_random_seed: boolean or integer
+        """
+        assert base_slices >= 2, 'base slices cannot be less than two'
+        assert refinement_factor >= 2, 'refinement factor cannot be less than two'
+        assert max_paths_per_batch > 0, 'max paths per batch must be positive'
+
+        self.r = r
+        self.S0 = float(S0)
+        self.K = float(K)
+        self.T = float(T)
+        self.sigma = sigma
+        self.div_yield = float(div_yield)
+
+        self.base_slices = int(base_slices)
+        self.refinement_factor = int(refinement_factor)
+        self.max_paths_per_batch = int(max_paths_per_batch)
+
+        if type(fix_random_seed) is bool:
+            if fix_random_seed:
+                np.random.seed(15000)
+        elif type(fix_random_seed) is int:
+            np.random.seed(fix_random_seed)
+
+    def _slices(self, level: int) -> int:
+        return self.base_slices * self.refinement_factor ** level
+
+    def _discounted_payoff(self, no_of_slices: int, z_t: np.ndarray, payoff: str, payoff_kwargs: dict,
+                           mc: MonteCarloOptionPricing or None = None) -> np.ndarray:
+        if mc is None:
+            mc = MonteCarloOptionPricing(r=self.r, S0=self.S0, K=self.K, T=self.T, sigma=self.sigma,
+                                         div_yield=self.div_yield, simulation_rounds=z_t.shape[0],
+                                         no_of_slices=no_of_slices)
+        mc.z_t = z_t
+
+        # the payoff methods report every call, which is noise for thousands of batches
+        with contextlib.redirect_stdout(io.StringIO()):
+            mc.stock_price_simulation()
+            getattr(mc, payoff)(**payoff_kwargs)
+
+        return mc.terminal_profit * np.exp(-np.sum(mc.r, axis=1))
+
+    def level_samples(self, level: int, n_paths: int, payoff: str, payoff_kwargs: dict) -> np.ndarray:
+        """
+        Samples of P_0 for level 0, and of the coupled correction P_l - P_(l-1) for level l > 0.
+        """
+        fine_slices = self._slices(level)
+        fine = MonteCarloOptionPricing(r=self.r, S0=self.S0, K=self.K, T=self.T, sigma=self.sigma,
+                                       div_yield=self.div_yield, simulation_rounds=n_paths,
+                                       no_of_slices=fine_slices)
+        z_fine = fine.z_t
+        p_fine = self._discounted_payoff(fine_slices, z_fine, payoff, payoff_kwargs, mc=fine)
+        if level == 0:
+            return p_fine
+
+        # coarse increments over m fine slices: sum of m standard normals, rescaled to unit variance
+        coarse_slices = fine_slices // self.refinement_factor
+        z_coarse = z_fine.reshape(n_paths, coarse_slices, self.refinement_factor).sum(axis=2) / np.sqrt(
+            self.refinement_factor)
+        p_coarse = self._discounted_payoff(coarse_slices, z_coarse, payoff, payoff_kwargs)
+
+        return p_fine - p_coarse
+
+    def _level_sums(self, level: int, n_paths: int, payoff: str, payoff_kwargs: dict) -> Tuple[float, float]:
+        sum_1, sum_2 = 0.0, 0.0
+        for start in range(0, n_paths, self.max_paths_per_batch):
+            samples = self.level_samples(level, min(self.max_paths_per_batch, n_paths - start), payoff,
+                                         payoff_kwargs)
+            sum_1 += np.sum(samples)
+            sum_2 += np.sum(samples ** 2)
+
+        return sum_1, sum_2
+
+    @staticmethod
+    def _decay_rate(values: np.ndarray, m: int, default: float) -> float:
+        """
+        Regression of log_m |values_l| on l over levels >= 1, i.e. the weak (alpha) or strong (beta) order,
+        floored at half the default.
+        """
+        if len(values) < 3 or np.any(values[1:] <= 0):
+            return default
+        levels = np.arange(1, len(values))
+        slope = np.polyfit(levels, np.log(values[1:]) / np.log(m), 1)[0]
+        return max(-slope, 0.5 * default)
+
+    def price(self, payoff: str, payoff_kwargs: dict or None = None, rmse: float = 0.01,
+              initial_samples: int = 2000, min_levels: int = 2, max_levels: int = 8) -> float:
+        """
+        Adaptive MLMC estimate with root mean square error ~ rmse.
+
+        Half of the mean square error budget goes to variance, with the optimal no of samples per level
+        N_l = 2 / rmse^2 * sqrt(V_l / C_l) * sum_k sqrt(V_k * C_k), the other half to discretisation bias,
+        levels are added until the extrapolated bias of the finest level is within the budget.
+
+        :param payoff: name of the MonteCarloOptionPricing payoff method, e.g. 'asian_avg_price_option'
+        :param payoff_kwargs: keyword arguments for the payoff method, e.g. {'option_type': 'put'}
+        :param rmse: target root mean square error
+        :param initial_samples: no of samples on a level when it is added
+        :param min_levels: initial finest level
+        :param max_levels: finest level allowed
+        :return: option value
+        """
+        assert payoff in SUPPORTED_PAYOFFS, f'payoff must be one of {SUPPORTED_PAYOFFS}'
+        assert rmse > 0, 'rmse must be positive'
+        assert 1 <= min_levels <= max_levels, 'min levels must be between 1 and max levels'
+        payoff_kwargs = payoff_kwargs or {}
+
+        m = self.refinement_factor
+        n_levels = min_levels + 1
+        n_samples = np.zeros(n_levels, dtype=int)
+        sums = np.zeros((2, n_levels))
+        new_samples = np.full(n_levels, initial_samples, dtype=int)
+
+        while np.sum(new_samples) > 0:
+            for level in np.flatnonzero(new_samples > 0):
+                sum_1, sum_2 = self._level_sums(level, int(new_samples[level]), payoff, payoff_kwargs)
+                n_samples[level] += new_samples[level]
+                sums[0, level] += sum_1
+                sums[1, level] += sum_2
+
+            means = np.abs(sums[0] / n_samples)
+            variances = np.maximum(0.0, sums[1] / n_samples - means ** 2)
+            alpha = self._decay_rate(means, m, default=1.0)
+            beta = self._decay_rate(variances, m, default=1.0)
+
+            # cost per sample, a coupled level simulates both the fine and the coarse path
+            costs = m ** np.arange(n_levels) * (1 + 1 / m)
+            costs[0] = 1.0
+
+            optimal = np.ceil(2 * np.sqrt(variances / costs) * np.sum(np.sqrt(variances * costs)) / rmse ** 2)
+            new_samples = np.maximum(0, optimal.astype(int) - n_samples)
+
+            # all levels converged on the variance, check discretisation bias via the finest corrections
+            if np.all(new_samples <= 0.01 * n_samples):
+                bias = max(means[-1], means[-2] / m ** alpha) / (m ** alpha - 1)
+                if bias > rmse / np.sqrt(2):
+                    if n_levels > max_levels:
+                        print(f'Warning: MLMC failed to reach the target bias within {max_levels} levels')
+                        break
+                    n_levels += 1
+                    variances = np.append(variances, variances[-1] / m ** beta)
+                    n_samples = np.append(n_samples, 0)
+                    sums = np.hstack([sums, np.zeros((2, 1))])
+                    costs = np.append(costs, costs[-1] * m)
+
+                    optimal = np.ceil(
+                        2 * np.sqrt(variances / costs) * np.sum(np.sqrt(variances * costs)) / rmse ** 2)
+                    new_samples = np.maximum(0, optimal.astype(int) - n_samples)
+
+        self.samples_per_level = n_samples
+        self.level_means = sums[0] / n_samples
+        self.level_variances = sums[1] / n_samples - self.level_means ** 2
+        self.standard_error = math.sqrt(np.sum(np.maximum(self.level_variances, 0.0) / n_samples))
+        self.expectation = np.sum(self.level_means)
+
+        print('-' * 64)
+        print(
+            " Multilevel monte carlo %s \n S0 %4.1f \n K %2.1f \n Levels %i \n Finest slices %i \n"
+            " Samples per level %s \n Option Value %4.3f \n Standard error %4.4f" % (
+                payoff, self.S0, self.K, n_levels, self._slices(n_levels - 1),
+                n_samples.tolist(), self.expectation, self.standard_error
+            )
+        )
+        print('-' * 64)
+
+        return self.expectation
+
+
+if __name__ == "__main__":
+    MLMC = MultilevelMonteCarloPricing(r=0.05, S0=100.0, K=100.0, T=1.0, sigma=0.2, fix_random_seed=True)
+
+    # daily-monitored arithmetic asian call
+    MLMC.price(payoff='asian_avg_price_option', payoff_kwargs={'option_type': 'call'}, rmse=0.02)
+
+    # lookback and down-and-out barrier call, the discrete max converges at sqrt(dt) so needs more levels
+    MLMC.price(payoff='look_back_european', payoff_kwargs={'option_type': 'call'}, rmse=0.25, max_levels=10)
+    MLMC.price(payoff='barrier_option',
+               payoff_kwargs={'option_type': 'call', 'barrier_price': 85.0,
+                              'barrier_type': 'knock-out', 'barrier_direction': 'down'},
+               rmse=0.05)
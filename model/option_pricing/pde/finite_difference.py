@@ -0,0 +1,184 @@
+# -*- coding:utf-8 -*-
+"""
+Crank-Nicolson finite differences for European and American options under Black-Scholes-Merton.
+
+The PDE is solved in x = ln(S/K) for v = V/K, which has constant coefficients, on a grid of each contract
+centred at ln(S0/K). The tridiagonal systems of all contracts are stacked into one banded matrix (blocks are
+decoupled by their Dirichlet boundary rows), so each time step is a single scipy.linalg.solve_banded call for
+the whole batch. American exercise is a projection on the payoff after each step, the first steps are
+fully implicit (Rannacher) to damp the oscillations from the payoff kink.
+"""
+from typing import Dict
+
+import numpy as np
+from scipy.linalg import solve_banded
+
+
+class CrankNicolsonOptionValuation:
+    """
+    Valuation of European and American options by Crank-Nicolson finite differences
+    Attributes
+    ==========
+    S0: float or array
+        initial stock/index level
+    K: float or array
+        strike price
+    T: float or array
+        time to maturity (in year fractions)
+    r: float or array
+        constant risk-free short rate
+    sigma: float or array
+        volatility factor in diffusion term
+    div_yield: float or array
+        dividend_yield, default = 0.0
+    option_type: str
+        call or put
+    exercise: str
+        american or european
+    """
+
+    def __init__(self, S0, K, T, r, sigma, div_yield=0.0, option_type: str = 'put', exercise: str = 'american'):
+        assert option_type == 'call' or option_type == 'put', 'option type must be either call or put'
+        assert exercise == 'american' or exercise == 'european', 'exercise must be either american or european'
+
+        self.S0, self.K, self.T, self.r, self.sigma, self.div_yield = np.broadcast_arrays(
+            *(np.atleast_1d(np.asarray(x, dtype=float)) for x in (S0, K, T, r, sigma, div_yield))
+        )
+        assert self.S0.ndim == 1, 'contract parameters must be scalars or one dimensional'
+        assert np.all(self.sigma > 0), 'volatility must be positive'
+        assert np.all(self.S0 > 0), 'initial stock price must be positive'
+        assert np.all(self.T > 0), 'time to maturity must be positive'
+        assert np.all(self.div_yield >= 0), 'dividend yield cannot be less than zero'
+
+        self.option_type = option_type
+        self.exercise = exercise
+        self._omega = 1.0 if option_type == 'call' else -1.0
+
+    def _payoff(self, x: np.ndarray) -> np.ndarray:
+        return np.maximum(self._omega * (np.exp(x) - 1.0), 0.0)
+
+    def _boundary(self, x: np.ndarray, tau: np.ndarray) -> np.ndarray:
+        """
+        Deep in / out of the money values at the edges of the grid, at time to maturity tau.
+        """
+        r, q = self.r[:, None], self.div_yield[:, None]
+        forward_value = self._omega * (np.exp(x - q * tau) - np.exp(-r * tau))
+        if self.exercise == 'american':
+            return np.maximum(np.maximum(forward_value, self._payoff(x)), 0.0)
+        return np.maximum(forward_value, 0.0)
+
+    def solve(self, n_space: int = 401, n_time: int = 400, width: float = 6.0, rannacher_steps: int = 2) -> \
+            Dict[str, np.ndarray]:
+        """
+        :param n_space: no of grid points in ln(S/K), odd so that S0 is the middle node
+        :param n_time: no of time steps
+        :param width: half width of the grid, in standard deviations sigma * sqrt(T)
+        :param rannacher_steps: no of initial time steps replaced by two fully implicit half steps
+        :return: value, delta, gamma and (annualized) theta of each contract
+        """
+        assert n_space >= 5 and n_space % 2 == 1, 'no of space steps must be odd and at least 5'
+        assert n_time >= 1, 'no of time steps cannot be less than one'
+        n_contracts = len(self.S0)
+        middle = n_space // 2
+
+        dx = (2 * width * self.sigma * np.sqrt(self.T) / (n_space - 1))[:, None]
+        x = np.log(self.S0 / self.K)[:, None] + dx * (np.arange(n_space) - middle)
+        dtau = (self.T / n_time)[:, None]
+
+        # v_tau = L v, L v_j = lower * v_(j-1) + diag * v_j + upper * v_(j+1)
+        sigma2, r = self.sigma[:, None] ** 2, self.r[:, None]
+        mu = r - self.div_yield[:, None] - 0.5 * sigma2
+        lower = 0.5 * sigma2 / dx ** 2 - 0.5 * mu / dx
+        diag = -sigma2 / dx ** 2 - r
+        upper = 0.5 * sigma2 / dx ** 2 + 0.5 * mu / dx
+
+        def banded(theta_dt: np.ndarray) -> np.ndarray:
+            # (I - theta dt L) of all contracts, boundary rows are identity which decouples the blocks
+            ab = np.zeros((3, n_contracts, n_space))
+            ab[0, :, 2:] = -theta_dt * upper
+            ab[1] = 1.0
+            ab[1, :, 1:-1] -= theta_dt * diag
+            ab[2, :, :-2] = -theta_dt * lower
+            return ab.reshape(3, -1)
+
+        def step(v: np.ndarray, ab: np.ndarray, explicit_dt: np.ndarray, tau: np.ndarray) -> np.ndarray:
+            rhs = v.copy()
+            rhs[:, 1:-1] += explicit_dt * (lower * v[:, :-2] + diag * v[:, 1:-1] + upper * v[:, 2:])
+            rhs[:, [0, -1]] = self._boundary(x[:, [0, -1]], tau)
+            v = solve_banded((1, 1), ab, rhs.ravel()).reshape(n_contracts, n_space)
+            if self.exercise == 'american':
+                v = np.maximum(v, payoff)
+            return v
+
+        payoff = self._payoff(x)
+        v = payoff.copy()
+        v_previous = v
+        tau = np.zeros((n_contracts, 1))
+
+        # fully implicit half steps and crank-nicolson steps share the same matrix I - dtau / 2 L
+        ab = banded(0.5 * dtau)
+        n_rannacher = min(rannacher_steps, n_time)
+        for _ in range(n_rannacher):
+            # one time step back, for theta also when all steps are rannacher steps
+            v_previous = v
+            for _ in range(2):
+                tau = tau + 0.5 * dtau
+                v = step(v, ab, np.zeros_like(dtau), tau)
+
+        for _ in range(n_rannacher, n_time):
+            v_previous = v
+            tau = tau + dtau
+            v = step(v, ab, 0.5 * dtau, tau)
+
+        self.grid = x
+        self.values = self.K[:, None] * v
+
+        # derivatives in S from derivatives in x: V_S = V_x / S, V_SS = (V_xx - V_x) / S^2
+        v_x = (v[:, middle + 1] - v[:, middle - 1]) / (2 * dx[:, 0])
+        v_xx = (v[:, middle + 1] - 2 * v[:, middle] + v[:, middle - 1]) / dx[:, 0] ** 2
+        return {
+            'value': self.K * v[:, middle],
+            'delta': self.K * v_x / self.S0,
+            'gamma': self.K * (v_xx - v_x) / self.S0 ** 2,
+            'theta': -self.K * (v[:, middle] - v_previous[:, middle]) / dtau[:, 0],
+        }
+
+    def value(self, **kwargs) -> np.ndarray:
+        return self.solve(**kwargs)['value']
+
+
+if __name__ == "__main__":
+    import sys
+    from pathlib import Path
+
+    sys.path.append(str(Path(__file__).resolve().parents[1] / 'bsm'))
+    sys.path.append(str(Path(__file__).resolve().parents[1] / 'lattice'))
+    from BSM_option_class import BSMOptionValuation
+    from lattice_pricing import LatticeOptionValuation
+
+    strikes = np.linspace(80, 120, 41)
+
+    # european chain against the closed form
+    european = CrankNicolsonOptionValuation(100, strikes, 0.75, 0.05, 0.25, 0.02, option_type='call',
+                                            exercise='european')
+    closed_form = np.array([BSMOptionValuation(100, k, 0.75, 0.05, 0.25, 0.02).call_value() for k in strikes])
+    greeks = european.solve()
+    assert np.allclose(greeks['value'], closed_form, atol=2e-3)
+
+    bsm = BSMOptionValuation(100, 100, 0.75, 0.05, 0.25, 0.02)
+    atm = np.argmin(np.abs(strikes - 100))
+    assert np.isclose(greeks['delta'][atm], bsm.delta()[0], atol=1e-3)
+    assert np.isclose(greeks['gamma'][atm], bsm.gamma(), atol=1e-4)
+    assert np.isclose(greeks['theta'][atm], bsm.theta()[0], atol=0.1)
+
+    # only rannacher steps: theta is still the change over the last time step, here half the maturity
+    half = BSMOptionValuation(100, 100, 0.375, 0.05, 0.25, 0.02).call_value()
+    coarse = european.solve(n_time=2)['theta'][atm]
+    assert np.isclose(coarse, -(bsm.call_value() - half) / 0.375, rtol=0.05)
+
+    # american puts with mixed maturities and vols in one batch, against the leisen-reimer tree
+    maturities = np.resize([0.25, 0.5, 1.0], len(strikes))
+    vols = np.resize([0.2, 0.3], len(strikes))
+    american = CrankNicolsonOptionValuation(100, strikes, maturities, 0.05, vols, 0.02, option_type='put')
+    tree = LatticeOptionValuation(100, strikes, maturities, 0.05, vols, 0.02, option_type='put')
+    assert np.allclose(american.value(), tree.value('leisen_reimer', n_steps=2001), atol=5e-3)